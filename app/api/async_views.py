@@ -0,0 +1,111 @@
+from asgiref.sync import sync_to_async
+from django.contrib.auth.models import AnonymousUser
+from django.core.exceptions import ValidationError
+from django.http import Http404, JsonResponse
+from django.views.decorators.http import require_GET
+from rest_framework.response import Response
+
+from .authentication import CachedJWTAuthentication
+from .instrumentation import serialized
+from .models import User
+from .serializers import UserSerializer
+from .views import AuthViewSet
+
+
+async def authenticate(request):
+    """Async counterpart of DRF's lazy `request.user`, for the views below"""
+    for authenticator in request.authenticators:
+        if isinstance(authenticator, CachedJWTAuthentication):
+            user_auth = await authenticator.aauthenticate(request)
+        else:
+            user_auth = await sync_to_async(authenticator.authenticate)(request)
+        if user_auth is not None:
+            request._authenticator = authenticator
+            request.user, request.auth = user_auth
+            return
+    request.user, request.auth = AnonymousUser(), None
+
+
+async def serve(viewset_class, actions, handler, request, basename=None, detail=False, **kwargs):
+    """
+    Run one action of a DRF viewset as a coroutine.
+
+    DRF's request handling is reused as is (content negotiation, permissions,
+    exception handling, rendering); only the steps that do I/O, the
+    authentication and `handler`, are awaited.
+    """
+    viewset = viewset_class(basename=basename, detail=detail)
+    viewset.action_map = actions
+    viewset.args, viewset.kwargs = (), kwargs
+    viewset.headers = viewset.default_response_headers
+    request = viewset.initialize_request(request, **kwargs)
+    viewset.request = request
+
+    try:
+        await authenticate(request)
+        viewset.initial(request, **kwargs)
+        response = await handler(viewset, request)
+    except Exception as exc:
+        response = viewset.handle_exception(exc)
+    viewset.response = viewset.finalize_response(request, response, **kwargs)
+    return viewset.response
+
+
+async def list_objects(viewset, request):
+    queryset = viewset.filter_queryset(viewset.get_queryset())
+    page = await viewset.paginator.apaginate_queryset(queryset, request, view=viewset)
+    return viewset.paginator.get_paginated_response(serialized(viewset.get_serializer(page, many=True)))
+
+
+async def retrieve_object(viewset, request):
+    queryset = viewset.filter_queryset(viewset.get_queryset())
+    lookup_url_kwarg = viewset.lookup_url_kwarg or viewset.lookup_field
+    try:
+        obj = await queryset.filter(**{viewset.lookup_field: viewset.kwargs[lookup_url_kwarg]}).afirst()
+    except (TypeError, ValueError, ValidationError):
+        obj = None
+    if obj is None:
+        raise Http404
+    viewset.check_object_permissions(request, obj)
+    return Response(serialized(viewset.get_serializer(obj)))
+
+
+async def current_user(viewset, request):
+    # The authenticated user only has the cached auth fields loaded
+    return Response(UserSerializer(await User.objects.aget(pk=request.user.pk)).data)
+
+
+def async_read_view(viewset_class, basename, detail=False):
+    """
+    URL view for a viewset's list (or detail) route that serves GET with the
+    async ORM, and hands every other method to the regular sync view.
+    """
+    if detail:
+        actions = {'get': 'retrieve', 'put': 'update', 'patch': 'partial_update', 'delete': 'destroy'}
+        handler = retrieve_object
+    else:
+        actions = {'get': 'list', 'post': 'create'}
+        handler = list_objects
+    sync_view = viewset_class.as_view(actions, detail=detail, basename=basename)
+
+    async def view(request, **kwargs):
+        if request.method != 'GET':
+            return await sync_to_async(sync_view)(request, **kwargs)
+        return await serve(viewset_class, actions, handler, request, basename=basename, detail=detail, **kwargs)
+
+    view.csrf_exempt = True
+    # Named like DRF's viewset views in logs (api.instrumentation.view_name)
+    view.cls, view.actions = viewset_class, actions
+    return view
+
+
+async def me(request):
+    return await serve(AuthViewSet, {'get': 'me'}, current_user, request, basename='auth')
+
+me.csrf_exempt = True
+me.cls, me.actions = AuthViewSet, {'get': 'me'}
+
+
+@require_GET
+async def health(request):
+    return JsonResponse('OK', safe=False)
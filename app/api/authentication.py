@@ -0,0 +1,91 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+
+# The only user fields authentication and the permission classes read; a
+# cached user has the others deferred, loaded on first access (e.g. `auth/me`)
+CACHED_USER_FIELDS = ('id', 'role', 'is_active')
+
+
+def user_cache_key(user_id):
+    return f'auth-user:{user_id}'
+
+
+def forget_user(user_id):
+    cache.delete(user_cache_key(user_id))
+
+
+def cache_entry(user):
+    """What is cached of a user: never the password hash, only the token version derived from it"""
+    return {
+        **{field: getattr(user, field) for field in CACHED_USER_FIELDS},
+        'token_version': get_md5_hash_password(user.password),
+    }
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """
+    JWTAuthentication that loads the token's user from the cache instead of the
+    database, for up to AUTH_USER_CACHE_TTL seconds. `api.signals` drops the
+    entry whenever the user is saved or deleted.
+    """
+
+    def get_user(self, validated_token):
+        user_id = self.token_user_id(validated_token)
+        key = user_cache_key(user_id)
+        entry = cache.get(key)
+        if entry is None:
+            try:
+                user = self.user_model.objects.get(**{api_settings.USER_ID_FIELD: user_id})
+            except self.user_model.DoesNotExist as e:
+                raise AuthenticationFailed(_("User not found"), code="user_not_found") from e
+            entry = cache_entry(user)
+            cache.set(key, entry, settings.AUTH_USER_CACHE_TTL)
+        return self.check_user(entry, validated_token)
+
+    async def aauthenticate(self, request):
+        """`authenticate` for the async views, with the cache and ORM awaited"""
+        header = self.get_header(request)
+        if header is None:
+            return None
+        raw_token = self.get_raw_token(header)
+        if raw_token is None:
+            return None
+        validated_token = self.get_validated_token(raw_token)
+        return await self.aget_user(validated_token), validated_token
+
+    async def aget_user(self, validated_token):
+        user_id = self.token_user_id(validated_token)
+        key = user_cache_key(user_id)
+        entry = await cache.aget(key)
+        if entry is None:
+            try:
+                user = await self.user_model.objects.aget(**{api_settings.USER_ID_FIELD: user_id})
+            except self.user_model.DoesNotExist as e:
+                raise AuthenticationFailed(_("User not found"), code="user_not_found") from e
+            entry = cache_entry(user)
+            await cache.aset(key, entry, settings.AUTH_USER_CACHE_TTL)
+        return self.check_user(entry, validated_token)
+
+    def token_user_id(self, validated_token):
+        try:
+            return validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError as e:
+            raise InvalidToken(_("Token contained no recognizable user identification")) from e
+
+    def check_user(self, entry, validated_token):
+        """The user of a cache entry, with only CACHED_USER_FIELDS loaded"""
+        if api_settings.CHECK_USER_IS_ACTIVE and not entry['is_active']:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+
+        if api_settings.CHECK_REVOKE_TOKEN:
+            if validated_token.get(api_settings.REVOKE_TOKEN_CLAIM) != entry['token_version']:
+                raise AuthenticationFailed(_("The user's password has been changed."), code="password_changed")
+
+        fields = [field.attname for field in self.user_model._meta.concrete_fields if field.attname in entry]
+        return self.user_model.from_db(None, fields, [entry[field] for field in fields])
@@ -0,0 +1,247 @@
+from collections import Counter
+
+from dateutil.relativedelta import relativedelta
+from django.db import transaction
+
+from .models import Product, Lead, ProductInterests, Customer, CustomerProducts
+from .search import SEARCH_INDEXES
+from .serializers import LeadSerializer, BulkConvertLeadSerializer
+from .sync import manual_sync, reindex_on_commit, sync_products
+from .stats import count_lead, apply_deltas, count_leads
+
+
+BATCH_MAX_OPERATIONS = 5000
+
+OPERATIONS = ('create', 'update', 'delete')
+
+
+class LeadBatch:
+    """
+    Applies a list of `{"op": "create" | "update" | "delete", "id", "data"}`
+    operations to leads in one transaction.
+
+    Creates and updates (partial, like PATCH) are validated with `many=True`
+    LeadSerializers, the leads and products they reference are loaded with one
+    query each, and rows are written with `bulk_create`/`bulk_update`. The
+    batch is all or nothing: if any operation is invalid nothing is written
+    and `errors` holds the problems of each operation, by position.
+    """
+
+    def __init__(self, operations):
+        self.operations = operations
+        self.errors = [{} for _ in operations]
+        self.indexes = {op: [] for op in OPERATIONS}
+        self.validated = {}
+
+    def is_valid(self):
+        for idx, operation in enumerate(self.operations):
+            if not isinstance(operation, dict) or operation.get('op') not in OPERATIONS:
+                self.errors[idx] = {'op': [f"Must be one of {', '.join(OPERATIONS)}"]}
+            elif operation['op'] != 'create' and not isinstance(operation.get('id'), int):
+                self.errors[idx] = {'id': ['A lead id is required']}
+            else:
+                self.indexes[operation['op']].append(idx)
+
+        self.validate_data('create', LeadSerializer(data=self.payloads('create'), many=True))
+        self.validate_data('update', LeadSerializer(data=self.payloads('update'), many=True, partial=True))
+        self.load_leads()
+        self.check_products()
+        return not any(self.errors)
+
+    def payloads(self, op):
+        return [self.operations[idx].get('data', {}) for idx in self.indexes[op]]
+
+    def validate_data(self, op, serializer):
+        if serializer.is_valid():
+            self.validated.update(zip(self.indexes[op], serializer.validated_data))
+            return
+        errors = serializer.errors
+        if isinstance(errors, dict):
+            # The whole list was rejected, e.g. a payload that is not an object
+            errors = [errors] * len(self.indexes[op])
+        for idx, error in zip(self.indexes[op], errors):
+            if error:
+                self.errors[idx] = error
+
+    def load_leads(self):
+        ids = [self.operations[idx]['id'] for idx in self.indexes['update'] + self.indexes['delete']]
+        # Locked when run in a transaction, so a concurrent convert of the same leads waits
+        self.leads = Lead.objects.select_for_update().in_bulk(ids)
+        seen = Counter(ids)
+        for idx in self.indexes['update'] + self.indexes['delete']:
+            lead_id = self.operations[idx]['id']
+            if lead_id not in self.leads:
+                self.errors[idx].setdefault('id', []).append(f"Lead with id {lead_id} not found")
+            elif seen[lead_id] > 1:
+                self.errors[idx].setdefault('id', []).append(f"Lead {lead_id} appears more than once in the batch")
+
+    def check_products(self):
+        wanted = {}
+        for idx in self.indexes['create'] + self.indexes['update']:
+            data = self.operations[idx].get('data', {})
+            product_ids = data.get('productIds') if isinstance(data, dict) else None
+            if isinstance(product_ids, list):
+                wanted[idx] = [str(product_id) for product_id in product_ids]
+
+        requested = {product_id for product_ids in wanted.values() for product_id in product_ids}
+        found = {
+            str(product_id) for product_id in
+            Product.objects.filter(id__in=[p for p in requested if p.isdigit()]).values_list('id', flat=True)
+        }
+        for idx, product_ids in wanted.items():
+            for product_id in product_ids:
+                if product_id not in found:
+                    self.errors[idx].setdefault('productIds', []).append(f"Product with id {product_id} not found")
+
+    def save(self):
+        """Apply the operations and return `{"op", "id"}` for each, in order"""
+        # The per-row signal handlers would repeat the index and stats work
+        # below once per lead and per product link
+        with transaction.atomic(), manual_sync():
+            results = {}
+            results.update(self.create())
+            results.update(self.update())
+            results.update(self.delete())
+        return [results[idx] for idx in range(len(self.operations))]
+
+    def create(self):
+        links, leads = {}, {}
+        for idx in self.indexes['create']:
+            data = dict(self.validated[idx])
+            links[idx] = data.pop('productIds', [])
+            leads[idx] = Lead(**data)
+        Lead.objects.bulk_create(leads.values())
+        self.link_products({leads[idx].pk: product_ids for idx, product_ids in links.items()})
+
+        reindex_on_commit(Lead, *(lead.pk for lead in leads.values()))
+        count_leads(leads.values())
+        return {idx: {'op': 'create', 'id': lead.pk} for idx, lead in leads.items()}
+
+    def update(self):
+        links, leads, fields, deltas = {}, {}, set(), Counter()
+        for idx in self.indexes['update']:
+            data = dict(self.validated[idx])
+            lead = self.leads[self.operations[idx]['id']]
+            if 'productIds' in data:
+                links[lead.pk] = data.pop('productIds')
+
+            count_lead(deltas, lead, -1)
+            for attr, value in data.items():
+                setattr(lead, attr, value)
+            count_lead(deltas, lead)
+            fields.update(data)
+            leads[idx] = lead
+
+        if fields:
+            Lead.objects.bulk_update(leads.values(), fields)
+        if links:
+            sync_products(ProductInterests, 'lead', links)
+
+        apply_deltas(deltas)
+        # Merged with the leads sync_products queued, so each is indexed once
+        reindex_on_commit(Lead, *(lead.pk for lead in leads.values()))
+        return {idx: {'op': 'update', 'id': lead.pk} for idx, lead in leads.items()}
+
+    def delete(self):
+        ids = {idx: self.operations[idx]['id'] for idx in self.indexes['delete']}
+        Lead.objects.filter(pk__in=ids.values()).delete()
+        SEARCH_INDEXES[Lead].remove(ids.values())
+        count_leads([self.leads[lead_id] for lead_id in ids.values()], delta=-1)
+        return {idx: {'op': 'delete', 'id': lead_id} for idx, lead_id in ids.items()}
+
+    def link_products(self, product_ids_by_lead):
+        ProductInterests.objects.bulk_create(
+            ProductInterests(lead_id=lead_id, product_id=int(product_id))
+            for lead_id, product_ids in product_ids_by_lead.items()
+            for product_id in dict.fromkeys(product_ids)
+        )
+
+
+def conversion_error(lead):
+    """Why `lead` can't be converted to a customer, or None; shared by the single and bulk convert"""
+    if lead.customer_id is not None:
+        return f"Lead {lead.pk} is already converted"
+    # Customer.address is NOT NULL; an empty address is allowed
+    if lead.address is None:
+        return f"Lead {lead.pk} has no address"
+    return None
+
+
+class LeadConversion:
+    """
+    Converts a list of `{"leadId", "installationDate", "warrantyYears"}` items
+    to customers in one transaction, like `LeadViewSet.convert` does for one.
+
+    Customers and their product links are written with `bulk_create` and the
+    leads are marked `won` and linked to them with one bulk UPDATE. All or nothing, like
+    `LeadBatch`: `errors` holds the problems of each item, by position.
+    """
+
+    def __init__(self, items):
+        self.items = items
+        self.errors = [{} for _ in items]
+
+    def is_valid(self):
+        serializer = BulkConvertLeadSerializer(data=self.items, many=True)
+        if not serializer.is_valid():
+            errors = serializer.errors
+            self.errors = [errors] * len(self.items) if isinstance(errors, dict) else errors
+            return False
+        self.validated = serializer.validated_data
+
+        ids = [item['leadId'] for item in self.validated]
+        self.leads = Lead.objects.in_bulk(ids)
+        seen = Counter(ids)
+        for idx, lead_id in enumerate(ids):
+            lead = self.leads.get(lead_id)
+            if lead is None:
+                self.errors[idx] = {'leadId': [f"Lead with id {lead_id} not found"]}
+            elif seen[lead_id] > 1:
+                self.errors[idx] = {'leadId': [f"Lead {lead_id} appears more than once in the batch"]}
+            elif conversion_error(lead):
+                self.errors[idx] = {'leadId': [conversion_error(lead)]}
+        return not any(self.errors)
+
+    def save(self):
+        """Create the customers and return them, in the order of the items"""
+        leads = [self.leads[item['leadId']] for item in self.validated]
+        customers = [
+            Customer(
+                name=lead.name,
+                phone=lead.phone,
+                email=lead.email,
+                area=lead.area,
+                address=lead.address,
+                installation_date=item['installationDate'],
+                expiry_date=item['installationDate'] + relativedelta(years=item['warrantyYears']),
+                amount=0,
+                status='active',
+                sales_rep=lead.sales_rep,
+                notes=lead.notes
+            )
+            for lead, item in zip(leads, self.validated)
+        ]
+
+        with transaction.atomic(), manual_sync():
+            Customer.objects.bulk_create(customers)
+
+            customer_ids = {lead.pk: customer.pk for lead, customer in zip(leads, customers)}
+            CustomerProducts.objects.bulk_create(
+                CustomerProducts(customer_id=customer_ids[lead_id], product_id=product_id)
+                for lead_id, product_id in
+                ProductInterests.objects.filter(lead_id__in=customer_ids).values_list('lead_id', 'product_id')
+            )
+            reindex_on_commit(Customer, *customer_ids.values())
+
+            # The status isn't part of the search document, only of the stats
+            deltas = Counter()
+            for lead in leads:
+                count_lead(deltas, lead, -1)
+                lead.status = 'won'
+                lead.customer_id = customer_ids[lead.pk]
+                count_lead(deltas, lead)
+            Lead.objects.bulk_update(leads, ['status', 'customer'])
+            apply_deltas(deltas)
+
+        by_id = Customer.objects.prefetch_related('products__product').in_bulk(customer_ids.values())
+        return [by_id[customer.pk] for customer in customers]
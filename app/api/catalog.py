@@ -0,0 +1,68 @@
+from threading import Lock
+from uuid import uuid4
+
+from django.core.cache import cache
+from django.db.models import Count, Prefetch
+
+from .models import Category, SubCategory, Product
+from .renderers import ORJSONRenderer
+from .serializers import CategorySerializer, SubCategorySerializer, ProductSerializer
+
+
+CATALOG_VERSION_KEY = 'catalog-version'
+
+# Rendered snapshot per version, held by this process; only the latest is kept
+_snapshots = {}
+_snapshots_lock = Lock()
+
+
+def catalog_version():
+    """
+    Current catalog version. It lives in the shared cache so a write handled
+    by one worker invalidates the snapshots held by all of them.
+    """
+    version = cache.get(CATALOG_VERSION_KEY)
+    if version is None:
+        cache.add(CATALOG_VERSION_KEY, uuid4().hex, None)
+        version = cache.get(CATALOG_VERSION_KEY)
+    return version
+
+
+def bump_catalog_version():
+    cache.set(CATALOG_VERSION_KEY, uuid4().hex, None)
+
+
+def build_catalog():
+    """Category → subcategory → product tree, in three queries"""
+    products = Product.objects.order_by('name')
+    subcategories = SubCategory.objects.annotate(num_products=Count('products')).order_by('name').prefetch_related(
+        Prefetch('products', queryset=products)
+    )
+    categories = Category.objects.annotate(num_subcategories=Count('subcategories')).order_by('name').prefetch_related(
+        Prefetch('subcategories', queryset=subcategories)
+    )
+
+    tree = []
+    for category in categories:
+        subcategory_nodes = []
+        for subcategory in category.subcategories.all():
+            node = SubCategorySerializer(subcategory).data
+            node['products'] = ProductSerializer(subcategory.products.all(), many=True).data
+            subcategory_nodes.append(node)
+        node = CategorySerializer(category).data
+        node['subCategories'] = subcategory_nodes
+        tree.append(node)
+    return tree
+
+
+def catalog_snapshot(version):
+    """Rendered JSON body of the catalog for `version`, built on first use"""
+    snapshot = _snapshots.get(version)
+    if snapshot is None:
+        with _snapshots_lock:
+            snapshot = _snapshots.get(version)
+            if snapshot is None:
+                snapshot = ORJSONRenderer().render({'version': version, 'categories': build_catalog()})
+                _snapshots.clear()
+                _snapshots[version] = snapshot
+    return snapshot
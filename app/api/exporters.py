@@ -0,0 +1,94 @@
+import csv
+from tempfile import TemporaryFile
+
+from dateutil.relativedelta import relativedelta
+from django.http import FileResponse, StreamingHttpResponse
+from django.utils import timezone
+from openpyxl import Workbook
+
+
+EXPORT_CHUNK_SIZE = 2000
+
+XLSX_CONTENT_TYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+
+def product_names(products):
+    return ','.join(sorted(product.name for product in products))
+
+
+# Headers match what the `upload` actions read, so an export can be re-imported
+LEAD_COLUMNS = [
+    ('name', lambda lead: lead.name),
+    ('phone', lambda lead: lead.phone),
+    ('email', lambda lead: lead.email),
+    ('area', lambda lead: lead.area),
+    ('address', lambda lead: lead.address),
+    ('status', lambda lead: lead.status),
+    ('source', lambda lead: lead.source),
+    ('priority', lambda lead: lead.priority),
+    ('notes', lambda lead: lead.notes),
+    ('salesRep', lambda lead: lead.sales_rep),
+    ('followUpDate', lambda lead: lead.follow_up_date),
+    ('products', lambda lead: product_names(interest.product for interest in lead.interests.all())),
+]
+
+CUSTOMER_COLUMNS = [
+    ('name', lambda customer: customer.name),
+    ('phone', lambda customer: customer.phone),
+    ('email', lambda customer: customer.email),
+    ('area', lambda customer: customer.area),
+    ('address', lambda customer: customer.address),
+    ('installationDate', lambda customer: customer.installation_date),
+    ('warrantyYears', lambda customer: relativedelta(customer.expiry_date, customer.installation_date).years),
+    ('amount', lambda customer: customer.amount),
+    ('status', lambda customer: customer.status),
+    ('salesRep', lambda customer: customer.sales_rep),
+    ('notes', lambda customer: customer.notes),
+    ('products', lambda customer: product_names(item.product for item in customer.products.all())),
+]
+
+
+def iter_export_rows(queryset, columns):
+    yield [header for header, _ in columns]
+    for obj in queryset.iterator(chunk_size=EXPORT_CHUNK_SIZE):
+        yield [value(obj) for _, value in columns]
+
+
+class Echo:
+    """File-like object handing each written csv line straight back to the caller"""
+
+    def write(self, value):
+        return value
+
+
+def export_csv(queryset, columns, filename):
+    writer = csv.writer(Echo())
+    response = StreamingHttpResponse(
+        (writer.writerow(row) for row in iter_export_rows(queryset, columns)),
+        content_type='text/csv',
+    )
+    response['Content-Disposition'] = f'attachment; filename="{filename}.csv"'
+    return response
+
+
+def export_xlsx(queryset, columns, filename):
+    # Not streamed: an xlsx file is a zip whose directory comes last, so the
+    # whole workbook is written before the first byte goes out. Write-only
+    # workbooks spill rows to disk as they are appended and the saved file
+    # is sent back in blocks, so memory still stays flat.
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet()
+    for row in iter_export_rows(queryset, columns):
+        ws.append(row)
+
+    file = TemporaryFile()
+    wb.save(file)
+    file.seek(0)
+    return FileResponse(file, as_attachment=True, filename=f'{filename}.xlsx', content_type=XLSX_CONTENT_TYPE)
+
+
+def export_spreadsheet(queryset, columns, name, file_type):
+    filename = f"{name}-{timezone.localdate():%Y%m%d}"
+    if file_type == 'csv':
+        return export_csv(queryset, columns, filename)
+    return export_xlsx(queryset, columns, filename)
@@ -0,0 +1,222 @@
+from abc import ABC, abstractmethod
+from datetime import datetime
+from dateutil.relativedelta import relativedelta
+
+from django.db import DatabaseError, transaction
+from openpyxl import load_workbook
+
+from .models import Product, Lead, ProductInterests, Customer, CustomerProducts
+from .search import SEARCH_INDEXES
+from .stats import count_leads
+
+
+IMPORT_CHUNK_SIZE = 500
+
+
+def iter_sheet_rows(file):
+    """Stream (row number, {header: value}) pairs from the active sheet"""
+    wb = load_workbook(file, read_only=True)
+    try:
+        rows = wb.active.iter_rows(values_only=True)
+        headers = next(rows, ())
+        for idx, row in enumerate(rows, start=2):
+            yield idx, dict(zip(headers, row))
+    finally:
+        wb.close()
+
+
+def product_name_map():
+    """Map every product name to its id, first created product wins like `.first()` did"""
+    products = {}
+    for name, product_id in Product.objects.order_by('id').values_list('name', 'id'):
+        products.setdefault(name, product_id)
+    return products
+
+
+class SpreadsheetImporter(ABC):
+    """
+    Imports spreadsheet rows in chunks.
+
+    Rows are built and validated one by one so every bad row is reported with
+    its number, then each chunk of valid rows is written with `bulk_create`
+    inside a single transaction. If the database still rejects a chunk, its
+    rows are retried one at a time so only the offending rows fail.
+    """
+    kind = None
+    model = None
+    link_model = None
+    link_field = None
+    chunk_size = IMPORT_CHUNK_SIZE
+
+    def __init__(self, on_progress=None):
+        self.on_progress = on_progress
+        self.products = product_name_map()
+        self.imported = 0
+        self.failed = 0
+        self.errors = []
+
+    @property
+    def processed(self):
+        return self.imported + self.failed
+
+    @abstractmethod
+    def build(self, data):
+        """Return an unsaved instance and the product ids to link to it"""
+
+    def resolve_products(self, names):
+        """Product ids of a comma separated cell; a blank cell, as exported for no products, links none"""
+        if names is None or not str(names).strip():
+            return []
+        product_ids = []
+        for product_name in str(names).split(','):
+            product_id = self.products.get(product_name)
+            if product_id is None:
+                raise Exception(f"Product `{product_name}` not found")
+            product_ids.append(product_id)
+        return product_ids
+
+    def validate(self, instance):
+        for field in instance._meta.concrete_fields:
+            if field.primary_key or getattr(field, 'auto_now_add', False):
+                continue
+            value = getattr(instance, field.attname)
+            if value is None:
+                if not field.null:
+                    raise Exception(f"`{field.name}` is required")
+                continue
+            setattr(instance, field.attname, field.to_python(value))
+
+    def run(self, file):
+        chunk = []
+        for idx, data in iter_sheet_rows(file):
+            try:
+                instance, product_ids = self.build(data)
+                self.validate(instance)
+            except Exception as e:
+                self.fail(idx, e)
+                continue
+
+            chunk.append((idx, instance, product_ids))
+            if len(chunk) >= self.chunk_size:
+                self.flush(chunk)
+                chunk = []
+
+        if chunk:
+            self.flush(chunk)
+        return self.report()
+
+    def flush(self, chunk):
+        try:
+            with transaction.atomic():
+                self.write(chunk)
+        except DatabaseError:
+            for row in chunk:
+                idx, instance, _ = row
+                instance.pk = None
+                instance._state.adding = True
+                try:
+                    with transaction.atomic():
+                        self.write([row])
+                except Exception as e:
+                    self.fail(idx, e)
+                else:
+                    self.imported += 1
+        else:
+            self.imported += len(chunk)
+
+        if self.on_progress:
+            self.on_progress(self)
+
+    def write(self, rows):
+        instances = self.model.objects.bulk_create([instance for _, instance, _ in rows])
+        self.link_model.objects.bulk_create([
+            self.link_model(**{self.link_field: instance, 'product_id': product_id})
+            for instance, (_, _, product_ids) in zip(instances, rows)
+            for product_id in product_ids
+        ])
+        self.after_write(instances)
+
+    def after_write(self, instances):
+        SEARCH_INDEXES[self.model].update(instance.pk for instance in instances)
+
+    def fail(self, idx, error):
+        self.failed += 1
+        self.errors.append({'row': idx, 'error': str(error)})
+
+    def report(self):
+        return {
+            'success': True,
+            'imported': self.imported,
+            'failed': self.failed,
+            'errors': sorted(self.errors, key=lambda error: error['row']),
+        }
+
+
+class LeadImporter(SpreadsheetImporter):
+    kind = 'leads'
+    model = Lead
+    link_model = ProductInterests
+    link_field = 'lead'
+
+    def build(self, data):
+        lead_data = {
+            'name': data.get('name'),
+            'phone': data.get('phone'),
+            'email': data.get('email'),
+            'area': data.get('area'),
+            'address': data.get('address'),
+            'status': data.get('status', 'new'),
+            'source': data.get('source'),
+            'priority': data.get('priority', 'medium'),
+            'notes': data.get('notes'),
+            'sales_rep': data.get('salesRep'),
+        }
+
+        if data.get('followUpDate'):
+            lead_data['follow_up_date'] = data['followUpDate']
+
+        product_ids = self.resolve_products(data.get('products'))
+        return Lead(**lead_data), product_ids
+
+    def after_write(self, instances):
+        super().after_write(instances)
+        count_leads(instances)
+
+
+class CustomerImporter(SpreadsheetImporter):
+    kind = 'customers'
+    model = Customer
+    link_model = CustomerProducts
+    link_field = 'customer'
+
+    def build(self, data):
+        installation_date = data.get('installationDate')
+        warranty_years = data.get('warrantyYears', 2)
+
+        if isinstance(installation_date, str):
+            installation_date = datetime.strptime(installation_date, '%Y-%m-%d').date()
+
+        expiry_date = installation_date + relativedelta(years=warranty_years)
+
+        customer_data = {
+            'name': data.get('name'),
+            'phone': data.get('phone'),
+            'email': data.get('email'),
+            'area': data.get('area'),
+            'address': data.get('address'),
+            'installation_date': installation_date,
+            'expiry_date': expiry_date,
+            'amount': data.get('amount', 0),
+            'status': data.get('status', 'active'),
+            'sales_rep': data.get('salesRep'),
+            'notes': data.get('notes'),
+        }
+
+        product_ids = self.resolve_products(data.get('products', ''))
+        return Customer(**customer_data), product_ids
+
+
+IMPORTERS = {
+    'leads': LeadImporter,
+    'customers': CustomerImporter,
+}
@@ -0,0 +1,132 @@
+import heapq
+from collections import defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from itertools import count
+from time import perf_counter
+
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from rest_framework.response import Response
+
+
+# The metrics of the request being handled. Context variables follow the
+# request into the threads that run its ORM calls under ASGI.
+current_metrics = ContextVar('current_metrics', default=None)
+
+_query_order = count()
+
+
+class RequestMetrics:
+    """Timings collected while one request is handled"""
+
+    def __init__(self):
+        self.started = perf_counter()
+        self.queries = 0
+        self.db_time = 0.0
+        self.spans = defaultdict(float)
+        self.open_spans = set()
+        # Min-heap of (duration, order, sql) holding the slowest statements
+        self.slow_queries = []
+
+    def add_query(self, sql, duration):
+        self.queries += 1
+        self.db_time += duration
+        entry = (duration, next(_query_order), sql)
+        if len(self.slow_queries) < settings.SLOW_REQUEST_QUERIES:
+            heapq.heappush(self.slow_queries, entry)
+        elif duration > self.slow_queries[0][0]:
+            heapq.heapreplace(self.slow_queries, entry)
+
+    def slowest_queries(self):
+        return [
+            {'ms': round(duration * 1000, 2), 'sql': sql[:1000]}
+            for duration, _, sql in sorted(self.slow_queries, reverse=True)
+        ]
+
+
+@contextmanager
+def span(name):
+    """
+    Add the time spent in the block to the current request's `name` timing,
+    minus its SQL time, which is reported as `db`. Nested spans of the same
+    name only count once.
+    """
+    metrics = current_metrics.get()
+    if metrics is None or name in metrics.open_spans:
+        yield
+        return
+    metrics.open_spans.add(name)
+    db_time = metrics.db_time
+    started = perf_counter()
+    try:
+        yield
+    finally:
+        metrics.open_spans.discard(name)
+        metrics.spans[name] += perf_counter() - started - (metrics.db_time - db_time)
+
+
+def record_query(execute, sql, params, many, context):
+    metrics = current_metrics.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    started = perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        metrics.add_query(sql, perf_counter() - started)
+
+
+def instrument_connection(sender, connection, **kwargs):
+    # Sent on every (re)connect of the same per-thread wrapper
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+def install():
+    """Time every query for the current request"""
+    connection_created.connect(instrument_connection, dispatch_uid='api.instrumentation')
+
+
+def serialized(serializer):
+    """`serializer.data`, timed as the current request's `serialize`"""
+    with span('serialize'):
+        return serializer.data
+
+
+class TimedSerializationMixin:
+    """
+    DRF's list and retrieve, with the serializer's `.data` timed as
+    `serialize`. The other actions only show up in the total.
+    """
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(serialized(self.get_serializer(page, many=True)))
+        return Response(serialized(self.get_serializer(queryset, many=True)))
+
+    def retrieve(self, request, *args, **kwargs):
+        return Response(serialized(self.get_serializer(self.get_object())))
+
+
+def view_name(request):
+    """`LeadViewSet.list` for viewset actions, the view's name otherwise"""
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return None
+    func = match.func
+    actions = getattr(func, 'actions', None)
+    if actions:
+        return f"{func.cls.__name__}.{actions.get(request.method.lower(), request.method.lower())}"
+    return getattr(func, 'view_class', func).__name__
+
+
+def server_timing(metrics, total):
+    entries = [
+        f'total;dur={total * 1000:.1f}',
+        f'db;dur={metrics.db_time * 1000:.1f};desc="{metrics.queries} queries"',
+    ]
+    entries += [f'{name};dur={duration * 1000:.1f}' for name, duration in metrics.spans.items()]
+    return ', '.join(entries)
@@ -0,0 +1,74 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+from .importers import IMPORTERS
+from .models import ImportJob
+
+
+def claim_next_job():
+    """Take the oldest queued job, or None when the queue is empty"""
+    for job in ImportJob.objects.filter(status='queued').order_by('created_at', 'id'):
+        now = timezone.now()
+        claimed = ImportJob.objects.filter(pk=job.pk, status='queued').update(
+            status='running', started_at=now, heartbeat_at=now
+        )
+        # Another worker may have claimed it between the select and the update
+        if claimed:
+            job.refresh_from_db()
+            return job
+    return None
+
+
+def fail_stale_jobs():
+    """
+    Fail the running jobs whose worker stopped reporting for IMPORT_JOB_TIMEOUT
+    seconds, e.g. because it crashed or its container restarted. They are not
+    requeued: the chunks written before the crash are committed, so running
+    the file again would import those rows twice.
+    """
+    stale = ImportJob.objects.filter(
+        status='running', heartbeat_at__lt=timezone.now() - timedelta(seconds=settings.IMPORT_JOB_TIMEOUT)
+    )
+    failed = []
+    for job in stale:
+        updated = ImportJob.objects.filter(pk=job.pk, status='running', heartbeat_at=job.heartbeat_at).update(
+            status='failed',
+            finished_at=timezone.now(),
+            error=f'The import stopped after {job.processed_rows} rows; upload the remaining rows again',
+        )
+        if updated:
+            failed.append(job.pk)
+    return failed
+
+
+def report_progress(job, importer):
+    ImportJob.objects.filter(pk=job.pk).update(
+        processed_rows=importer.processed,
+        imported=importer.imported,
+        failed=importer.failed,
+        heartbeat_at=timezone.now(),
+    )
+
+
+def run_import_job(job):
+    importer = IMPORTERS[job.kind](on_progress=lambda importer: report_progress(job, importer))
+    try:
+        with job.file.open('rb') as file:
+            report = importer.run(file)
+    except Exception as e:
+        job.status = 'failed'
+        job.error = f'Failed to process file: {str(e)}'
+        job.errors = importer.errors
+    else:
+        job.status = 'done'
+        job.errors = report['errors']
+
+    job.processed_rows = importer.processed
+    job.imported = importer.imported
+    job.failed = importer.failed
+    job.finished_at = timezone.now()
+    job.file.delete(save=False)
+    job.save()
+    return job
@@ -0,0 +1,288 @@
+import json
+import os
+import platform
+import statistics
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from tempfile import TemporaryDirectory
+
+import django
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import CaptureQueriesContext, override_settings, setup_test_environment, teardown_test_environment
+from rest_framework.test import APIClient
+
+from api.models import User, Category, SubCategory, Product, Lead, Customer, ImportJob
+from api.seed import seed_dataset, upload_workbook
+
+
+BENCH_PASSWORD = 'bench-password'
+
+
+def percentile(samples, p):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * p))]
+
+
+def compare(results, baseline, threshold, min_delta_ms):
+    """
+    Lines describing each operation against `baseline`, and the regressions:
+    median latency (by at least `min_delta_ms`) or peak memory up by more
+    than `threshold`, or more queries.
+    """
+    lines, regressions = [], []
+    for name, current in results.items():
+        before = baseline.get(name)
+        if before is None:
+            lines.append(f"{name:<32} new")
+            continue
+        ratio = current['p50Ms'] / before['p50Ms'] if before['p50Ms'] else 1.0
+        problems = []
+        if ratio > 1 + threshold and current['p50Ms'] - before['p50Ms'] >= min_delta_ms:
+            problems.append(f"p50 {before['p50Ms']:.1f} -> {current['p50Ms']:.1f} ms")
+        if current['queries'] > before['queries']:
+            problems.append(f"queries {before['queries']} -> {current['queries']}")
+        if before['peakKib'] and current['peakKib'] > before['peakKib'] * (1 + threshold):
+            problems.append(f"peak memory {before['peakKib']} -> {current['peakKib']} KiB")
+        lines.append(f"{name:<32} {ratio:5.2f}x" + (f"  REGRESSION: {', '.join(problems)}" if problems else ''))
+        if problems:
+            regressions.append(name)
+    for name in sorted(baseline.keys() - results.keys()):
+        lines.append(f"{name:<32} missing from this run")
+    return lines, regressions
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark the API on a freshly seeded test database: latency percentiles, SQL queries "
+        "and peak memory per operation, written to JSON and optionally compared with a baseline"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--leads', type=int, default=5000, help="Leads seeded before the run")
+        parser.add_argument('--customers', type=int, default=5000, help="Customers seeded before the run")
+        parser.add_argument('--seed', type=int, default=0, help="Random seed of the dataset")
+        parser.add_argument('--repeat', type=int, default=30, help="Timed runs per read operation")
+        parser.add_argument(
+            '--upload-rows', default='1000,10000,50000',
+            help="Comma separated spreadsheet sizes for the lead and customer uploads ('' to skip)"
+        )
+        parser.add_argument('--upload-repeat', type=int, default=1, help="Timed runs per upload size")
+        parser.add_argument('--only', default='', help="Only run operations whose name contains this")
+        parser.add_argument(
+            '--database-file',
+            help="SQLite file of the throwaway database (default: a temporary file; overwritten and deleted)"
+        )
+        parser.add_argument('--output', help="Write the results to this JSON file")
+        parser.add_argument('--baseline', help="JSON file of an earlier run to compare with")
+        parser.add_argument(
+            '--threshold', type=float, default=0.25,
+            help="Relative slow-down (or memory growth) flagged as a regression"
+        )
+        parser.add_argument(
+            '--min-delta-ms', type=float, default=5.0,
+            help="Smaller slow-downs are within run-to-run noise and never flagged"
+        )
+
+    def handle(self, *args, **options):
+        if options['database_file'] and connection.vendor != 'sqlite':
+            raise CommandError("--database-file only applies to SQLite")
+        baseline = None
+        if options['baseline']:
+            with open(options['baseline']) as file:
+                stored = json.load(file)
+            if stored['meta']['options'] != self.meta(options)['options']:
+                self.stderr.write(f"Warning: {options['baseline']} was run with different options: {stored['meta']['options']}")
+            baseline = {name: result for name, result in stored['results'].items() if options['only'] in name}
+
+        # A throwaway database, a private cache so the cached users and
+        # catalog of the seeded rows never reach the real cache, and metrics
+        # kept out of the server's METRICS_DIR. SQLite test
+        # databases default to memory, where the pragmas, WAL and fsync of
+        # the production file never apply, so it gets a file.
+        test_settings = connection.settings_dict['TEST']
+        old_test_name = test_settings['NAME']
+        with TemporaryDirectory() as directory:
+            if connection.vendor == 'sqlite':
+                test_settings['NAME'] = options['database_file'] or os.path.join(directory, 'bench.sqlite3')
+            setup_test_environment()
+            old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+            self.test_database = self.describe_database()
+            try:
+                with override_settings(
+                    CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}},
+                    METRICS_DIR=os.path.join(directory, 'metrics'),
+                ):
+                    results = self.run(options)
+            finally:
+                connection.creation.destroy_test_db(old_name, verbosity=0)
+                teardown_test_environment()
+                test_settings['NAME'] = old_test_name
+
+        if options['output']:
+            with open(options['output'], 'w') as file:
+                json.dump({'meta': self.meta(options), 'results': results}, file, indent=2)
+            self.stdout.write(f"Results written to {options['output']}")
+
+        if baseline is not None:
+            lines, regressions = compare(results, baseline, options['threshold'], options['min_delta_ms'])
+            self.stdout.write(f"\nCompared with {options['baseline']} (threshold {options['threshold']:.0%}):")
+            for line in lines:
+                self.stdout.write(line)
+            if regressions:
+                raise CommandError(f"{len(regressions)} operation(s) regressed: {', '.join(regressions)}")
+
+    def meta(self, options):
+        return {
+            'createdAt': datetime.now(timezone.utc).isoformat(),
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'database': connection.vendor,
+            'testDatabase': getattr(self, 'test_database', None),
+            'machine': platform.machine(),
+            'options': {
+                name: options[name]
+                for name in ('leads', 'customers', 'seed', 'repeat', 'upload_rows', 'upload_repeat')
+            },
+        }
+
+    def describe_database(self):
+        """Where the throwaway database lives, and for SQLite the journal mode it runs with"""
+        if connection.vendor != 'sqlite':
+            return {'name': connection.settings_dict['NAME']}
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA journal_mode')
+            journal_mode = cursor.fetchone()[0]
+        return {
+            'name': connection.settings_dict['NAME'],
+            'inMemory': connection.is_in_memory_db(),
+            'journalMode': journal_mode,
+        }
+
+    def run(self, options):
+        started = time.perf_counter()
+        seed_dataset(options['leads'], options['customers'], options['seed'])
+        admin = User.objects.create_user(
+            username='bench', email='bench@honeydrop.com', password=BENCH_PASSWORD, name='Bench', role='admin'
+        )
+        ImportJob.objects.bulk_create([
+            ImportJob(kind=kind, file=f'imports/{kind}.xlsx', status='done', created_by=admin)
+            for kind in ('leads', 'customers') for _ in range(10)
+        ])
+        self.stdout.write(
+            f"Seeded {options['leads']} leads and {options['customers']} customers "
+            f"({connection.vendor}) in {time.perf_counter() - started:.1f}s"
+        )
+
+        client = APIClient()
+        token = client.post('/api/auth/login', {'username': admin.email, 'password': BENCH_PASSWORD}).data['token']
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+
+        results = {}
+        for name, request, expected, repeat, warm_up in self.operations(client, admin, options):
+            if options['only'] not in name:
+                continue
+            results[name] = result = self.measure(request, expected, repeat, warm_up)
+            self.stdout.write(
+                f"{name:<32} p50 {result['p50Ms']:9.1f} ms | p95 {result['p95Ms']:9.1f} ms | "
+                f"p99 {result['p99Ms']:9.1f} ms | {result['queries']:5} queries | {result['peakKib']:8} KiB peak"
+            )
+        return results
+
+    def operations(self, client, admin, options):
+        """(name, request, expected status, timed runs, warm up) for every benchmarked operation"""
+        repeat = options['repeat']
+        middle = lambda model: model.objects.order_by('pk').values_list('pk', flat=True)[model.objects.count() // 2]
+        category = Category.objects.order_by('pk').first()
+
+        viewsets = [
+            ('users', User, 'Bench', 'role=admin'),
+            ('categories', Category, 'Kitchen', 'status=active'),
+            ('subcategories', SubCategory, 'Split', f'category={category.pk}'),
+            ('products', Product, 'Split', 'status=active'),
+            ('leads', Lead, 'Sharma', 'status=qualified&area=Thane'),
+            ('customers', Customer, 'Patel', 'status=active&area=Thane'),
+            ('imports', ImportJob, None, 'kind=leads'),
+        ]
+        for prefix, model, search, filters in viewsets:
+            pk = middle(model)
+            yield f'{prefix}.list', lambda prefix=prefix: client.get(f'/api/{prefix}'), 200, repeat, True
+            yield f'{prefix}.retrieve', lambda prefix=prefix, pk=pk: client.get(f'/api/{prefix}/{pk}'), 200, repeat, True
+            if search:
+                yield (
+                    f'{prefix}.search', lambda prefix=prefix, search=search: client.get(f'/api/{prefix}?search={search}'),
+                    200, repeat, True
+                )
+            yield (
+                f'{prefix}.filter', lambda prefix=prefix, filters=filters: client.get(f'/api/{prefix}?{filters}'),
+                200, repeat, True
+            )
+
+        # Every run converts a lead that hasn't been converted yet
+        unconverted = iter(Lead.objects.exclude(status='won').order_by('pk').values_list('pk', flat=True))
+        yield (
+            'leads.convert',
+            lambda: client.post(
+                f'/api/leads/{next(unconverted)}/convert', {'installationDate': '2025-06-01', 'warrantyYears': 2},
+                format='json'
+            ),
+            201, repeat, True
+        )
+
+        anonymous = APIClient()
+        yield (
+            'auth.login',
+            lambda: anonymous.post('/api/auth/login', {'username': admin.email, 'password': BENCH_PASSWORD}),
+            200, min(repeat, 10), True
+        )
+
+        for rows in [int(rows) for rows in options['upload_rows'].split(',') if rows]:
+            for kind in ('leads', 'customers'):
+                file = upload_workbook(kind, rows, options['seed'])
+
+                def upload(kind=kind, file=file):
+                    file.seek(0)
+                    return client.post(f'/api/{kind}/upload', {'file': file}, format='multipart')
+
+                # Too slow at the larger sizes for an extra warm-up run
+                yield f'{kind}.upload.{rows}', upload, 200, options['upload_repeat'], False
+
+    def measure(self, request, expected, repeat, warm_up=True):
+        """
+        Time `repeat` runs of `request`, after an untimed run recording peak
+        memory, itself preceded by a warm-up run unless `warm_up` is false.
+        """
+        if warm_up:
+            self.check_response(request(), expected)
+        tracemalloc.start()
+        try:
+            self.check_response(request(), expected)
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+        samples, queries = [], 0
+        for _ in range(repeat):
+            with CaptureQueriesContext(connection) as captured:
+                started = time.perf_counter()
+                response = request()
+                samples.append(time.perf_counter() - started)
+            self.check_response(response, expected)
+            queries = max(queries, len(captured))
+
+        return {
+            'runs': repeat,
+            'p50Ms': round(statistics.median(samples) * 1000, 3),
+            'p95Ms': round(percentile(samples, 0.95) * 1000, 3),
+            'p99Ms': round(percentile(samples, 0.99) * 1000, 3),
+            'meanMs': round(statistics.fmean(samples) * 1000, 3),
+            'queries': queries,
+            'peakKib': peak // 1024,
+        }
+
+    def check_response(self, response, expected):
+        if response.status_code != expected:
+            raise CommandError(f"{response.request['PATH_INFO']} returned {response.status_code}: {response.content[:200]}")
+        if isinstance(response.data, dict) and response.data.get('failed'):
+            raise CommandError(f"{response.request['PATH_INFO']} failed rows: {response.data['errors'][:3]}")
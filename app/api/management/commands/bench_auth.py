@@ -0,0 +1,72 @@
+import os
+import statistics
+import time
+from tempfile import TemporaryDirectory
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import override_settings, setup_test_environment, teardown_test_environment
+from rest_framework.test import APIRequestFactory
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.tokens import AccessToken
+
+from api.authentication import CachedJWTAuthentication
+from api.models import User
+
+
+class Command(BaseCommand):
+    help = (
+        "Time the authentication of a JWT request: the stock JWTAuthentication, which loads the user row, "
+        "against CachedJWTAuthentication on the shared file cache and on a per-process locmem cache"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=2000, help="Requests authenticated per configuration")
+
+    def handle(self, *args, **options):
+        # A throwaway database in a file, so the user SELECT pays what it
+        # does on the production SQLite file, and caches in a temporary
+        # directory or this process, never the server's
+        test_settings = connection.settings_dict['TEST']
+        old_test_name = test_settings['NAME']
+        with TemporaryDirectory() as directory:
+            if connection.vendor == 'sqlite':
+                test_settings['NAME'] = os.path.join(directory, 'bench.sqlite3')
+            setup_test_environment()
+            old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+            try:
+                user = User.objects.create_user(
+                    username='bench@honeydrop.com', email='bench@honeydrop.com', password='bench', name='Bench'
+                )
+                request = APIRequestFactory().get('/api/leads', HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(user)}')
+                configs = [
+                    ('database', JWTAuthentication(), {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}),
+                    ('file cache', CachedJWTAuthentication(), {
+                        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+                        'LOCATION': os.path.join(directory, 'cache'),
+                    }),
+                    ('locmem', CachedJWTAuthentication(), {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}),
+                ]
+                timings = {}
+                for label, authenticator, cache in configs:
+                    with override_settings(CACHES={'default': cache}):
+                        timings[label] = self.time(authenticator, request, options['repeat'])
+            finally:
+                connection.creation.destroy_test_db(old_name, verbosity=0)
+                teardown_test_environment()
+                test_settings['NAME'] = old_test_name
+
+        self.stdout.write(
+            f"{connection.vendor}, {options['repeat']} requests each, median: "
+            + ' | '.join(f"{label} {seconds * 1e6:.0f} us" for label, seconds in timings.items())
+        )
+
+    def time(self, authenticator, request, repeat):
+        # The first request fills the cache
+        authenticator.authenticate(request)
+        samples = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            authenticator.authenticate(request)
+            samples.append(time.perf_counter() - started)
+        return statistics.median(samples)
@@ -0,0 +1,76 @@
+import random
+import statistics
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.http import HttpResponse, StreamingHttpResponse
+from django.test import RequestFactory
+
+from api.middleware import ENCODERS, CompressionMiddleware
+from api.renderers import ORJSONRenderer
+from api.management.commands.bench_json import customer_page, lead_page, lead_values
+
+
+def csv_rows(rows, seed=0):
+    rng = random.Random(seed)
+    yield b'name,phone,email,area,address,status,source,priority,notes,salesRep,followUpDate,products\r\n'
+    for _ in range(rows):
+        lead = lead_values(rng)
+        yield (
+            f'{lead["name"]},{lead["phone"]},{lead["email"]},{lead["area"]},"{lead["address"]}",{lead["status"]},'
+            f'walk-in,medium,"{lead["notes"]}",{lead["salesRep"]},{lead["followUpDate"]},"AC,Fridge"\r\n'
+        ).encode()
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure bytes on the wire and compression time of list pages with each encoding "
+        "CompressionMiddleware offers, and estimate their latency on a slow link"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=30, help="Rows per JSON page (the default page size)")
+        parser.add_argument('--export-rows', type=int, default=5000, help="Rows in the streamed CSV export")
+        parser.add_argument('--repeat', type=int, default=50, help="Runs timed per page and encoding")
+        parser.add_argument('--mbps', type=float, default=1.5, help="Link speed assumed by the latency estimate")
+
+    def handle(self, *args, **options):
+        renderer = ORJSONRenderer()
+        pages = [
+            (f"leads x{options['rows']}", lambda: HttpResponse(
+                renderer.render(lead_page(options['rows'], random.Random(0))), content_type='application/json')),
+            (f"customers x{options['rows']}", lambda: HttpResponse(
+                renderer.render(customer_page(options['rows'])), content_type='application/json')),
+            (f"leads x{options['rows'] * 10}", lambda: HttpResponse(
+                renderer.render(lead_page(options['rows'] * 10, random.Random(0))), content_type='application/json')),
+            (f"csv export x{options['export_rows']}", lambda: StreamingHttpResponse(
+                csv_rows(options['export_rows']), content_type='text/csv')),
+        ]
+        middleware = CompressionMiddleware(lambda request: None)
+        factory = RequestFactory()
+        bytes_per_second = options['mbps'] * 1_000_000 / 8
+
+        self.stdout.write(
+            f"threshold {settings.COMPRESSION_MIN_SIZE} B, link {options['mbps']} Mbit/s, "
+            f"encodings available: {', '.join(ENCODERS)}\n"
+            f"est. latency = compress time + size / link speed, computed, not measured over a network"
+        )
+        for name, make_response in pages:
+            self.stdout.write(f"{name}:")
+            for encoding in ['identity'] + list(ENCODERS):
+                request = factory.get('/api/leads', HTTP_ACCEPT_ENCODING=encoding)
+                samples, size = [], 0
+                for _ in range(options['repeat']):
+                    response = make_response()
+                    started = time.perf_counter()
+                    response = middleware.process_response(request, response)
+                    body = b''.join(response.streaming_content) if response.streaming else response.content
+                    samples.append(time.perf_counter() - started)
+                    size = len(body)
+
+                cpu = statistics.median(samples)
+                self.stdout.write(
+                    f"  {encoding:>8}: {size / 1024:9.1f} KiB | compress {cpu * 1000:7.2f} ms | "
+                    f"est. latency {(cpu + size / bytes_per_second) * 1000:8.1f} ms"
+                )
@@ -0,0 +1,95 @@
+import statistics
+import time
+from datetime import date, datetime, timezone
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.renderers import JSONRenderer
+
+from api.renderers import ORJSONRenderer
+from api.seed import FIRST_NAMES, LAST_NAMES, AREAS, NOTES
+
+
+def lead_values(rng):
+    """Varied lead fields; identical rows would compress far better than real pages"""
+    return {
+        'name': f'{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}',
+        'phone': f'9{rng.randrange(10 ** 9):09d}', 'email': f'user{rng.randrange(10 ** 6)}@example.com',
+        'area': rng.choice(AREAS), 'address': f'Flat {rng.randrange(1, 999)}, Building {rng.randrange(1, 60)}',
+        'status': rng.choice(['new', 'contacted', 'qualified']), 'notes': rng.choice(NOTES) or '',
+        'followUpDate': f'2025-{rng.randrange(1, 13):02d}-{rng.randrange(1, 29):02d}',
+        'salesRep': rng.choice(FIRST_NAMES),
+    }
+
+
+def lead_row(i, rng=None):
+    """Row `i` of a leads page, with the fields of `lead_values(rng)` when `rng` is given"""
+    row = {
+        'id': i, 'name': f'Lead {i}', 'phone': f'98{i:08d}', 'email': f'lead{i}@example.com',
+        'area': 'Andheri', 'address': 'Flat 12, Sunrise Apartments, Main Road',
+        'products': [{'id': 1, 'name': 'AC'}, {'id': 2, 'name': 'Fridge'}],
+        'status': 'new', 'source': 'walk-in', 'priority': 'medium',
+        'notes': 'Called twice, wants a demo — prefers evenings', 'followUpDate': '2025-02-01',
+        'salesRep': 'Ravi', 'createdAt': '2025-01-01T10:15:30.123456Z',
+    }
+    if rng is not None:
+        row.update(
+            lead_values(rng), id=100000 - i, products=row['products'][:rng.randrange(1, 3)],
+            createdAt=f'2025-01-{rng.randrange(1, 29):02d}T{rng.randrange(24):02d}:15:30.{rng.randrange(10 ** 6):06d}Z',
+        )
+    return row
+
+
+def lead_page(rows, rng=None):
+    """A /api/leads page as LeadSerializer returns it, of rows varied by `rng` if given"""
+    return {
+        'count': rows * 20,
+        'next': 'http://localhost/api/leads?limit=%d&offset=%d' % (rows, rows),
+        'previous': None,
+        'results': [lead_row(i, rng) for i in range(rows)],
+    }
+
+
+def customer_page(rows):
+    """Customers with the native Decimal/date/datetime values DRF also renders in reports"""
+    return [
+        {
+            'id': i, 'name': f'Customer {i}', 'amount': Decimal('45999.50'),
+            'installationDate': date(2025, 1, 1), 'expiryDate': date(2027, 1, 1),
+            'createdAt': datetime(2025, 1, 1, 10, 15, 30, 123456, tzinfo=timezone.utc),
+            'products': [{'id': 1, 'name': 'AC'}],
+        }
+        for i in range(rows)
+    ]
+
+
+class Command(BaseCommand):
+    help = "Compare the stock JSONRenderer with ORJSONRenderer on large list pages"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=1000, help="Rows per page")
+        parser.add_argument('--repeat', type=int, default=50, help="Renders timed per renderer and page")
+
+    def handle(self, *args, **options):
+        renderers = [('stock', JSONRenderer()), ('orjson', ORJSONRenderer())]
+        pages = [('leads', lead_page(options['rows'])), ('customers', customer_page(options['rows']))]
+
+        for page_name, data in pages:
+            outputs = {label: renderer.render(data) for label, renderer in renderers}
+            if outputs['stock'] != outputs['orjson']:
+                raise CommandError(f"Renderers disagree on the {page_name} page")
+
+            timings = {}
+            for label, renderer in renderers:
+                samples = []
+                for _ in range(options['repeat']):
+                    started = time.perf_counter()
+                    renderer.render(data)
+                    samples.append(time.perf_counter() - started)
+                timings[label] = statistics.median(samples)
+
+            self.stdout.write(
+                f"{page_name:>9} ({options['rows']} rows, {len(outputs['stock']) / 1024:.0f} KiB): "
+                + ' | '.join(f"{label} {seconds * 1000:.2f} ms" for label, seconds in timings.items())
+                + f" | {timings['stock'] / timings['orjson']:.1f}x"
+            )
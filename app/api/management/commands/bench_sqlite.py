@@ -0,0 +1,128 @@
+import os
+import random
+import sqlite3
+import statistics
+import tempfile
+import time
+from multiprocessing import Process, Queue
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+
+SCHEMA = """
+CREATE TABLE leads (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name VARCHAR(255) NOT NULL,
+    phone VARCHAR(20) NOT NULL,
+    area VARCHAR(255) NOT NULL,
+    status VARCHAR(20) NOT NULL,
+    notes TEXT,
+    created_at DATETIME NOT NULL
+);
+CREATE INDEX leads_created_idx ON leads (created_at, id);
+"""
+
+INSERT = "INSERT INTO leads (name, phone, area, status, notes, created_at) VALUES (?, ?, ?, ?, ?, ?)"
+
+PAGE = "SELECT id, name, phone, area, status, created_at FROM leads ORDER BY created_at DESC LIMIT 30 OFFSET ?"
+
+
+def connect(path, pragmas):
+    conn = sqlite3.connect(path, isolation_level=None)
+    for name, value in pragmas.items():
+        conn.execute(f'PRAGMA {name}={value}')
+    return conn
+
+
+def lead_rows(count, start=0):
+    for i in range(start, start + count):
+        yield (f'Lead {i}', f'98{i:08d}', 'Andheri', 'new', 'Imported from call centre sheet', f'2025-01-01 00:00:{i:09d}')
+
+
+def reader(path, pragmas, deadline, seed_rows, results):
+    conn = connect(path, pragmas)
+    latencies, errors = [], 0
+    while time.monotonic() < deadline:
+        started = time.perf_counter()
+        try:
+            conn.execute(PAGE, (random.randrange(max(seed_rows - 30, 1)),)).fetchall()
+        except sqlite3.OperationalError:
+            errors += 1
+            continue
+        latencies.append(time.perf_counter() - started)
+    results.put(('read', latencies, errors))
+
+
+def writer(path, pragmas, deadline, chunk, results):
+    conn = connect(path, pragmas)
+    written, errors, start = 0, 0, 10 ** 7
+    while time.monotonic() < deadline:
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            conn.executemany(INSERT, lead_rows(chunk, start + written))
+            conn.execute('COMMIT')
+            written += chunk
+        except sqlite3.OperationalError:
+            errors += 1
+            if conn.in_transaction:
+                conn.execute('ROLLBACK')
+    results.put(('write', written, errors))
+
+
+class Command(BaseCommand):
+    help = "Measure SQLite read throughput while an upload is writing, with default and with SQLITE_PRAGMAS"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=20000, help="Leads seeded before the run")
+        parser.add_argument('--readers', type=int, default=4, help="Concurrent reader processes, like gunicorn workers")
+        parser.add_argument('--seconds', type=float, default=5.0, help="Duration of each run")
+        parser.add_argument('--chunk', type=int, default=50, help="Rows per write transaction")
+
+    def handle(self, *args, **options):
+        configs = [('default', {}), ('tuned', settings.SQLITE_PRAGMAS)]
+        for label, pragmas in configs:
+            with tempfile.TemporaryDirectory() as directory:
+                result = self.run(os.path.join(directory, 'bench.sqlite3'), pragmas, options)
+            self.report(label, result, options)
+
+    def run(self, path, pragmas, options):
+        conn = connect(path, pragmas)
+        conn.executescript(SCHEMA)
+        conn.execute('BEGIN')
+        conn.executemany(INSERT, lead_rows(options['rows']))
+        conn.execute('COMMIT')
+        conn.close()
+
+        results = Queue()
+        deadline = time.monotonic() + options['seconds']
+        processes = [
+            Process(target=reader, args=(path, pragmas, deadline, options['rows'], results))
+            for _ in range(options['readers'])
+        ]
+        processes.append(Process(target=writer, args=(path, pragmas, deadline, options['chunk'], results)))
+        for process in processes:
+            process.start()
+        collected = [results.get() for _ in processes]
+        for process in processes:
+            process.join()
+
+        latencies = sorted(latency for kind, values, _ in collected if kind == 'read' for latency in values)
+        return {
+            'reads': len(latencies),
+            'read_errors': sum(errors for kind, _, errors in collected if kind == 'read'),
+            'latencies': latencies,
+            'written': sum(values for kind, values, _ in collected if kind == 'write'),
+            'write_errors': sum(errors for kind, _, errors in collected if kind == 'write'),
+        }
+
+    def report(self, label, result, options):
+        seconds = options['seconds']
+        latencies = result['latencies'] or [0]
+        p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+        self.stdout.write(
+            f"{label:>8}: {result['reads'] / seconds:9.0f} reads/s "
+            f"(p50 {statistics.median(latencies) * 1000:.2f} ms, p99 {p99 * 1000:.2f} ms, "
+            f"{result['read_errors']} errors) | "
+            f"{result['written'] / seconds:9.0f} rows/s written ({result['write_errors']} errors)"
+        )
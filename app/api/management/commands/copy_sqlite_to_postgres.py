@@ -0,0 +1,148 @@
+from django.apps import apps
+from django.core.management.base import BaseCommand, CommandError
+from django.core.management.color import no_style
+from django.db import connections, transaction
+
+from api.search import SEARCH_INDEXES
+
+
+def copy_order(models):
+    """Models sorted so every table comes after the tables its foreign keys point to"""
+    remaining = {model: {
+        field.related_model for field in model._meta.concrete_fields
+        if field.is_relation and field.related_model in models and field.related_model is not model
+    } for model in models}
+    ordered = []
+    while remaining:
+        ready = [model for model, depends_on in remaining.items() if not depends_on - set(ordered)]
+        if not ready:
+            raise CommandError(f"Circular foreign keys between {', '.join(m._meta.label for m in remaining)}")
+        for model in sorted(ready, key=lambda model: model._meta.label):
+            ordered.append(model)
+            del remaining[model]
+    return ordered
+
+
+class Command(BaseCommand):
+    help = (
+        "Stream every table from the SQLite database into PostgreSQL in chunks. Rows are upserted by "
+        "primary key, so a first copy can run while the app is live. The final run needs a short write "
+        "freeze (backend and import worker stopped): a full run with --prune carries over the rows "
+        "updated or deleted since, which --since-last cannot see."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--source', default='sqlite', help="Database alias to copy from")
+        parser.add_argument('--chunk', type=int, default=5000, help="Rows read and written per transaction")
+        parser.add_argument(
+            '--since-last', action='store_true',
+            help="Only copy rows whose primary key is above the highest one already in the target"
+        )
+        parser.add_argument(
+            '--prune', action='store_true',
+            help="Delete the target rows whose primary key is no longer in the source (final run)"
+        )
+        parser.add_argument(
+            '--truncate', action='store_true',
+            help="Empty the target tables first (first run; clears rows `migrate` created, e.g. content types)"
+        )
+
+    def handle(self, *args, **options):
+        if options['source'] not in connections:
+            raise CommandError("Set DATABASE_URL so both the 'sqlite' and the PostgreSQL databases are configured")
+
+        source, target = connections[options['source']], connections['default']
+        if target.vendor != 'postgresql':
+            raise CommandError(f"The default database is {target.vendor}, not PostgreSQL")
+
+        source_tables = set(source.introspection.table_names())
+        models = [
+            model for model in apps.get_models(include_auto_created=True)
+            if model._meta.managed and not model._meta.proxy and model._meta.db_table in source_tables
+        ]
+        models = copy_order(models)
+
+        if options['truncate']:
+            tables = ', '.join(target.ops.quote_name(model._meta.db_table) for model in models)
+            with target.cursor() as cursor:
+                cursor.execute(f'TRUNCATE {tables} CASCADE')
+
+        if options['prune']:
+            if options['since_last']:
+                raise CommandError("--prune is for a full final run, without --since-last")
+            # Children first, so no foreign key points at a deleted row
+            for model in reversed(models):
+                pruned = self.prune_model(model, options)
+                self.stdout.write(f"{model._meta.db_table}: {pruned} deleted rows removed")
+
+        for model in models:
+            copied = self.copy_model(model, options)
+            self.stdout.write(f"{model._meta.db_table}: {copied} rows")
+
+        with target.cursor() as cursor:
+            for sql in target.ops.sequence_reset_sql(no_style(), models):
+                cursor.execute(sql)
+
+        # Side tables that aren't models are rebuilt from the copied rows
+        for index in SEARCH_INDEXES.values():
+            with transaction.atomic():
+                index.rebuild()
+        self.stdout.write(self.style.SUCCESS("Copy complete"))
+
+    def copy_model(self, model, options):
+        connection = connections['default']
+        fields = model._meta.concrete_fields
+        pk = model._meta.pk
+
+        quote = connection.ops.quote_name
+        columns = ', '.join(quote(field.column) for field in fields)
+        updates = ', '.join(f'{quote(field.column)} = EXCLUDED.{quote(field.column)}' for field in fields if field is not pk)
+        sql = (
+            f'INSERT INTO {quote(model._meta.db_table)} ({columns}) VALUES ({", ".join(["%s"] * len(fields))}) '
+            f'ON CONFLICT ({quote(pk.column)}) DO ' + (f'UPDATE SET {updates}' if updates else 'NOTHING')
+        )
+
+        queryset = model._base_manager.using(options['source']).order_by('pk')
+        last = None
+        if options['since_last']:
+            last = model._base_manager.order_by('-pk').values_list('pk', flat=True).first()
+
+        copied = 0
+        while True:
+            # Keyset chunks keep memory flat and each read cheap, however large the table
+            chunk = queryset.filter(pk__gt=last) if last is not None else queryset
+            rows = list(chunk.values_list(*[field.attname for field in fields])[:options['chunk']])
+            if not rows:
+                return copied
+
+            params = [
+                [field.get_db_prep_save(value, connection) for field, value in zip(fields, row)]
+                for row in rows
+            ]
+            with transaction.atomic(), connection.cursor() as cursor:
+                cursor.executemany(sql, params)
+            copied += len(rows)
+            last = rows[-1][fields.index(pk)]
+
+    def prune_model(self, model, options):
+        """Delete the target rows whose primary key is gone from the source, chunk by chunk"""
+        connection = connections['default']
+        quote = connection.ops.quote_name
+        target = model._base_manager.using('default').order_by('pk').values_list('pk', flat=True)
+        source = model._base_manager.using(options['source'])
+
+        pruned, last = 0, None
+        while True:
+            pks = list((target.filter(pk__gt=last) if last is not None else target)[:options['chunk']])
+            if not pks:
+                return pruned
+            missing = set(pks) - set(source.filter(pk__in=pks).values_list('pk', flat=True))
+            if missing:
+                # Plain SQL: the rows' dependents are pruned by their own pass, no cascade or signals
+                with transaction.atomic(), connection.cursor() as cursor:
+                    cursor.execute(
+                        f'DELETE FROM {quote(model._meta.db_table)} WHERE {quote(model._meta.pk.column)} = ANY(%s)',
+                        [list(missing)],
+                    )
+            pruned += len(missing)
+            last = pks[-1]
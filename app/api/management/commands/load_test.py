@@ -0,0 +1,167 @@
+import asyncio
+import itertools
+import statistics
+import time
+from urllib.parse import urlsplit
+
+from django.core.management.base import BaseCommand, CommandError
+
+
+TRICKLE_BODY_SIZE = 16 * 1024
+
+
+async def read_response(reader):
+    """Read one HTTP/1.1 response, return (status, body size, keep-alive)"""
+    status_line = await reader.readline()
+    if not status_line:
+        raise ConnectionError("Connection closed")
+    status = int(status_line.split()[1])
+
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b'\n', b''):
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        headers[name.strip().lower()] = value.strip()
+
+    size = 0
+    if headers.get('transfer-encoding') == 'chunked':
+        while True:
+            chunk_size = int((await reader.readline()).split(b';')[0], 16)
+            if chunk_size:
+                size += len(await reader.readexactly(chunk_size))
+            await reader.readline()
+            if not chunk_size:
+                break
+    elif 'content-length' in headers:
+        size = len(await reader.readexactly(int(headers['content-length'])))
+    else:
+        size = len(await reader.read())
+    return status, size, headers.get('connection', '').lower() != 'close'
+
+
+class Client:
+    """One simulated user: a keep-alive connection sending requests back to back"""
+
+    def __init__(self, host, port, token):
+        self.host, self.port, self.token = host, port, token
+        self.reader = self.writer = None
+
+    async def request(self, path, trickle=0.0):
+        """
+        GET `path`, or with `trickle` seconds, POST a JSON body to it in small
+        pieces spread over that time, like an upload from a slow connection.
+        """
+        if self.writer is None:
+            self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+        headers = (
+            f"Host: {self.host}\r\nAccept-Encoding: identity\r\n"
+            + (f"Authorization: Bearer {self.token}\r\n" if self.token else '')
+        )
+        if trickle:
+            body = b'{}'.ljust(TRICKLE_BODY_SIZE)
+            self.writer.write(
+                f"POST {path} HTTP/1.1\r\n{headers}Content-Type: application/json\r\n"
+                f"Content-Length: {len(body)}\r\n\r\n".encode()
+            )
+            pieces = 20
+            for i in range(pieces):
+                self.writer.write(body[i * len(body) // pieces:(i + 1) * len(body) // pieces])
+                await self.writer.drain()
+                await asyncio.sleep(trickle / pieces)
+        else:
+            self.writer.write(f"GET {path} HTTP/1.1\r\n{headers}\r\n".encode())
+            await self.writer.drain()
+        status, size, keep_alive = await read_response(self.reader)
+        if not keep_alive:
+            self.close()
+        return status, size
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+        self.reader = self.writer = None
+
+
+class Command(BaseCommand):
+    help = (
+        "Load test a running server with concurrent keep-alive clients and report latency percentiles, "
+        "e.g. the WSGI and the ASGI (SERVER_MODE=asgi) deployments one after the other"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', default='http://127.0.0.1:8000', help="Server to test")
+        parser.add_argument('--token', default='', help="JWT access token sent as Bearer")
+        parser.add_argument(
+            '--path', action='append', dest='paths',
+            help="Path to request, repeatable; clients cycle through them (default /api/leads)"
+        )
+        parser.add_argument('--slow-path', action='append', dest='slow_paths', default=[],
+                            help="Path hit by the --slow-clients, e.g. an export")
+        parser.add_argument('--slow-clients', type=int, default=0, help="Clients looping over --slow-path")
+        parser.add_argument(
+            '--trickle', type=float, default=0.0,
+            help="Slow clients POST a body to --slow-path over this many seconds instead of a GET"
+        )
+        parser.add_argument('--concurrency', type=int, default=200, help="Concurrent clients")
+        parser.add_argument('--seconds', type=float, default=20.0, help="Duration of the run")
+        parser.add_argument('--timeout', type=float, default=60.0, help="Per-request timeout")
+
+    def handle(self, *args, **options):
+        url = urlsplit(options['url'])
+        if url.scheme != 'http' or not url.hostname:
+            raise CommandError("--url must be an http:// URL")
+        self.host, self.port = url.hostname, url.port or 80
+        results = asyncio.run(self.run(options))
+        self.report(results, options)
+
+    async def run(self, options):
+        paths = options['paths'] or ['/api/leads']
+        deadline = time.monotonic() + options['seconds']
+        results = {'fast': [], 'slow': [], 'errors': 0, 'statuses': {}}
+
+        async def user(client_paths, kind, offset, trickle=0.0):
+            client = Client(self.host, self.port, options['token'])
+            for path in itertools.islice(itertools.cycle(client_paths), offset, None):
+                if time.monotonic() >= deadline:
+                    break
+                started = time.perf_counter()
+                try:
+                    status, _ = await asyncio.wait_for(client.request(path, trickle), options['timeout'])
+                except (OSError, ConnectionError, asyncio.TimeoutError, asyncio.IncompleteReadError, ValueError):
+                    results['errors'] += 1
+                    client.close()
+                    continue
+                results['statuses'][status] = results['statuses'].get(status, 0) + 1
+                results[kind].append(time.perf_counter() - started)
+            client.close()
+
+        users = [user(paths, 'fast', i) for i in range(options['concurrency'])]
+        if options['slow_paths']:
+            users += [user(options['slow_paths'], 'slow', i, options['trickle']) for i in range(options['slow_clients'])]
+        await asyncio.gather(*users)
+        return results
+
+    def report(self, results, options):
+        self.stdout.write(
+            f"{options['url']}: {options['concurrency']} clients"
+            + (
+                f" + {options['slow_clients']} {'trickling to' if options['trickle'] else 'on'} "
+                f"{', '.join(options['slow_paths'])}" if options['slow_paths'] else ''
+            )
+            + f", {options['seconds']:.0f}s, statuses {results['statuses']}, {results['errors']} errors"
+        )
+        for kind in ('fast', 'slow'):
+            latencies = sorted(results[kind])
+            if not latencies:
+                continue
+
+            def percentile(p):
+                return latencies[min(len(latencies) - 1, int(len(latencies) * p))] * 1000
+
+            self.stdout.write(
+                f"  {kind}: {len(latencies) / options['seconds']:8.1f} req/s | "
+                f"p50 {statistics.median(latencies) * 1000:8.1f} ms | p95 {percentile(0.95):8.1f} ms | "
+                f"p99 {percentile(0.99):8.1f} ms | max {latencies[-1] * 1000:8.1f} ms"
+            )
@@ -0,0 +1,35 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from api.jobs import claim_next_job, fail_stale_jobs, run_import_job
+
+
+class Command(BaseCommand):
+    help = "Process queued lead/customer spreadsheet imports"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help="Drain the queue and exit instead of polling")
+        parser.add_argument('--sleep', type=float, default=2.0, help="Seconds to wait between polls of an empty queue")
+
+    def handle(self, *args, **options):
+        self.fail_stale_jobs()
+        while True:
+            job = claim_next_job()
+            if job is None:
+                if options['once']:
+                    return
+                time.sleep(options['sleep'])
+                # Also catches the jobs of other workers that died meanwhile
+                self.fail_stale_jobs()
+                continue
+
+            self.stdout.write(f"Processing {job.kind} import #{job.pk}")
+            job = run_import_job(job)
+            self.stdout.write(
+                f"Import #{job.pk} {job.status}: {job.imported} imported, {job.failed} failed"
+            )
+
+    def fail_stale_jobs(self):
+        for pk in fail_stale_jobs():
+            self.stderr.write(f"Import #{pk} failed: its worker stopped while processing it")
@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from api.models import LeadStat
+from api.stats import rebuild_lead_stats
+
+
+class Command(BaseCommand):
+    help = "Rebuild the lead statistics summary table from the leads table"
+
+    def handle(self, *args, **options):
+        rebuild_lead_stats()
+        self.stdout.write(f"Rebuilt lead_stats ({LeadStat.objects.count()} cells)")
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from api.search import SEARCH_INDEXES
+
+
+class Command(BaseCommand):
+    help = "Rebuild the lead and customer full-text search indexes from scratch"
+
+    def handle(self, *args, **options):
+        for model, index in SEARCH_INDEXES.items():
+            if not index.supported:
+                self.stdout.write(f"Skipping {index.table}: no full-text index on this database")
+                continue
+            with transaction.atomic():
+                index.rebuild()
+            self.stdout.write(f"Rebuilt {index.table} ({model.objects.count()} rows)")
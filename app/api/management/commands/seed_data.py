@@ -0,0 +1,67 @@
+import os
+import time
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from api.seed import (
+    SEED_CHUNK_SIZE, RowFactory, catalog_products, sales_rep_names, seed_dataset, write_workbook
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Generate a deterministic synthetic dataset: leads, customers and their products over a "
+        "category/product tree, inserted with chunked bulk_create, or written as upload xlsx files"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--leads', type=int, default=100000, help="Leads to generate")
+        parser.add_argument('--customers', type=int, default=50000, help="Customers to generate")
+        parser.add_argument('--seed', type=int, default=0, help="Random seed; the same seed gives the same rows")
+        parser.add_argument('--sales-reps', type=int, default=12, help="Sales users the rows are assigned to")
+        parser.add_argument(
+            '--end-date', type=date.fromisoformat,
+            help="Date of the newest rows, YYYY-MM-DD (default today); pin it to reproduce a dataset exactly"
+        )
+        parser.add_argument('--days', type=int, default=730, help="Days of history before --end-date")
+        parser.add_argument('--chunk-size', type=int, default=SEED_CHUNK_SIZE, help="Rows per bulk_create")
+        parser.add_argument(
+            '--xlsx', metavar='DIR',
+            help="Write leads.xlsx and customers.xlsx for the upload actions into DIR instead of the database"
+        )
+
+    def handle(self, *args, **options):
+        if options['leads'] < 0 or options['customers'] < 0 or options['chunk_size'] < 1:
+            raise CommandError("Counts must be positive")
+
+        self.started, self.chunk_size = time.perf_counter(), options['chunk_size']
+        if options['xlsx']:
+            self.write_files(options)
+        else:
+            self.stdout.write(f"Seeding {connection.vendor} database {connection.settings_dict['NAME']}")
+            seed_dataset(
+                options['leads'], options['customers'], seed=options['seed'], sales_reps=options['sales_reps'],
+                end=options['end_date'], days=options['days'], chunk_size=options['chunk_size'],
+                on_progress=self.progress,
+            )
+        self.stdout.write(self.style.SUCCESS(f"Done in {time.perf_counter() - self.started:.1f}s"))
+
+    def progress(self, model, done):
+        # Roughly every 100k rows
+        if done % 100000 < self.chunk_size:
+            self.stdout.write(f"  {model._meta.db_table}: {done} rows ({time.perf_counter() - self.started:.0f}s)")
+
+    def write_files(self, options):
+        os.makedirs(options['xlsx'], exist_ok=True)
+        # Product names of the seed catalog: create it in the target database
+        # first (e.g. `seed_data --leads 0 --customers 0`) so the uploads resolve them
+        factory = RowFactory(
+            options['seed'], catalog_products(), sales_rep_names(options['sales_reps']),
+            options['end_date'], options['days'],
+        )
+        for kind in ('leads', 'customers'):
+            path = os.path.join(options['xlsx'], f'{kind}.xlsx')
+            write_workbook(path, kind, options[kind], factory, options['chunk_size'])
+            self.stdout.write(f"Wrote {options[kind]} {kind} to {path}")
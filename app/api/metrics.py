@@ -0,0 +1,272 @@
+import math
+import mmap
+import os
+import re
+import struct
+import threading
+from functools import lru_cache
+
+from django.conf import settings
+from django.db.models import Count, F, Sum
+
+from .models import ImportJob
+
+
+# Upper bounds of the request latency histogram, in seconds
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, math.inf)
+
+METHODS = {'GET', 'HEAD', 'POST', 'PUT', 'PATCH', 'DELETE', 'OPTIONS'}
+
+# Metric families in exposition order: name -> (type, help)
+METRICS = {
+    'http_requests_total': ('counter', 'Requests by route, method and status'),
+    'http_request_duration_seconds': ('histogram', 'Request latency by route and method'),
+    'http_request_errors_total': ('counter', 'Requests answered with a 5xx status, by route and method'),
+    'http_request_db_queries_total': ('counter', 'SQL queries run by requests, by route and method'),
+    'http_request_db_seconds_total': ('counter', 'Time spent in SQL by requests, by route and method'),
+    'http_requests_in_flight': ('gauge', 'Requests being handled by live worker processes'),
+    'upload_rows_total': ('counter', 'Spreadsheet rows processed by uploads imported within the request, by kind'),
+    'upload_seconds_total': ('counter', 'Time spent processing uploads imported within the request, by kind'),
+    'import_jobs': ('gauge', 'Background import jobs by kind and status'),
+    'import_job_rows_total': ('counter', 'Spreadsheet rows processed by finished background import jobs, by kind'),
+    'import_job_seconds_total': ('counter', 'Run time of finished background import jobs, by kind'),
+}
+HISTOGRAM_SUFFIXES = ('_bucket', '_sum', '_count')
+
+IN_FLIGHT = 'http_requests_in_flight'
+
+USED = struct.Struct('<q')
+KEY_LENGTH = struct.Struct('<i')
+VALUE = struct.Struct('<d')
+
+
+def entries(data):
+    """(key, value, value offset) of every entry of a metrics file's contents"""
+    used = USED.unpack_from(data, 0)[0]
+    position = USED.size
+    while position < used:
+        length = KEY_LENGTH.unpack_from(data, position)[0]
+        key = bytes(data[position + KEY_LENGTH.size:position + KEY_LENGTH.size + length]).decode()
+        value_position = position + padded(KEY_LENGTH.size + length)
+        yield key, VALUE.unpack_from(data, value_position)[0], value_position
+        position = value_position + VALUE.size
+
+
+def padded(size):
+    return (size + 7) & ~7
+
+
+class MetricsFile:
+    """
+    Float samples by key in a memory-mapped file written by a single process.
+
+    The file holds the used size, then entries of key length, key (padded to
+    8 bytes) and value. Updating a sample is a write to memory, no system
+    call; new keys are appended and the used size is written last, so readers
+    in other processes never parse a half-written entry.
+    """
+    initial_size = 64 * 1024
+
+    def __init__(self, path):
+        self.lock = threading.Lock()
+        self.file = open(path, 'a+b')
+        if os.fstat(self.file.fileno()).st_size < self.initial_size:
+            self.file.truncate(self.initial_size)
+        self.map = mmap.mmap(self.file.fileno(), 0)
+        # A file left by an earlier process with the same pid is carried on
+        if not USED.unpack_from(self.map, 0)[0]:
+            USED.pack_into(self.map, 0, USED.size)
+        self.used = USED.unpack_from(self.map, 0)[0]
+        self.positions = {key: position for key, _, position in entries(self.map)}
+
+    def add(self, amounts):
+        """Add each (key, amount) pair to its sample"""
+        with self.lock:
+            for key, amount in amounts:
+                position = self.positions.get(key)
+                if position is None:
+                    position = self.append(key)
+                VALUE.pack_into(self.map, position, VALUE.unpack_from(self.map, position)[0] + amount)
+
+    def append(self, key):
+        encoded = key.encode()
+        value_position = self.used + padded(KEY_LENGTH.size + len(encoded))
+        end = value_position + VALUE.size
+        if end > len(self.map):
+            size = len(self.map)
+            while size < end:
+                size *= 2
+            self.map.close()
+            self.file.truncate(size)
+            self.map = mmap.mmap(self.file.fileno(), 0)
+        KEY_LENGTH.pack_into(self.map, self.used, len(encoded))
+        self.map[self.used + KEY_LENGTH.size:self.used + KEY_LENGTH.size + len(encoded)] = encoded
+        VALUE.pack_into(self.map, value_position, 0.0)
+        self.used = end
+        USED.pack_into(self.map, 0, end)
+        self.positions[key] = value_position
+        return value_position
+
+
+_files = {}
+_files_lock = threading.Lock()
+
+
+def process_file():
+    """This process's file in METRICS_DIR, opened after any fork"""
+    key = (os.getpid(), settings.METRICS_DIR)
+    metrics_file = _files.get(key)
+    if metrics_file is None:
+        with _files_lock:
+            metrics_file = _files.get(key)
+            if metrics_file is None:
+                os.makedirs(settings.METRICS_DIR, exist_ok=True)
+                path = os.path.join(settings.METRICS_DIR, f'{os.getpid()}.db')
+                metrics_file = _files[key] = MetricsFile(path)
+    return metrics_file
+
+
+def escape(value):
+    return str(value).replace('\\', r'\\').replace('"', r'\"').replace('\n', r'\n')
+
+
+def format_bound(bound):
+    return '+Inf' if bound == math.inf else repr(bound)
+
+
+@lru_cache(maxsize=1024)
+def request_keys(route, method):
+    """Sample keys of one route and method: (labels, duration buckets, sum, count, errors, queries, db time)"""
+    labels = f'route="{escape(route)}",method="{method}"'
+    return (
+        labels,
+        tuple(
+            f'http_request_duration_seconds_bucket{{{labels},le="{format_bound(bound)}"}}'
+            for bound in LATENCY_BUCKETS
+        ),
+        f'http_request_duration_seconds_sum{{{labels}}}',
+        f'http_request_duration_seconds_count{{{labels}}}',
+        f'http_request_errors_total{{{labels}}}',
+        f'http_request_db_queries_total{{{labels}}}',
+        f'http_request_db_seconds_total{{{labels}}}',
+    )
+
+
+@lru_cache(maxsize=256)
+def route_template(route):
+    """`api/users/(?P<pk>[^/.]+)$` -> `/api/users/<pk>`, like the path() routes read"""
+    route = re.sub(r'\(\?P<(\w+)>[^)]*\)', r'<\1>', route)
+    return '/' + re.sub(r'/\?\$?$|[\^$\\]', '', route)
+
+
+def route_name(request):
+    """The URL pattern the request matched, so paths with different ids count together"""
+    match = getattr(request, 'resolver_match', None)
+    return route_template(match.route) if match is not None else '<unmatched>'
+
+
+def track_in_flight(amount):
+    process_file().add([(IN_FLIGHT, amount)])
+
+
+def observe_request(route, method, status, duration, queries, db_time):
+    if method not in METHODS:
+        method = 'other'
+    labels, buckets, duration_sum, duration_count, errors, query_count, db_seconds = request_keys(route, method)
+    # Every bucket is touched so they are stored, and exposed, in order
+    amounts = [(key, 1 if duration <= bound else 0) for key, bound in zip(buckets, LATENCY_BUCKETS)]
+    amounts += [
+        (f'http_requests_total{{{labels},status="{status}"}}', 1),
+        (duration_sum, duration),
+        (duration_count, 1),
+        (query_count, queries),
+        (db_seconds, db_time),
+    ]
+    if status >= 500:
+        amounts.append((errors, 1))
+    process_file().add(amounts)
+
+
+def observe_upload(kind, rows, duration):
+    process_file().add([
+        (f'upload_rows_total{{kind="{kind}"}}', rows),
+        (f'upload_seconds_total{{kind="{kind}"}}', duration),
+    ])
+
+
+def import_job_totals():
+    """
+    Background import samples, read from the ImportJob rows at scrape time:
+    the jobs run in the import worker, a separate container.
+    """
+    totals = {}
+    rows = ImportJob.objects.order_by().values('kind', 'status').annotate(
+        jobs=Count('id'), rows=Sum('processed_rows'), duration=Sum(F('finished_at') - F('started_at')),
+    )
+    for row in rows:
+        kind = escape(row['kind'])
+        totals[f'import_jobs{{kind="{kind}",status="{escape(row["status"])}"}}'] = float(row['jobs'])
+        if row['status'] in ('done', 'failed'):
+            rows_key, seconds_key = f'import_job_rows_total{{kind="{kind}"}}', f'import_job_seconds_total{{kind="{kind}"}}'
+            totals[rows_key] = totals.get(rows_key, 0.0) + (row['rows'] or 0)
+            seconds = row['duration'].total_seconds() if row['duration'] is not None else 0.0
+            totals[seconds_key] = totals.get(seconds_key, 0.0) + seconds
+    return totals
+
+
+def family(name):
+    for suffix in HISTOGRAM_SUFFIXES:
+        if name.endswith(suffix) and name[:-len(suffix)] in METRICS:
+            return name[:-len(suffix)]
+    return name
+
+
+def process_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def collect(directory):
+    """
+    Sum the samples of every process file in `directory`. Counters of
+    workers that have exited still count; gauges only of live processes.
+    """
+    totals = {}
+    try:
+        filenames = sorted(os.listdir(directory))
+    except FileNotFoundError:
+        return totals
+    for filename in filenames:
+        pid, _, extension = filename.partition('.')
+        if extension != 'db' or not pid.isdigit():
+            continue
+        alive = int(pid) == os.getpid() or process_alive(int(pid))
+        with open(os.path.join(directory, filename), 'rb') as file:
+            data = file.read()
+        for key, value, _ in entries(data):
+            if not alive and METRICS[family(key.partition('{')[0])][0] == 'gauge':
+                continue
+            totals[key] = totals.get(key, 0.0) + value
+    return totals
+
+
+def format_value(value):
+    return str(int(value)) if value.is_integer() else repr(value)
+
+
+def exposition(totals):
+    """Samples in the Prometheus text format, grouped by metric family"""
+    samples = {name: [] for name in METRICS}
+    for key, value in totals.items():
+        samples[family(key.partition('{')[0])].append(f'{key} {format_value(value)}')
+    if not samples[IN_FLIGHT]:
+        samples[IN_FLIGHT].append(f'{IN_FLIGHT} 0')
+    lines = []
+    for name, (kind, description) in METRICS.items():
+        lines += [f'# HELP {name} {description}', f'# TYPE {name} {kind}', *samples[name]]
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,281 @@
+import logging
+import re
+import zlib
+from time import perf_counter
+
+import orjson
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.http import JsonResponse
+from django.utils.cache import patch_vary_headers
+from django.utils.deprecation import MiddlewareMixin
+
+from .instrumentation import RequestMetrics, current_metrics, server_timing, view_name
+from .metrics import observe_request, route_name, track_in_flight
+from .profiling import (
+    arequested_by_admin, finish_profile, profile_requested, requested_by_admin, save_profile, start_profile
+)
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - optional, gzip is always available
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover
+    zstandard = None
+
+
+COMPRESSIBLE_TYPES = re.compile(r'^(text/|application/(json|javascript|xml)|image/svg\+xml)')
+
+ACCEPT_ENCODING_RE = re.compile(r'\s*([\w*-]+)\s*(?:;\s*q\s*=\s*([\d.]+))?\s*')
+
+
+class GzipStream:
+    def __init__(self):
+        self.compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+
+    def compress(self, data):
+        return self.compressor.compress(data)
+
+    def finish(self):
+        return self.compressor.flush()
+
+
+class BrotliStream:
+    # Quality 5 compresses like gzip -9 at about the cost of gzip -6
+    def __init__(self):
+        self.compressor = brotli.Compressor(quality=5)
+
+    def compress(self, data):
+        return self.compressor.process(data)
+
+    def finish(self):
+        return self.compressor.finish()
+
+
+class ZstdStream:
+    def __init__(self):
+        self.compressor = zstandard.ZstdCompressor(level=3).compressobj()
+
+    def compress(self, data):
+        return self.compressor.compress(data)
+
+    def finish(self):
+        return self.compressor.flush()
+
+
+ENCODERS = {'gzip': GzipStream}
+if brotli is not None:
+    ENCODERS['br'] = BrotliStream
+if zstandard is not None:
+    ENCODERS['zstd'] = ZstdStream
+
+
+def negotiate_encoding(accept_encoding, preferred):
+    """The first of `preferred` (server order) the client accepts, if any"""
+    accepted = {}
+    for item in accept_encoding.split(','):
+        match = ACCEPT_ENCODING_RE.fullmatch(item)
+        if match:
+            try:
+                accepted[match[1].lower()] = float(match[2]) if match[2] else 1.0
+            except ValueError:
+                continue
+    for encoding in preferred:
+        if encoding in ENCODERS and accepted.get(encoding, accepted.get('*', 0)) > 0:
+            return encoding
+    return None
+
+
+def compress_sequence(encoding, sequence):
+    stream = ENCODERS[encoding]()
+    for chunk in sequence:
+        data = stream.compress(chunk)
+        if data:
+            yield data
+    yield stream.finish()
+
+
+async def compress_async_sequence(encoding, sequence):
+    stream = ENCODERS[encoding]()
+    async for chunk in sequence:
+        data = stream.compress(chunk)
+        if data:
+            yield data
+    yield stream.finish()
+
+
+class CompressionMiddleware(MiddlewareMixin):
+    """
+    Compress text and JSON responses with zstd, brotli or gzip, whichever
+    comes first in COMPRESSION_ENCODINGS among those the client accepts.
+
+    Bodies under COMPRESSION_MIN_SIZE bytes are sent as they are. Streaming
+    responses (the CSV exports) are compressed chunk by chunk as they are
+    produced; spreadsheets and other binary types are left alone.
+    """
+
+    def process_response(self, request, response):
+        if response.has_header('Content-Encoding') or response.status_code in (204, 304):
+            return response
+        if not COMPRESSIBLE_TYPES.match(response.get('Content-Type', '')):
+            return response
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+        if not response.streaming and len(response.content) < settings.COMPRESSION_MIN_SIZE:
+            return response
+
+        encoding = negotiate_encoding(request.META.get('HTTP_ACCEPT_ENCODING', ''), settings.COMPRESSION_ENCODINGS)
+        if encoding is None:
+            return response
+
+        if response.streaming:
+            if response.is_async:
+                response.streaming_content = compress_async_sequence(encoding, response.streaming_content)
+            else:
+                response.streaming_content = compress_sequence(encoding, response.streaming_content)
+            del response['Content-Length']
+        else:
+            stream = ENCODERS[encoding]()
+            compressed = stream.compress(response.content) + stream.finish()
+            if len(compressed) >= len(response.content):
+                return response
+            response.content = compressed
+            response['Content-Length'] = str(len(compressed))
+
+        # The encoded body differs byte for byte, so a strong ETag no longer holds
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response['ETag'] = 'W/' + etag
+        response['Content-Encoding'] = encoding
+        return response
+
+
+request_logger = logging.getLogger('api.requests')
+
+
+class InstrumentationMiddleware:
+    """
+    Measure each request: total time, SQL queries and their time, and the
+    serialization and rendering time outside of SQL (see api.instrumentation).
+
+    The numbers go out in a `Server-Timing` header. Requests slower than
+    SLOW_REQUEST_MS are also logged to `api.requests` as one JSON line with
+    the view, the timings and the slowest statements, and every request is
+    counted in the Prometheus metrics (api.metrics). Works under WSGI and
+    ASGI without switching threads.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        metrics = RequestMetrics()
+        token = current_metrics.set(metrics)
+        track_in_flight(1)
+        try:
+            response = self.get_response(request)
+        finally:
+            track_in_flight(-1)
+            current_metrics.reset(token)
+        return self.finish(request, response, metrics)
+
+    async def __acall__(self, request):
+        metrics = RequestMetrics()
+        token = current_metrics.set(metrics)
+        track_in_flight(1)
+        try:
+            response = await self.get_response(request)
+        finally:
+            track_in_flight(-1)
+            current_metrics.reset(token)
+        return self.finish(request, response, metrics)
+
+    def finish(self, request, response, metrics):
+        total = perf_counter() - metrics.started
+        response['Server-Timing'] = server_timing(metrics, total)
+        observe_request(
+            route_name(request), request.method, response.status_code, total, metrics.queries, metrics.db_time
+        )
+        if total * 1000 >= settings.SLOW_REQUEST_MS:
+            request_logger.warning(orjson.dumps({
+                'event': 'slow_request',
+                'method': request.method,
+                'path': request.path,
+                'view': view_name(request),
+                'status': response.status_code,
+                'user': getattr(getattr(request, 'user', None), 'pk', None),
+                'totalMs': round(total * 1000, 1),
+                'dbMs': round(metrics.db_time * 1000, 1),
+                'queries': metrics.queries,
+                **{f'{name}Ms': round(duration * 1000, 1) for name, duration in metrics.spans.items()},
+                'slowestQueries': metrics.slowest_queries(),
+            }).decode())
+        return response
+
+
+class ProfilerMiddleware:
+    """
+    Profile single requests of admins sending `X-Profile: 1` or `?profile=1`
+    with cProfile. The report is stored under the id returned in the
+    `X-Profile-Id` header and served by /api/profiles/<id>.
+
+    Other requests only pay for a header and query string lookup. At most
+    PROFILER_MAX_CONCURRENT profiles run per process, further ones get a 429.
+    Under ASGI the profile also holds whatever else the event loop runs
+    meanwhile.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        if not profile_requested(request) or not requested_by_admin(request):
+            return self.get_response(request)
+        profiler = start_profile()
+        if profiler is None:
+            return self.busy()
+        started = perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            finish_profile(profiler)
+        return self.finish(profiler, request, response, perf_counter() - started)
+
+    async def __acall__(self, request):
+        if not profile_requested(request) or not await arequested_by_admin(request):
+            return await self.get_response(request)
+        profiler = start_profile()
+        if profiler is None:
+            return self.busy()
+        started = perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            finish_profile(profiler)
+        return self.finish(profiler, request, response, perf_counter() - started)
+
+    def busy(self):
+        response = JsonResponse({'error': 'Too many requests are being profiled, try again shortly'}, status=429)
+        response['Retry-After'] = '1'
+        return response
+
+    def finish(self, profiler, request, response, total):
+        response['X-Profile-Id'] = save_profile(profiler, request, response, total)
+        return response
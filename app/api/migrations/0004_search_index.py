@@ -0,0 +1,55 @@
+from django.db import migrations
+
+
+SEARCH_TABLES = [
+    # (index table, model table, link table, link column)
+    ('leads_search', 'leads', 'api_productinterests', 'lead_id'),
+    ('customers_search', 'customers', 'api_customerproducts', 'customer_id'),
+]
+
+
+def create_search_tables(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    for table, source, link, column in SEARCH_TABLES:
+        products = (
+            f"SELECT {'group_concat' if vendor == 'sqlite' else 'string_agg'}(p.name, ' ') "
+            f"FROM {link} l JOIN products p ON p.id = l.product_id WHERE l.{column} = s.id"
+        )
+        if vendor == 'sqlite':
+            schema_editor.execute(
+                f"CREATE VIRTUAL TABLE {table} USING fts5(name, phone, email, notes, products, tokenize='unicode61')"
+            )
+            schema_editor.execute(
+                f"INSERT INTO {table} (rowid, name, phone, email, notes, products) "
+                f"SELECT s.id, s.name, s.phone, COALESCE(s.email, ''), COALESCE(s.notes, ''), "
+                f"COALESCE(({products}), '') FROM {source} s"
+            )
+        elif vendor == 'postgresql':
+            schema_editor.execute(
+                f"CREATE TABLE {table} ("
+                f"object_id bigint PRIMARY KEY REFERENCES {source} (id) ON DELETE CASCADE DEFERRABLE INITIALLY DEFERRED, "
+                f"document tsvector NOT NULL)"
+            )
+            schema_editor.execute(f"CREATE INDEX {table}_document ON {table} USING gin (document)")
+            schema_editor.execute(
+                f"INSERT INTO {table} (object_id, document) "
+                f"SELECT s.id, to_tsvector('simple', concat_ws(' ', s.name, s.phone, s.email, s.notes, ({products}))) "
+                f"FROM {source} s"
+            )
+
+
+def drop_search_tables(apps, schema_editor):
+    if schema_editor.connection.vendor in ('sqlite', 'postgresql'):
+        for table, *_ in SEARCH_TABLES:
+            schema_editor.execute(f"DROP TABLE IF EXISTS {table}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0003_importjob'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_tables, drop_search_tables),
+    ]
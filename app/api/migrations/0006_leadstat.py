@@ -0,0 +1,43 @@
+# Generated by Django 5.2.7 on 2026-10-17 08:08
+
+from django.db import migrations, models
+from django.db.models import Count
+from django.db.models.functions import TruncWeek
+
+
+def fill_lead_stats(apps, schema_editor):
+    Lead = apps.get_model('api', 'Lead')
+    LeadStat = apps.get_model('api', 'LeadStat')
+    dimensions = ('status', 'sales_rep', 'area', 'source')
+    cells = Lead.objects.order_by().values(*dimensions, week=TruncWeek('created_at')).annotate(count=Count('id'))
+    LeadStat.objects.bulk_create(
+        LeadStat(**{name: cell[name] or '' for name in dimensions}, week=cell['week'].date(), count=cell['count'])
+        for cell in cells.iterator()
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0005_customer_customers_created_idx_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LeadStat',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(max_length=20)),
+                ('sales_rep', models.CharField(max_length=255)),
+                ('area', models.CharField(max_length=255)),
+                ('source', models.CharField(max_length=100)),
+                ('week', models.DateField()),
+                ('count', models.IntegerField(default=0)),
+            ],
+            options={
+                'db_table': 'lead_stats',
+                'constraints': [models.UniqueConstraint(fields=('status', 'sales_rep', 'area', 'source', 'week'), name='lead_stats_cell_unique')],
+            },
+        ),
+        migrations.RunPython(fill_lead_stats, migrations.RunPython.noop),
+    ]
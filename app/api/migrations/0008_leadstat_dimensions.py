@@ -0,0 +1,56 @@
+# Generated by Django 5.2.7 on 2026-10-17 10:30
+
+from django.db import migrations, models
+from django.db.models import Count
+from django.db.models.functions import TruncWeek
+
+
+def fill_lead_stats(apps, schema_editor):
+    Lead = apps.get_model('api', 'Lead')
+    LeadStat = apps.get_model('api', 'LeadStat')
+    leads = Lead.objects.order_by()
+    rows = []
+    for name in ('status', 'source'):
+        for cell in leads.values('sales_rep', 'area', name).annotate(count=Count('id')).iterator():
+            rows.append(LeadStat(
+                sales_rep=cell['sales_rep'] or '', area=cell['area'] or '',
+                dimension=name, value=cell[name] or '', count=cell['count'],
+            ))
+    for cell in leads.values('sales_rep', 'area', week=TruncWeek('created_at')).annotate(count=Count('id')).iterator():
+        rows.append(LeadStat(
+            sales_rep=cell['sales_rep'] or '', area=cell['area'] or '',
+            dimension='week', value=cell['week'].date().isoformat(), count=cell['count'],
+        ))
+    LeadStat.objects.bulk_create(rows, batch_size=5000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0007_importjob_heartbeat_at'),
+    ]
+
+    operations = [
+        # One row per status/source/week value replaces the cross product cells
+        migrations.DeleteModel(name='LeadStat'),
+        migrations.CreateModel(
+            name='LeadStat',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('sales_rep', models.CharField(max_length=255)),
+                ('area', models.CharField(max_length=255)),
+                ('dimension', models.CharField(choices=[('status', 'Status'), ('source', 'Source'), ('week', 'Week')], max_length=10)),
+                ('value', models.CharField(max_length=255)),
+                ('count', models.IntegerField(default=0)),
+            ],
+            options={
+                'db_table': 'lead_stats',
+                'indexes': [
+                    models.Index(fields=['sales_rep', 'dimension'], name='lead_stats_rep_idx'),
+                    models.Index(fields=['area', 'dimension'], name='lead_stats_area_idx'),
+                ],
+                'constraints': [models.UniqueConstraint(fields=('dimension', 'value', 'sales_rep', 'area'), name='lead_stats_cell_unique')],
+            },
+        ),
+        migrations.RunPython(fill_lead_stats, migrations.RunPython.noop),
+    ]
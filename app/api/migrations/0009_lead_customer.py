@@ -0,0 +1,38 @@
+# Generated by Django 5.2.7 on 2026-10-17 10:06
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def link_converted_leads(apps, schema_editor):
+    # Convert copied the lead's name and phone to the customer, created after it
+    Lead = apps.get_model('api', 'Lead')
+    Customer = apps.get_model('api', 'Customer')
+    customers = {}
+    for customer in Customer.objects.order_by('created_at', 'id').only('name', 'phone', 'created_at').iterator():
+        customers.setdefault((customer.name, customer.phone), []).append(customer)
+    linked = []
+    for lead in Lead.objects.filter(status='won').order_by('created_at', 'id').only('name', 'phone', 'created_at').iterator():
+        candidates = customers.get((lead.name, lead.phone), [])
+        match = next((customer for customer in candidates if customer.created_at >= lead.created_at), None)
+        if match is not None:
+            candidates.remove(match)
+            lead.customer_id = match.pk
+            linked.append(lead)
+    Lead.objects.bulk_update(linked, ['customer'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0008_leadstat_dimensions'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='lead',
+            name='customer',
+            field=models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='lead', to='api.customer'),
+        ),
+        migrations.RunPython(link_converted_leads, migrations.RunPython.noop),
+    ]
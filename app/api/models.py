@@ -53,6 +53,9 @@ class Category(models.Model):
 
     @property
     def subcategories_count(self):
+        # CategoryViewSet annotates `num_subcategories`; count only for instances loaded elsewhere
+        if hasattr(self, 'num_subcategories'):
+            return self.num_subcategories
         return self.subcategories.count()
 
 
@@ -79,11 +82,10 @@ class SubCategory(models.Model):
     
     @property
     def product_count(self):
+        # SubCategoryViewSet annotates `num_products`; count only for instances loaded elsewhere
+        if hasattr(self, 'num_products'):
+            return self.num_products
         return self.products.count()
-    
-    @property
-    def category_id(self):
-        return str(self.category.id)
 
 
 class Product(models.Model):
@@ -135,10 +137,25 @@ class Lead(models.Model):
     follow_up_date = models.DateField(blank=True, null=True)
     sales_rep = models.CharField(max_length=255, blank=True, null=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    # Set by convert: a lead converts at most once, whatever its status says
+    customer = models.OneToOneField(
+        'Customer', on_delete=models.SET_NULL, blank=True, null=True, related_name='lead'
+    )
     
     class Meta:
         db_table = 'leads'
         ordering = ['-created_at']
+        # Each list filter is paired with created_at so filtered pages come out
+        # of the index already in the default `-created_at` order
+        indexes = [
+            models.Index(fields=['created_at', 'id'], name='leads_created_idx'),
+            models.Index(fields=['status', 'created_at'], name='leads_status_created_idx'),
+            models.Index(fields=['sales_rep', 'created_at'], name='leads_rep_created_idx'),
+            models.Index(fields=['area', 'created_at'], name='leads_area_created_idx'),
+            models.Index(fields=['priority', 'created_at'], name='leads_priority_created_idx'),
+            models.Index(fields=['source', 'created_at'], name='leads_source_created_idx'),
+            models.Index(fields=['follow_up_date'], name='leads_follow_up_idx'),
+        ]
     
     def __str__(self):
         return f"{self.name} - {self.status}"
@@ -170,6 +187,14 @@ class Customer(models.Model):
     class Meta:
         db_table = 'customers'
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['created_at', 'id'], name='customers_created_idx'),
+            models.Index(fields=['status', 'created_at'], name='customers_status_created_idx'),
+            models.Index(fields=['sales_rep', 'created_at'], name='customers_rep_created_idx'),
+            models.Index(fields=['area', 'created_at'], name='customers_area_created_idx'),
+            models.Index(fields=['installation_date'], name='customers_installation_idx'),
+            models.Index(fields=['expiry_date'], name='customers_expiry_idx'),
+        ]
     
     def __str__(self):
         return f"{self.name}"
@@ -183,3 +208,75 @@ class Customer(models.Model):
 class CustomerProducts(models.Model):
     customer = models.ForeignKey(Customer, on_delete=models.CASCADE, related_name='products')
     product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='customers')
+
+
+class ImportJob(models.Model):
+    KIND_CHOICES = [
+        ('leads', 'Leads'),
+        ('customers', 'Customers'),
+    ]
+    STATUS_CHOICES = [
+        ('queued', 'Queued'),
+        ('running', 'Running'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    ]
+
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    file = models.FileField(upload_to='imports/')
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='queued')
+    processed_rows = models.PositiveIntegerField(default=0)
+    imported = models.PositiveIntegerField(default=0)
+    failed = models.PositiveIntegerField(default=0)
+    errors = models.JSONField(default=list, blank=True)
+    error = models.TextField(blank=True, null=True)
+    created_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='import_jobs')
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(blank=True, null=True)
+    # Touched after every chunk, so jobs of a crashed worker can be told apart
+    heartbeat_at = models.DateTimeField(blank=True, null=True)
+    finished_at = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        db_table = 'import_jobs'
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"{self.kind} import #{self.pk} - {self.status}"
+
+
+class LeadStat(models.Model):
+    """
+    Lead counts per sales rep and area, for one dimension value each: a
+    status, a source or a week (as YYYY-MM-DD).
+
+    Every lead is counted once per dimension, so the table grows with the
+    distinct values of each dimension rather than their cross product.
+    Kept up to date incrementally by `api.stats` so the dashboard never has
+    to count the leads table. Nullable lead fields are stored as ''.
+    """
+    DIMENSION_CHOICES = [
+        ('status', 'Status'),
+        ('source', 'Source'),
+        ('week', 'Week'),
+    ]
+
+    sales_rep = models.CharField(max_length=255)
+    area = models.CharField(max_length=255)
+    dimension = models.CharField(max_length=10, choices=DIMENSION_CHOICES)
+    value = models.CharField(max_length=255)
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        db_table = 'lead_stats'
+        constraints = [
+            models.UniqueConstraint(fields=['dimension', 'value', 'sales_rep', 'area'], name='lead_stats_cell_unique'),
+        ]
+        # The salesRep and area filters of /api/leads/stats
+        indexes = [
+            models.Index(fields=['sales_rep', 'dimension'], name='lead_stats_rep_idx'),
+            models.Index(fields=['area', 'dimension'], name='lead_stats_area_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.sales_rep} {self.area} {self.dimension}={self.value}: {self.count}"
@@ -0,0 +1,175 @@
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+
+from django.core.exceptions import ValidationError
+from django.db.models import F, Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, LimitOffsetPagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Forward-only keyset pagination over (ordering field, id).
+
+    Each page is filtered to the rows after the last one of the previous page,
+    so fetching the next page costs the same however deep the client has
+    scrolled, and no COUNT(*) is issued. Nullable ordering fields sort their
+    NULLs last in both directions.
+    """
+    cursor_query_param = 'cursor'
+    limit_query_param = 'limit'
+    default_limit = api_settings.PAGE_SIZE
+    max_limit = 1000
+    default_ordering = '-created_at'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        return self.set_page(list(self.page_queryset(queryset, request, view)))
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        return self.set_page([obj async for obj in self.page_queryset(queryset, request, view)])
+
+    def page_queryset(self, queryset, request, view):
+        """The rows of the requested page plus one, to tell whether there's a next page"""
+        self.request = request
+        self.limit = self.get_limit(request)
+        self.ordering = self.get_ordering(request, queryset, view)
+
+        field_name = self.ordering.lstrip('-')
+        descending = self.ordering.startswith('-')
+        field = queryset.model._meta.get_field(field_name)
+
+        cursor = self.decode_cursor(request, field)
+        if cursor is not None:
+            value, pk = cursor
+            queryset = queryset.filter(self.after(field_name, descending, field.null, value, pk))
+
+        if not field.null:
+            queryset = queryset.order_by(self.ordering, '-pk' if descending else 'pk')
+        elif descending:
+            queryset = queryset.order_by(F(field_name).desc(nulls_last=True), '-pk')
+        else:
+            queryset = queryset.order_by(F(field_name).asc(nulls_last=True), 'pk')
+
+        return queryset[:self.limit + 1]
+
+    def set_page(self, results):
+        self.has_next = len(results) > self.limit
+        self.page = results[:self.limit]
+        return self.page
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+    def get_limit(self, request):
+        try:
+            limit = int(request.query_params[self.limit_query_param])
+        except (KeyError, ValueError):
+            return self.default_limit
+        return min(limit, self.max_limit) if limit > 0 else self.default_limit
+
+    def get_ordering(self, request, queryset, view):
+        for backend in getattr(view, 'filter_backends', []):
+            if hasattr(backend, 'get_ordering'):
+                ordering = backend().get_ordering(request, queryset, view)
+                if ordering:
+                    return ordering[0]
+        return self.default_ordering
+
+    def after(self, field_name, descending, nullable, value, pk):
+        lookup = 'lt' if descending else 'gt'
+        if value is None:
+            return Q(**{f'{field_name}__isnull': True, f'pk__{lookup}': pk})
+
+        condition = Q(**{f'{field_name}__{lookup}': value}) | Q(**{field_name: value, f'pk__{lookup}': pk})
+        if nullable:
+            condition |= Q(**{f'{field_name}__isnull': True})
+        return condition
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+
+        last = self.page[-1]
+        value = getattr(last, self.ordering.lstrip('-'))
+        if hasattr(value, 'isoformat'):
+            value = value.isoformat()
+        return replace_query_param(
+            self.request.build_absolute_uri(), self.cursor_query_param,
+            self.encode_cursor({'o': self.ordering, 'v': value, 'id': last.pk})
+        )
+
+    def encode_cursor(self, position):
+        return urlsafe_b64encode(json.dumps(position).encode()).decode()
+
+    def decode_cursor(self, request, field):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+
+        try:
+            position = json.loads(urlsafe_b64decode(encoded.encode()))
+            if position['o'] != self.ordering:
+                raise ValueError
+            value = field.to_python(position['v']) if position['v'] is not None else None
+            return value, int(position['id'])
+        except (TypeError, ValueError, KeyError, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+
+
+class OptionalCursorPagination(LimitOffsetPagination):
+    """
+    limit/offset pagination, switching to `KeysetPagination` when the request
+    asks for `?pagination=cursor` or carries a `cursor`.
+    """
+    mode_query_param = 'pagination'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.keyset = None
+        if self.use_keyset(request):
+            self.keyset = KeysetPagination()
+            return self.keyset.paginate_queryset(queryset, request, view)
+        return super().paginate_queryset(queryset, request, view)
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        """`paginate_queryset` with the count and the page fetched by the async ORM"""
+        if self.use_keyset(request):
+            self.keyset = KeysetPagination()
+            return await self.keyset.apaginate_queryset(queryset, request, view)
+
+        self.keyset = None
+        self.request = request
+        self.limit = self.get_limit(request)
+        if self.limit is None:
+            return None
+
+        self.count = await queryset.acount()
+        self.offset = self.get_offset(request)
+        if self.count == 0 or self.offset > self.count:
+            return []
+        return [obj async for obj in queryset[self.offset:self.offset + self.limit]]
+
+    def use_keyset(self, request):
+        cursor_requested = KeysetPagination.cursor_query_param in request.query_params
+        return cursor_requested or request.query_params.get(self.mode_query_param) == 'cursor'
+
+    def get_paginated_response(self, data):
+        if self.keyset is not None:
+            return self.keyset.get_paginated_response(data)
+        return super().get_paginated_response(data)
@@ -1,3 +1,7 @@
+import ipaddress
+from functools import lru_cache
+
+from django.conf import settings
 from rest_framework.permissions import BasePermission
 
 
@@ -43,3 +47,43 @@ class ManageProducts(BasePermission):
 
     def has_permission(self, request, view):
         return super().has_permission(request, view) and request.user.role == "admin"
+
+
+class ManageImports(IsAuthenticatedView):
+
+    def has_permission(self, request, view):
+        return super().has_permission(request, view) and request.user.role in ["admin", "service", "sales"]
+
+
+class ViewProfiles(IsAuthenticatedView):
+
+    def has_permission(self, request, view):
+        return super().has_permission(request, view) and request.user.role == "admin"
+
+
+@lru_cache(maxsize=4)
+def allowed_networks(networks):
+    return [ipaddress.ip_network(network.strip()) for network in networks if network.strip()]
+
+
+def internal_request(request):
+    """
+    Sent from METRICS_ALLOWED_NETWORKS straight to the app. Requests through
+    the nginx proxy come from a private address too, but carry its
+    X-Forwarded-For / X-Real-IP headers.
+    """
+    if 'HTTP_X_FORWARDED_FOR' in request.META or 'HTTP_X_REAL_IP' in request.META:
+        return False
+    try:
+        address = ipaddress.ip_address(request.META.get('REMOTE_ADDR', ''))
+    except ValueError:
+        return False
+    return any(address in network for network in allowed_networks(tuple(settings.METRICS_ALLOWED_NETWORKS)))
+
+
+class ViewMetrics(BasePermission):
+
+    def has_permission(self, request, view):
+        if request.user.is_authenticated and request.user.role == 'admin':
+            return True
+        return internal_request(request)
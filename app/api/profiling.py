@@ -0,0 +1,113 @@
+import cProfile
+import io
+import os
+import pstats
+import re
+import secrets
+import threading
+from datetime import datetime
+
+from django.conf import settings
+from rest_framework.exceptions import AuthenticationFailed
+
+from .authentication import CachedJWTAuthentication
+
+
+PROFILE_ID_RE = re.compile(r'^\d{20}-[0-9a-f]{8}$')
+
+REPORT_LINES = 60
+
+_running = 0
+_running_lock = threading.Lock()
+
+
+def profile_requested(request):
+    """`X-Profile: 1` or `?profile=1`; only looks at the raw header and query string"""
+    return request.META.get('HTTP_X_PROFILE') == '1' or (
+        'profile=' in request.META.get('QUERY_STRING', '') and request.GET.get('profile') == '1'
+    )
+
+
+def requested_by_admin(request):
+    """
+    Authenticate the request's JWT ahead of DRF, which only does it inside the
+    view, so an admin's profile covers the whole request. A missing or bad
+    token just means no profile; the view rejects the request as usual.
+    """
+    try:
+        user_auth = CachedJWTAuthentication().authenticate(request)
+    except AuthenticationFailed:
+        return False
+    return user_auth is not None and user_auth[0].role == 'admin'
+
+
+async def arequested_by_admin(request):
+    try:
+        user_auth = await CachedJWTAuthentication().aauthenticate(request)
+    except AuthenticationFailed:
+        return False
+    return user_auth is not None and user_auth[0].role == 'admin'
+
+
+def start_profile():
+    """A running profiler, or None when PROFILER_MAX_CONCURRENT profiles already run in this process"""
+    global _running
+    with _running_lock:
+        if _running >= settings.PROFILER_MAX_CONCURRENT:
+            return None
+        _running += 1
+    profiler = cProfile.Profile()
+    try:
+        profiler.enable()
+    except ValueError:
+        # Python 3.12+ allows one profiler per process, a debugger or coverage may hold it
+        finish_profile(None)
+        return None
+    return profiler
+
+
+def finish_profile(profiler):
+    global _running
+    if profiler is not None:
+        profiler.disable()
+    with _running_lock:
+        _running -= 1
+
+
+def profile_path(profile_id, extension):
+    return os.path.join(settings.PROFILES_DIR, f'{profile_id}.{extension}')
+
+
+def save_profile(profiler, request, response, total):
+    """
+    Store the profile as a pstats file (for snakeviz, flameprof, gprof2dot...)
+    and a text report of the slowest functions, keep the newest
+    PROFILES_KEPT, and return its id.
+    """
+    os.makedirs(settings.PROFILES_DIR, exist_ok=True)
+    profile_id = f'{datetime.now():%Y%m%d%H%M%S%f}-{secrets.token_hex(4)}'
+    profiler.dump_stats(profile_path(profile_id, 'prof'))
+
+    report = io.StringIO()
+    report.write(
+        f'{request.method} {request.get_full_path()} -> {response.status_code} '
+        f'in {total * 1000:.1f} ms (profiled)\n\n'
+    )
+    pstats.Stats(profiler, stream=report).sort_stats('cumulative').print_stats(REPORT_LINES)
+    with open(profile_path(profile_id, 'txt'), 'w') as file:
+        file.write(report.getvalue())
+
+    prune_profiles()
+    return profile_id
+
+
+def prune_profiles():
+    profile_ids = sorted(
+        filename[:-len('.prof')] for filename in os.listdir(settings.PROFILES_DIR) if filename.endswith('.prof')
+    )
+    for profile_id in profile_ids[:-settings.PROFILES_KEPT]:
+        for extension in ('prof', 'txt'):
+            try:
+                os.remove(profile_path(profile_id, extension))
+            except FileNotFoundError:
+                pass
@@ -0,0 +1,54 @@
+import orjson
+from rest_framework import renderers
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.utils.encoders import JSONEncoder
+
+from .instrumentation import span
+
+
+# orjson writes dates and datetimes like DRF's encoder once UTC is written as `Z`
+ORJSON_OPTIONS = orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS
+
+_encoder = JSONEncoder()
+
+
+def encode_default(obj):
+    """
+    Types orjson doesn't write itself (Decimal, timedelta, lazy strings, ...) are
+    converted by DRF's JSONEncoder, as with the stock renderer.
+    """
+    return _encoder.default(obj)
+
+
+class ORJSONRenderer(renderers.JSONRenderer):
+    """
+    JSONRenderer encoding with orjson. Requests for indented output (the
+    browsable API, `; indent=` in Accept) are handed to the stock renderer.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+
+        renderer_context = renderer_context or {}
+        if self.get_indent(accepted_media_type, renderer_context):
+            return super().render(data, accepted_media_type, renderer_context)
+
+        with span('render'):
+            ret = orjson.dumps(data, default=encode_default, option=ORJSON_OPTIONS)
+        # Escaped like the stock renderer does, for JSONP-style consumers
+        if b'\xe2\x80\xa8' in ret or b'\xe2\x80\xa9' in ret:
+            ret = ret.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+        return ret
+
+
+class ORJSONParser(JSONParser):
+    """JSONParser decoding with orjson; NaN and Infinity are rejected, like with STRICT_JSON"""
+    renderer_class = ORJSONRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        try:
+            return orjson.loads(stream.read())
+        except orjson.JSONDecodeError as exc:
+            raise ParseError('JSON parse error - %s' % str(exc))
@@ -0,0 +1,136 @@
+import re
+
+from django.db import connection
+from django.db.models.expressions import RawSQL
+from rest_framework.filters import SearchFilter
+
+from .models import Lead, Customer
+
+
+SEARCH_CHUNK_SIZE = 1000
+
+TOKEN_RE = re.compile(r'\w+')
+
+
+class SearchIndex:
+    """
+    Full-text index over a model's searchable columns plus its product names.
+
+    The index lives in a side table keyed by the object id: an FTS5 virtual
+    table on SQLite, a tsvector column with a GIN index on PostgreSQL (see
+    migration 0004). `api.signals` keeps it in sync on save and delete; bulk
+    writes that skip signals call `update` themselves.
+    """
+    fields = ('name', 'phone', 'email', 'notes')
+
+    def __init__(self, model, table, link):
+        self.model = model
+        self.table = table
+        # Reverse relation to the ProductInterests/CustomerProducts rows
+        self.link = link
+
+    @property
+    def supported(self):
+        return connection.vendor in ('sqlite', 'postgresql')
+
+    def document(self, obj, products):
+        names = ' '.join(product.name for product in products)
+        return [obj.pk] + [str(getattr(obj, field) or '') for field in self.fields] + [names]
+
+    def documents(self, queryset):
+        queryset = queryset.prefetch_related(f'{self.link}__product').only('id', *self.fields)
+        for obj in queryset.iterator(chunk_size=SEARCH_CHUNK_SIZE):
+            yield self.document(obj, (item.product for item in getattr(obj, self.link).all()))
+
+    def update(self, ids):
+        ids = list(ids)
+        if not ids or not self.supported:
+            return
+        self.remove(ids)
+        self.write(self.model.objects.filter(pk__in=ids))
+
+    def remove(self, ids):
+        ids = list(ids)
+        if not ids or not self.supported:
+            return
+        column = 'rowid' if connection.vendor == 'sqlite' else 'object_id'
+        with connection.cursor() as cursor:
+            for start in range(0, len(ids), SEARCH_CHUNK_SIZE):
+                chunk = ids[start:start + SEARCH_CHUNK_SIZE]
+                placeholders = ', '.join(['%s'] * len(chunk))
+                cursor.execute(f'DELETE FROM {self.table} WHERE {column} IN ({placeholders})', chunk)
+
+    def rebuild(self):
+        if not self.supported:
+            return
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {self.table}')
+        self.write(self.model.objects.all())
+
+    def write(self, queryset):
+        self.write_documents(self.documents(queryset))
+
+    def write_documents(self, documents):
+        """Index `document()` rows of objects that aren't in the index yet"""
+        if connection.vendor == 'sqlite':
+            sql = f'INSERT INTO {self.table} (rowid, name, phone, email, notes, products) VALUES (%s, %s, %s, %s, %s, %s)'
+        else:
+            sql = (
+                f"INSERT INTO {self.table} (object_id, document) VALUES "
+                f"(%s, to_tsvector('simple', concat_ws(' ', %s, %s, %s, %s, %s)))"
+            )
+
+        with connection.cursor() as cursor:
+            batch = []
+            for document in documents:
+                batch.append(document)
+                if len(batch) >= SEARCH_CHUNK_SIZE:
+                    cursor.executemany(sql, batch)
+                    batch = []
+            if batch:
+                cursor.executemany(sql, batch)
+
+    def search(self, queryset, terms):
+        """Filter `queryset` to the documents matching every term (as a prefix), best match first"""
+        tokens = [token for term in terms for token in TOKEN_RE.findall(term)]
+        if not tokens:
+            return queryset
+
+        pk = f'{self.model._meta.db_table}.{self.model._meta.pk.column}'
+        if connection.vendor == 'sqlite':
+            query = ' '.join(f'"{token}"*' for token in tokens)
+            matches = RawSQL(f'SELECT rowid FROM {self.table} WHERE {self.table} MATCH %s', [query])
+            rank = RawSQL(
+                f'SELECT -bm25({self.table}) FROM {self.table} WHERE {self.table} MATCH %s AND rowid = {pk}',
+                [query]
+            )
+        else:
+            query = ' & '.join(f'{token}:*' for token in tokens)
+            matches = RawSQL(
+                f"SELECT object_id FROM {self.table} WHERE document @@ to_tsquery('simple', %s)", [query]
+            )
+            rank = RawSQL(
+                f"SELECT ts_rank(document, to_tsquery('simple', %s)) FROM {self.table} WHERE object_id = {pk}",
+                [query]
+            )
+
+        return queryset.filter(pk__in=matches).annotate(search_rank=rank).order_by('-search_rank', '-created_at')
+
+
+SEARCH_INDEXES = {
+    Lead: SearchIndex(Lead, 'leads_search', 'interests'),
+    Customer: SearchIndex(Customer, 'customers_search', 'products'),
+}
+
+
+class FullTextSearchFilter(SearchFilter):
+    """
+    `?search=` backed by the model's `SearchIndex`, ranked by relevance.
+    Falls back to DRF's `LIKE` search on databases without an index.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        index = SEARCH_INDEXES.get(queryset.model)
+        if index is None or not index.supported:
+            return super().filter_queryset(request, queryset, view)
+        return index.search(queryset, self.get_search_terms(request))
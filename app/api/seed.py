@@ -0,0 +1,289 @@
+import random
+from itertools import accumulate
+from datetime import datetime, time, timedelta
+from io import BytesIO
+
+from dateutil.relativedelta import relativedelta
+from django.contrib.auth.hashers import make_password
+from django.db import connection, transaction
+from django.utils import timezone
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+
+from .exporters import LEAD_COLUMNS, CUSTOMER_COLUMNS
+from .models import User, Category, SubCategory, Product, Lead, ProductInterests, Customer, CustomerProducts
+from .search import SEARCH_INDEXES
+from .stats import rebuild_lead_stats
+
+
+SEED_CHUNK_SIZE = 5000
+
+FIRST_NAMES = ['Ravi', 'Priya', 'Amit', 'Sneha', 'Rahul', 'Anjali', 'Vikram', 'Pooja', 'Suresh', 'Kavita']
+LAST_NAMES = ['Sharma', 'Patel', 'Iyer', 'Desai', 'Nair', 'Khan', 'Joshi', 'Reddy', 'Mehta', 'Gupta', 'Rao']
+AREAS = ['Andheri', 'Bandra', 'Borivali', 'Dadar', 'Thane', 'Powai', 'Malad', 'Kurla']
+NOTES = [
+    'Called twice, wants a demo — prefers evenings',
+    'Asked for EMI options on the 1.5 ton split AC',
+    'Existing customer referral, follow up after Diwali',
+    None,
+    'Comparing quotes with two other dealers',
+]
+CATALOG = {
+    'Air Conditioners': {
+        'Split AC': [('1 Ton', 28990), ('1.5 Ton', 36490), ('2 Ton', 45990)],
+        'Window AC': [('1 Ton', 24990), ('1.5 Ton', 29990)],
+    },
+    'Kitchen': {
+        'Refrigerators': [('190 L', 15990), ('260 L', 26990), ('340 L', 38990)],
+        'Microwaves': [('20 L', 6490), ('28 L', 11990)],
+    },
+    'Laundry': {
+        'Washing Machines': [('6 kg', 17990), ('7 kg', 21490), ('8 kg', 27990)],
+    },
+}
+
+
+def distribution(frequencies):
+    """(values, cumulative weights) of a {value: relative frequency} mapping, for `pick`"""
+    return list(frequencies), list(accumulate(frequencies.values()))
+
+
+def pick(rng, distribution):
+    values, cum_weights = distribution
+    return rng.choices(values, cum_weights=cum_weights)[0]
+
+
+def long_tail(values):
+    """The first values are the most frequent, like the busiest areas or best sales reps"""
+    return distribution({value: 1 / (rank + 1) for rank, value in enumerate(values)})
+
+
+# Most leads are still open, and most customers buy the two-year warranty
+LEAD_STATUSES = distribution({'new': 30, 'contacted': 25, 'qualified': 15, 'negotiation': 10, 'won': 12, 'lost': 8})
+PRIORITIES = distribution({'low': 25, 'medium': 55, 'high': 20})
+SOURCES = distribution({'Walk-in': 30, 'Referral': 25, 'Website': 20, 'Call centre': 15, None: 10})
+PRODUCTS_PER_ROW = distribution({1: 60, 2: 30, 3: 10})
+WARRANTY_YEARS = distribution({1: 30, 2: 40, 3: 20, 5: 10})
+CLOSED_STATUSES = ('won', 'lost')
+
+
+def seed_catalog():
+    """Create the CATALOG category tree where it's missing and return its products"""
+    for category_name, subcategories in CATALOG.items():
+        category, _ = Category.objects.get_or_create(name=category_name)
+        for sub_name, capacities in subcategories.items():
+            sub_category, created = SubCategory.objects.get_or_create(name=sub_name, category=category)
+            if created:
+                Product.objects.bulk_create([
+                    Product(name=f'{sub_name} {capacity}', sub_category=sub_category, capacity=capacity, price=price)
+                    for capacity, price in capacities
+                ])
+    return list(Product.objects.filter(sub_category__category__name__in=CATALOG).order_by('id'))
+
+
+def catalog_products():
+    """Unsaved products of CATALOG, for files written without a database"""
+    return [
+        Product(name=f'{sub_name} {capacity}', capacity=capacity, price=price)
+        for subcategories in CATALOG.values()
+        for sub_name, capacities in subcategories.items()
+        for capacity, price in capacities
+    ]
+
+
+def sales_rep_names(count):
+    return [f'{first} {last}' for last in LAST_NAMES for first in FIRST_NAMES][:count]
+
+
+def seed_sales_reps(count):
+    """Sales users whose names the leads and customers are assigned to"""
+    names = sales_rep_names(count)
+    password = make_password(None)
+    for i, name in enumerate(names):
+        User.objects.get_or_create(
+            email=f'rep{i + 1}@honeydrop.com',
+            defaults={'username': f'rep{i + 1}', 'name': name, 'role': 'sales', 'password': password},
+        )
+    return names
+
+
+class RowFactory:
+    """
+    Deterministic lead and customer rows.
+
+    Each chunk of rows gets its own random generator derived from the seed
+    and the chunk's offset, so the rows only depend on the seed, the chunk
+    size and the end date.
+    """
+
+    def __init__(self, seed, products, sales_reps, end=None, days=730):
+        self.seed = seed
+        self.products = products
+        self.areas = long_tail(AREAS)
+        self.sales_reps = long_tail(sales_reps) if sales_reps else None
+        self.end = end or timezone.localdate()
+        self.days = days
+        self.tz = timezone.get_current_timezone()
+
+    def rng(self, kind, offset):
+        return random.Random(f'{self.seed}:{kind}:{offset}')
+
+    def person(self, rng, n, phone_prefix):
+        first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+        return {
+            'name': f'{first} {last}',
+            'phone': f'{phone_prefix}{n:09d}',
+            'email': f'{first}.{last}{n}@example.com'.lower() if rng.random() < 0.6 else None,
+            'area': pick(rng, self.areas),
+            'address': f'Flat {rng.randrange(1, 999)}, Building {rng.randrange(1, 60)}, {rng.choice(AREAS)}',
+            'sales_rep': pick(rng, self.sales_reps) if self.sales_reps else None,
+            'notes': rng.choice(NOTES),
+        }
+
+    def pick_products(self, rng):
+        return rng.sample(self.products, min(pick(rng, PRODUCTS_PER_ROW), len(self.products)))
+
+    def created_at(self, rng):
+        # Skewed towards recent days, like a growing business
+        day = self.end - timedelta(days=int(rng.triangular(0, self.days, 0)))
+        moment = time(rng.randrange(9, 20), rng.randrange(60), rng.randrange(60))
+        return datetime.combine(day, moment, tzinfo=self.tz)
+
+    def leads(self, offset, count):
+        """(field values, products) for leads offset..offset+count"""
+        rng = self.rng('leads', offset)
+        for n in range(offset, offset + count):
+            status = pick(rng, LEAD_STATUSES)
+            created_at = self.created_at(rng)
+            follow_up_date = None
+            if status not in CLOSED_STATUSES or rng.random() < 0.3:
+                follow_up_date = created_at.date() + timedelta(days=int(rng.triangular(1, 45, 7)))
+            yield dict(
+                self.person(rng, n, '9'),
+                status=status,
+                priority=pick(rng, PRIORITIES),
+                source=pick(rng, SOURCES),
+                follow_up_date=follow_up_date,
+                created_at=created_at,
+            ), self.pick_products(rng)
+
+    def customers(self, offset, count):
+        """(field values, products) for customers offset..offset+count"""
+        rng = self.rng('customers', offset)
+        for n in range(offset, offset + count):
+            products = self.pick_products(rng)
+            created_at = self.created_at(rng)
+            installation_date = min(created_at.date() + timedelta(days=rng.randrange(0, 15)), self.end)
+            warranty_years = pick(rng, WARRANTY_YEARS)
+            yield dict(
+                self.person(rng, n, '8'),
+                installation_date=installation_date,
+                expiry_date=installation_date + relativedelta(years=warranty_years),
+                amount=round(sum(float(product.price) for product in products) * rng.uniform(0.9, 1.02)),
+                status='inactive' if rng.random() < 0.1 else 'active',
+                created_at=created_at,
+            ), products
+
+
+def write_created_at(model, instances, values):
+    """
+    Write the generated `created_at` values over the now() that auto_now_add
+    stamped in bulk_create. A plain executemany UPDATE: bulk_update's CASE
+    statements made seeding on SQLite about twice as slow.
+    """
+    field = model._meta.get_field('created_at')
+    quote = connection.ops.quote_name
+    with connection.cursor() as cursor:
+        cursor.executemany(
+            f'UPDATE {quote(model._meta.db_table)} SET {quote(field.column)} = %s '
+            f'WHERE {quote(model._meta.pk.column)} = %s',
+            [(field.get_db_prep_value(value, connection), instance.pk) for instance, value in zip(instances, values)],
+        )
+    for instance, value in zip(instances, values):
+        instance.created_at = value
+
+
+def seed_rows(model, link_model, link_field, rows, count, chunk_size=SEED_CHUNK_SIZE, on_progress=None):
+    """Insert `count` rows from `rows(offset, count)` chunk by chunk, with their product links"""
+    start = model.objects.count()
+    for offset in range(start, start + count, chunk_size):
+        chunk = list(rows(offset, min(chunk_size, start + count - offset)))
+        with transaction.atomic():
+            instances = model.objects.bulk_create([model(**fields) for fields, _ in chunk])
+            write_created_at(model, instances, [fields['created_at'] for fields, _ in chunk])
+            link_model.objects.bulk_create([
+                link_model(**{f'{link_field}_id': instance.pk, 'product_id': product.pk})
+                for instance, (_, products) in zip(instances, chunk)
+                for product in products
+            ])
+            # Indexed from memory rather than read back like `rebuild` does
+            index = SEARCH_INDEXES[model]
+            if index.supported:
+                index.write_documents(
+                    index.document(instance, products) for instance, (_, products) in zip(instances, chunk)
+                )
+        if on_progress:
+            on_progress(model, offset + len(chunk) - start)
+
+
+def seed_dataset(leads, customers, seed=0, sales_reps=12, end=None, days=730,
+                 chunk_size=SEED_CHUNK_SIZE, on_progress=None):
+    """
+    Add `leads` leads and `customers` customers, with their product links,
+    over the seed catalog and sales reps, index them for search and rebuild
+    the lead stats. The same seed and end date always produce the same rows.
+    """
+    factory = RowFactory(seed, seed_catalog(), seed_sales_reps(sales_reps), end, days)
+    seed_rows(Lead, ProductInterests, 'lead', factory.leads, leads, chunk_size, on_progress)
+    seed_rows(Customer, CustomerProducts, 'customer', factory.customers, customers, chunk_size, on_progress)
+    rebuild_lead_stats()
+    return factory
+
+
+def date_cell(sheet, value):
+    cell = WriteOnlyCell(sheet, value)
+    cell.number_format = 'yyyy-mm-dd'
+    return cell
+
+
+def write_workbook(file, kind, rows, factory, chunk_size=SEED_CHUNK_SIZE):
+    """
+    Write `rows` generated leads or customers to `file` as an xlsx in the
+    format the `upload` actions read (the export columns).
+    """
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet(kind)
+    columns = LEAD_COLUMNS if kind == 'leads' else CUSTOMER_COLUMNS
+    sheet.append([header for header, _ in columns])
+    generate = factory.leads if kind == 'leads' else factory.customers
+
+    for offset in range(0, rows, chunk_size):
+        for fields, products in generate(offset, min(chunk_size, rows - offset)):
+            values = {
+                'name': fields['name'], 'phone': fields['phone'], 'email': fields['email'],
+                'area': fields['area'], 'address': fields['address'], 'notes': fields['notes'],
+                'salesRep': fields['sales_rep'], 'products': ','.join(product.name for product in products),
+            }
+            if kind == 'leads':
+                values.update(
+                    status=fields['status'], source=fields['source'], priority=fields['priority'],
+                    followUpDate=fields['follow_up_date'] and date_cell(sheet, fields['follow_up_date']),
+                )
+            else:
+                values.update(
+                    installationDate=date_cell(sheet, fields['installation_date']),
+                    warrantyYears=round((fields['expiry_date'] - fields['installation_date']).days / 365.25),
+                    amount=fields['amount'], status=fields['status'],
+                )
+            sheet.append([values[header] for header, _ in columns])
+    workbook.save(file)
+
+
+def upload_workbook(kind, rows, seed=0):
+    """An in-memory upload file of `rows` rows over the seeded catalog"""
+    factory = RowFactory(seed, seed_catalog(), [])
+    file = BytesIO()
+    write_workbook(file, kind, rows, factory)
+    file.seek(0)
+    file.name = f'{kind}.xlsx'
+    return file
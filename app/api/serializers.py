@@ -1,7 +1,21 @@
 from rest_framework import serializers
-from .models import User, Category, SubCategory, Product, Lead, Customer, ProductInterests, CustomerProducts
+from .models import User, Category, SubCategory, Product, Lead, Customer, ProductInterests, CustomerProducts, ImportJob
 from dateutil.relativedelta import relativedelta
 from django.contrib.auth.hashers import make_password
+from django.db import transaction
+
+from .sync import sync_products
+
+
+def linked_products(obj, links, lookup):
+    """
+    The products of `obj`'s `links`, by name: from the list/retrieve
+    prefetch, or in one query after a create, update or convert, which
+    serialize without it.
+    """
+    if links in getattr(obj, '_prefetched_objects_cache', {}):
+        return sorted((link.product for link in getattr(obj, links).all()), key=lambda product: product.name)
+    return Product.objects.filter(**{lookup: obj.pk}).order_by('name')
 
 
 class LoginSerializer(serializers.ModelSerializer):
@@ -161,41 +175,25 @@ class LeadSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'createdAt', 'products']
 
     def get_products(self, obj):
-        # Return product data via ProductInterests relation
-        products = Product.objects.filter(interested_leads__lead=obj)
-        return ProductNameSerializer(products, many=True).data
+        return ProductNameSerializer(linked_products(obj, 'interests', 'interested_leads__lead'), many=True).data
 
+    @transaction.atomic
     def create(self, validated_data):
         product_ids = validated_data.pop('productIds', [])
         lead = super().create(validated_data)
-        for product_id in product_ids:
-            product = Product.objects.get(id=product_id)
-            ProductInterests.objects.create(
-                lead=lead,
-                product=product
-            )
-
+        sync_products(ProductInterests, 'lead', {lead.pk: product_ids})
         return lead
 
+    @transaction.atomic
     def update(self, instance, validated_data):
         # Extract product IDs (if provided)
         product_ids = validated_data.pop('productIds', None)
 
         super().update(instance, validated_data)
 
-        # If product IDs are included in request, update associations
+        # If product IDs are included in request, only the added/removed links are written
         if product_ids is not None:
-            # Remove existing interests
-            ProductInterests.objects.filter(lead=instance).delete()
-
-            # Recreate new ones
-            for product_id in product_ids:
-                try:
-                    product = Product.objects.get(id=product_id)
-                    ProductInterests.objects.create(lead=instance, product=product)
-                except Product.DoesNotExist:
-                    # Optional: raise a validation error or ignore missing products
-                    raise serializers.ValidationError({"error": f"Product with id {product_id} not found"})
+            sync_products(ProductInterests, 'lead', {instance.pk: product_ids})
 
         return instance
 
@@ -217,10 +215,9 @@ class CustomerSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'expiryDate', 'products']
 
     def get_products(self, obj):
-        # Return product data via ProductInterests relation
-        products = Product.objects.filter(customers__customer=obj)
-        return ProductNameSerializer(products, many=True).data
+        return ProductNameSerializer(linked_products(obj, 'products', 'customers__customer'), many=True).data
 
+    @transaction.atomic
     def create(self, validated_data):
         warranty_years = validated_data.pop('warrantyYears', 2)
         installation_date = validated_data.get('installation_date')
@@ -230,14 +227,10 @@ class CustomerSerializer(serializers.ModelSerializer):
 
         product_ids = validated_data.pop('productIds', [])
         customer = super().create(validated_data)
-        for product_id in product_ids:
-            product = Product.objects.get(id=product_id)
-            CustomerProducts.objects.create(
-                customer=customer,
-                product=product
-            )
+        sync_products(CustomerProducts, 'customer', {customer.pk: product_ids})
         return customer
     
+    @transaction.atomic
     def update(self, instance, validated_data):
         warranty_years = validated_data.pop('warrantyYears', None)
         installation_date = validated_data.get('installation_date', instance.installation_date)
@@ -248,19 +241,9 @@ class CustomerSerializer(serializers.ModelSerializer):
 
         super().update(instance, validated_data)
 
-        # If product IDs are included in request, update associations
+        # If product IDs are included in request, only the added/removed links are written
         if product_ids is not None:
-            # Remove existing interests
-            CustomerProducts.objects.filter(customer=instance).delete()
-
-            # Recreate new ones
-            for product_id in product_ids:
-                try:
-                    product = Product.objects.get(id=product_id)
-                    CustomerProducts.objects.create(customer=instance, product=product)
-                except Product.DoesNotExist:
-                    # Optional: raise a validation error or ignore missing products
-                    raise serializers.ValidationError({"error": f"Product with id {product_id} not found"})
+            sync_products(CustomerProducts, 'customer', {instance.pk: product_ids})
 
         return instance
 
@@ -268,3 +251,22 @@ class CustomerSerializer(serializers.ModelSerializer):
 class ConvertLeadSerializer(serializers.Serializer):
     installationDate = serializers.DateField()
     warrantyYears = serializers.IntegerField(default=2)
+
+
+class BulkConvertLeadSerializer(ConvertLeadSerializer):
+    leadId = serializers.IntegerField()
+
+
+class ImportJobSerializer(serializers.ModelSerializer):
+    processedRows = serializers.IntegerField(source='processed_rows', read_only=True)
+    createdAt = serializers.DateTimeField(source='created_at', read_only=True)
+    startedAt = serializers.DateTimeField(source='started_at', read_only=True)
+    finishedAt = serializers.DateTimeField(source='finished_at', read_only=True)
+
+    class Meta:
+        model = ImportJob
+        fields = [
+            'id', 'kind', 'status', 'processedRows', 'imported', 'failed', 'errors', 'error',
+            'createdAt', 'startedAt', 'finishedAt'
+        ]
+        read_only_fields = fields
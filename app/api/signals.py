@@ -0,0 +1,106 @@
+from collections import Counter
+
+from django.db import transaction
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import receiver
+
+from .authentication import forget_user
+from .catalog import bump_catalog_version
+from .models import User, Category, SubCategory, Product, Lead, Customer, ProductInterests, CustomerProducts
+from .search import SEARCH_INDEXES
+from .stats import STAT_SCOPE, STAT_DIMENSIONS, lead_cells, apply_deltas, count_leads
+from .sync import forget_reindex, reindex_on_commit, synced_per_row
+
+
+@receiver(post_save, sender=Lead)
+@receiver(post_save, sender=Customer)
+def index_search_document(sender, instance, **kwargs):
+    if not synced_per_row():
+        return
+    reindex_on_commit(sender, instance.pk)
+
+
+@receiver(post_delete, sender=Lead)
+@receiver(post_delete, sender=Customer)
+def remove_search_document(sender, instance, **kwargs):
+    if not synced_per_row():
+        return
+    # Its link rows were deleted first and queued it for reindexing
+    forget_reindex(sender, instance.pk)
+    SEARCH_INDEXES[sender].remove([instance.pk])
+
+
+@receiver(post_save, sender=ProductInterests)
+@receiver(post_delete, sender=ProductInterests)
+def index_lead_products(sender, instance, **kwargs):
+    if not synced_per_row():
+        return
+    reindex_on_commit(Lead, instance.lead_id)
+
+
+@receiver(post_save, sender=CustomerProducts)
+@receiver(post_delete, sender=CustomerProducts)
+def index_customer_products(sender, instance, **kwargs):
+    if not synced_per_row():
+        return
+    reindex_on_commit(Customer, instance.customer_id)
+
+
+@receiver(pre_save, sender=Product)
+def remember_product_name(sender, instance, **kwargs):
+    instance._indexed_name = None
+    if instance.pk:
+        instance._indexed_name = Product.objects.filter(pk=instance.pk).values_list('name', flat=True).first()
+
+
+@receiver(post_save, sender=Product)
+def index_renamed_product(sender, instance, created, **kwargs):
+    # Only a rename changes the documents of the leads/customers linked to it
+    if created or instance._indexed_name == instance.name:
+        return
+    SEARCH_INDEXES[Lead].update(instance.interested_leads.values_list('lead_id', flat=True).distinct())
+    SEARCH_INDEXES[Customer].update(instance.customers.values_list('customer_id', flat=True).distinct())
+
+
+@receiver(pre_save, sender=Lead)
+def remember_lead_cell(sender, instance, **kwargs):
+    if not synced_per_row():
+        return
+    instance._stats_cells = []
+    if instance.pk:
+        previous = Lead.objects.filter(pk=instance.pk).only(*STAT_SCOPE, *STAT_DIMENSIONS, 'created_at').first()
+        if previous is not None:
+            instance._stats_cells = lead_cells(previous)
+
+
+@receiver(post_save, sender=Lead)
+def count_saved_lead(sender, instance, **kwargs):
+    if not synced_per_row():
+        return
+    deltas = Counter(lead_cells(instance))
+    deltas.subtract(instance._stats_cells)
+    apply_deltas(deltas)
+
+
+@receiver(post_delete, sender=Lead)
+def uncount_deleted_lead(sender, instance, **kwargs):
+    if not synced_per_row():
+        return
+    count_leads([instance], delta=-1)
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def forget_cached_user(sender, instance, **kwargs):
+    forget_user(instance.pk)
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_save, sender=SubCategory)
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Category)
+@receiver(post_delete, sender=SubCategory)
+@receiver(post_delete, sender=Product)
+def invalidate_catalog(sender, instance, **kwargs):
+    # After commit, so no worker can rebuild the new version from the old rows
+    transaction.on_commit(bump_catalog_version)
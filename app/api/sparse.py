@@ -0,0 +1,83 @@
+from django.core.exceptions import FieldDoesNotExist
+from rest_framework.exceptions import ValidationError
+
+
+class SparseFieldsMixin:
+    """
+    `?fields=name,phone` / `?omit=products` on list and retrieve.
+
+    Dropped fields are removed from the serializer, and the queryset loads
+    only the columns the remaining fields read. Prefetches listed in
+    `field_prefetches` ({field: lookup}) are skipped unless their field is
+    kept. If a kept field reads something other than a model column (a
+    property, a method), every column is loaded as before.
+    """
+    fields_query_param = 'fields'
+    omit_query_param = 'omit'
+    field_prefetches = {}
+
+    def sparse_fields(self):
+        """Names of the serializer fields to render, or None for all of them"""
+        if not hasattr(self, '_sparse_fields'):
+            self._sparse_fields = self.parse_sparse_fields()
+        return self._sparse_fields
+
+    def parse_sparse_fields(self):
+        if self.action not in ('list', 'retrieve'):
+            return None
+        fields = self.request.query_params.get(self.fields_query_param)
+        omit = self.request.query_params.get(self.omit_query_param)
+        if not fields and not omit:
+            return None
+
+        available = [
+            name for name, field in self.get_serializer_class()().fields.items() if not field.write_only
+        ]
+        requested = [name for name in (fields or '').split(',') + (omit or '').split(',') if name]
+        for name in requested:
+            if name not in available:
+                raise ValidationError({'error': f'Unknown field `{name}`'})
+
+        kept = set(fields.split(',')) if fields else set(available)
+        return kept - set((omit or '').split(','))
+
+    def get_serializer(self, *args, **kwargs):
+        serializer = super().get_serializer(*args, **kwargs)
+        kept = self.sparse_fields()
+        if kept is not None:
+            fields = serializer.child.fields if kwargs.get('many') else serializer.fields
+            for name in list(fields):
+                if name not in kept:
+                    fields.pop(name)
+        return serializer
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        kept = self.sparse_fields()
+        if kept is None:
+            return queryset
+
+        dropped = {lookup for name, lookup in self.field_prefetches.items() if name not in kept}
+        if dropped:
+            lookups = [lookup for lookup in queryset._prefetch_related_lookups if lookup not in dropped]
+            queryset = queryset.prefetch_related(None).prefetch_related(*lookups)
+
+        model = queryset.model
+        concrete = {field.name for field in model._meta.concrete_fields}
+        # Pagination reads the ordering fields back from the last row
+        ordering = list(model._meta.ordering) + self.request.query_params.get('ordering', '').split(',')
+        columns = {model._meta.pk.name} | {name.strip().lstrip('-') for name in ordering} & concrete
+
+        serializer_fields = self.get_serializer_class()().fields
+        for name in kept:
+            if name in self.field_prefetches:
+                continue
+            try:
+                field = model._meta.get_field(serializer_fields[name].source)
+            except FieldDoesNotExist:
+                return queryset
+            if not field.concrete:
+                return queryset
+            columns.add(field.name)
+
+        return queryset.only(*columns)
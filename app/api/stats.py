@@ -0,0 +1,108 @@
+from collections import Counter
+from datetime import date, timedelta
+
+from django.db import connection, transaction
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncWeek
+from django.utils import timezone
+
+from .models import Lead, LeadStat
+
+
+# Lead fields every LeadStat row is kept per, so the stats can be narrowed to them
+STAT_SCOPE = ('sales_rep', 'area')
+STAT_DIMENSIONS = ('status', 'source')
+
+
+def week_of(created_at):
+    day = timezone.localtime(created_at).date()
+    return day - timedelta(days=day.weekday())
+
+
+def lead_cells(lead):
+    """The (sales_rep, area, dimension, value) LeadStat cells a lead is counted in"""
+    scope = tuple(getattr(lead, name) or '' for name in STAT_SCOPE)
+    return [scope + (name, getattr(lead, name) or '') for name in STAT_DIMENSIONS] + [
+        scope + ('week', week_of(lead.created_at).isoformat()),
+    ]
+
+
+def count_lead(deltas, lead, delta=1):
+    for cell in lead_cells(lead):
+        deltas[cell] += delta
+
+
+def apply_deltas(deltas):
+    """
+    Add each {cell: delta} to the summary table with a single executemany
+    upsert. Rows are sorted so concurrent writers lock them in one order.
+    """
+    rows = sorted(cell + (delta,) for cell, delta in deltas.items() if delta)
+    if not rows:
+        return
+    quote = connection.ops.quote_name
+    table = quote(LeadStat._meta.db_table)
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.executemany(
+            f'INSERT INTO {table} (sales_rep, area, dimension, value, {quote("count")}) '
+            f'VALUES (%s, %s, %s, %s, %s) '
+            f'ON CONFLICT (dimension, value, sales_rep, area) '
+            f'DO UPDATE SET {quote("count")} = {table}.{quote("count")} + excluded.{quote("count")}',
+            rows,
+        )
+
+
+def count_leads(leads, delta=1):
+    deltas = Counter()
+    for lead in leads:
+        count_lead(deltas, lead, delta)
+    apply_deltas(deltas)
+
+
+def stat_cells(leads):
+    """(sales_rep, area, dimension, value, count) of every cell, counted from `leads`"""
+    leads = leads.order_by()
+    for name in STAT_DIMENSIONS:
+        for cell in leads.values(*STAT_SCOPE, name).annotate(count=Count('id')).iterator():
+            yield cell['sales_rep'] or '', cell['area'] or '', name, cell[name] or '', cell['count']
+    for cell in leads.values(*STAT_SCOPE, week=TruncWeek('created_at')).annotate(count=Count('id')).iterator():
+        yield cell['sales_rep'] or '', cell['area'] or '', 'week', cell['week'].date().isoformat(), cell['count']
+
+
+def rebuild_lead_stats():
+    with transaction.atomic():
+        LeadStat.objects.all().delete()
+        LeadStat.objects.bulk_create(
+            LeadStat(sales_rep=sales_rep, area=area, dimension=dimension, value=value, count=count)
+            for sales_rep, area, dimension, value, count in stat_cells(Lead.objects.all())
+        )
+
+
+def lead_stats(sales_rep=None, area=None):
+    queryset = LeadStat.objects.filter(count__gt=0)
+    if sales_rep:
+        queryset = queryset.filter(sales_rep=sales_rep)
+    if area:
+        queryset = queryset.filter(area=area)
+
+    def breakdown(dimension, key, field='value'):
+        rows = (
+            queryset.filter(dimension=dimension).order_by(field).values(field)
+            .annotate(total=Sum('count')).filter(total__gt=0)
+        )
+        return [{key: row[field] or None, 'count': row['total']} for row in rows]
+
+    # Every lead has exactly one status, so the status rows count each lead once
+    status_counts = {row['status']: row['count'] for row in breakdown('status', 'status')}
+    return {
+        'total': sum(status_counts.values()),
+        'byStatus': [
+            {'status': value, 'count': status_counts.get(value, 0)} for value, _ in Lead.STATUS_CHOICES
+        ],
+        'bySalesRep': breakdown('status', 'salesRep', 'sales_rep'),
+        'byArea': breakdown('status', 'area', 'area'),
+        'bySource': breakdown('source', 'source'),
+        'byWeek': [
+            {'week': date.fromisoformat(row['week']), 'count': row['count']} for row in breakdown('week', 'week')
+        ],
+    }
@@ -0,0 +1,104 @@
+from contextlib import contextmanager
+from threading import local
+
+from django.db import transaction
+from rest_framework import serializers
+
+from .models import Product
+from .search import SEARCH_INDEXES
+
+
+_state = local()
+
+
+@contextmanager
+def manual_sync():
+    """
+    Skip the per-row search index and lead stats handlers in `api.signals`.
+    For bulk writers that update both themselves, once for the whole set of rows.
+    """
+    previous = getattr(_state, 'manual', False)
+    _state.manual = True
+    try:
+        yield
+    finally:
+        _state.manual = previous
+
+
+def synced_per_row():
+    return not getattr(_state, 'manual', False)
+
+
+def reindex_on_commit(model, *pks):
+    """
+    Rewrite the search documents of `pks` once the transaction commits,
+    however many times they or their link rows were saved or deleted in it.
+    """
+    pending = getattr(_state, 'reindex', None)
+    if pending is None:
+        pending = _state.reindex = {}
+    pending.setdefault(model, set()).update(pks)
+    # Every change registers a callback, the first one to run does the work.
+    # Ids left over by a rolled back transaction are reindexed with the next
+    # commit, which is harmless.
+    transaction.on_commit(reindex_pending)
+
+
+def forget_reindex(model, pk):
+    """Drop a pending reindex of an object that is being deleted"""
+    pending = getattr(_state, 'reindex', None)
+    if pending and model in pending:
+        pending[model].discard(pk)
+
+
+def reindex_pending():
+    pending, _state.reindex = getattr(_state, 'reindex', None), None
+    for model, ids in (pending or {}).items():
+        if ids:
+            SEARCH_INDEXES[model].update(ids)
+
+
+def sync_products(link_model, owner_field, product_ids_by_owner):
+    """
+    Make the product links of each owner match `{owner id: product ids}`.
+
+    Every id is checked with one `IN` query, then only the missing links are
+    inserted and the dropped ones deleted, in one transaction, so sending an
+    unchanged list writes nothing. The owners whose links changed are queued
+    for reindexing on commit, with any other change to them, and returned.
+    """
+    wanted = {owner_id: {str(product_id) for product_id in product_ids}
+              for owner_id, product_ids in product_ids_by_owner.items()}
+    requested = set().union(*wanted.values())
+    found = {
+        str(product_id) for product_id in
+        Product.objects.filter(id__in=[p for p in requested if p.isdigit()]).values_list('id', flat=True)
+    }
+    unknown = sorted(requested - found)
+    if unknown:
+        raise serializers.ValidationError({"error": f"Product with id {unknown[0]} not found"})
+
+    owner_column = f'{owner_field}_id'
+    current = {owner_id: {} for owner_id in wanted}
+    for link_id, owner_id, product_id in link_model.objects.filter(
+        **{f'{owner_column}__in': list(wanted)}
+    ).values_list('id', owner_column, 'product_id'):
+        current[owner_id][str(product_id)] = link_id
+
+    stale, missing, changed = [], [], set()
+    for owner_id, product_ids in wanted.items():
+        stale += [link_id for product_id, link_id in current[owner_id].items() if product_id not in product_ids]
+        missing += [(owner_id, product_id) for product_id in product_ids if product_id not in current[owner_id]]
+        if product_ids != current[owner_id].keys():
+            changed.add(owner_id)
+    if not changed:
+        return changed
+
+    with transaction.atomic(), manual_sync():
+        if stale:
+            link_model.objects.filter(pk__in=stale).delete()
+        link_model.objects.bulk_create(
+            link_model(**{owner_column: owner_id, 'product_id': int(product_id)}) for owner_id, product_id in missing
+        )
+    reindex_on_commit(link_model._meta.get_field(owner_field).related_model, *changed)
+    return changed
@@ -1,3 +1,1142 @@
-from django.test import TestCase
+import gzip
+import importlib
+import json
+import os
+import runpy
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+from io import BytesIO, StringIO
+from tempfile import TemporaryDirectory
+from unittest import skipUnless
+from unittest.mock import patch
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.db import IntegrityError, connection
+from django.db.utils import ConnectionHandler
+from django.test import AsyncClient, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import clear_url_caches, resolve
+from django.utils import timezone
+from openpyxl import Workbook
+from rest_framework.exceptions import ParseError
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from . import urls
+from .models import (
+    User, Category, SubCategory, Product, Lead, Customer, ProductInterests, CustomerProducts, LeadStat, ImportJob
+)
+from .importers import LeadImporter
+from .jobs import fail_stale_jobs
+from .management.commands.bench_api import compare
+from .metrics import MetricsFile, observe_request
+from .middleware import negotiate_encoding
+from .renderers import ORJSONRenderer, ORJSONParser
+from .search import SEARCH_INDEXES
+from .seed import RowFactory, seed_catalog, seed_dataset, upload_workbook
+from .stats import rebuild_lead_stats
+from .sync import manual_sync
+
+
+def reload_urls():
+    """Rebuild the URLconf after SERVER_MODE changes; the project URLconf holds on to api.urls' patterns"""
+    importlib.reload(urls)
+    importlib.reload(importlib.import_module(settings.ROOT_URLCONF))
+    clear_url_caches()
+
+
+@contextmanager
+def asgi_routes():
+    """Route requests as api.urls does under SERVER_MODE=asgi, with the async read views"""
+    try:
+        with override_settings(SERVER_MODE='asgi'):
+            reload_urls()
+            yield
+    finally:
+        reload_urls()
+
+
+class ApiTestCase(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_user(
+            username='admin@honeydrop.com', email='admin@honeydrop.com', password='admin',
+            name='Admin', role='admin'
+        )
+        category = Category.objects.create(name='Appliances')
+        sub_category = SubCategory.objects.create(name='Cooling', category=category)
+        cls.products = [
+            Product.objects.create(name=name, sub_category=sub_category, price=100)
+            for name in ['AC', 'Fridge', 'Washer']
+        ]
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def create_leads(self, count):
+        for i in range(count):
+            lead = Lead.objects.create(name=f'Lead {i}', phone=str(i), area='Andheri')
+            for product in self.products:
+                ProductInterests.objects.create(lead=lead, product=product)
+
+    def create_customers(self, count):
+        for i in range(count):
+            customer = Customer.objects.create(
+                name=f'Customer {i}', phone=str(i), area='Andheri', address='Main St',
+                installation_date=date(2025, 1, 1), amount=0
+            )
+            for product in self.products:
+                CustomerProducts.objects.create(customer=customer, product=product)
+
+    def lead_workbook(self, rows):
+        """An upload file of `[name, phone, area, products]` rows"""
+        workbook = Workbook()
+        workbook.active.append(['name', 'phone', 'area', 'products'])
+        for row in rows:
+            workbook.active.append(row)
+        file = BytesIO()
+        workbook.save(file)
+        file.seek(0)
+        file.name = 'leads.xlsx'
+        return file
+
+
+class ListQueryCountTests(ApiTestCase):
+    # COUNT(*) + page + related rows + products, whatever the page size
+    LIST_QUERIES = 4
+
+    def test_lead_list_query_count_is_constant(self):
+        self.create_leads(30)
+        for limit in (1, 30):
+            with self.assertNumQueries(self.LIST_QUERIES):
+                response = self.client.get('/api/leads', {'limit': limit})
+            self.assertEqual(len(response.data['results']), limit)
+
+        products = response.data['results'][0]['products']
+        self.assertEqual([product['name'] for product in products], ['AC', 'Fridge', 'Washer'])
+
+    def test_customer_list_query_count_is_constant(self):
+        self.create_customers(30)
+        for limit in (1, 30):
+            with self.assertNumQueries(self.LIST_QUERIES):
+                response = self.client.get('/api/customers', {'limit': limit})
+            self.assertEqual(len(response.data['results']), limit)
+
+        products = response.data['results'][0]['products']
+        self.assertEqual([product['name'] for product in products], ['AC', 'Fridge', 'Washer'])
+
+    def test_category_list_query_count_is_constant(self):
+        for i in range(10):
+            SubCategory.objects.create(name=f'Sub {i}', category=Category.objects.create(name=f'Category {i}'))
+        with self.assertNumQueries(2):
+            response = self.client.get('/api/categories')
+        self.assertEqual(response.data['count'], 11)
+        appliances = next(row for row in response.data['results'] if row['name'] == 'Appliances')
+        self.assertEqual(appliances['subCategoriesCount'], 1)
+
+    def test_subcategory_list_query_count_is_constant(self):
+        category = Category.objects.get(name='Appliances')
+        for i in range(10):
+            SubCategory.objects.create(name=f'Sub {i}', category=category)
+        with self.assertNumQueries(2):
+            response = self.client.get('/api/subcategories')
+        self.assertEqual(response.data['count'], 11)
+        cooling = next(row for row in response.data['results'] if row['name'] == 'Cooling')
+        self.assertEqual(cooling['productCount'], 3)
+        self.assertEqual(cooling['categoryId'], str(category.id))
+
+
+class CursorPaginationTests(ApiTestCase):
+
+    def walk(self, url, params):
+        names = []
+        response = self.client.get(url, params)
+        while True:
+            self.assertNotIn('count', response.data)
+            names.extend(row['name'] for row in response.data['results'])
+            if not response.data['next']:
+                return names
+            response = self.client.get(response.data['next'])
+
+    def test_lead_cursor_pages_cover_every_row_once(self):
+        self.create_leads(7)
+        Lead.objects.filter(name__in=['Lead 1', 'Lead 4']).update(follow_up_date=date(2025, 5, 1))
+        Lead.objects.filter(name='Lead 2').update(follow_up_date=date(2025, 4, 1))
+
+        names = self.walk('/api/leads', {'pagination': 'cursor', 'limit': 2})
+        self.assertEqual(names, [f'Lead {i}' for i in reversed(range(7))])
+
+        names = self.walk('/api/leads', {'pagination': 'cursor', 'limit': 2, 'ordering': 'follow_up_date'})
+        self.assertEqual(names[:3], ['Lead 2', 'Lead 1', 'Lead 4'])
+        self.assertCountEqual(names, [f'Lead {i}' for i in range(7)])
+
+    def test_customer_cursor_page_skips_count(self):
+        self.create_customers(5)
+        with self.assertNumQueries(3):
+            response = self.client.get('/api/customers', {'pagination': 'cursor', 'limit': 2})
+        self.assertEqual(len(response.data['results']), 2)
+        self.assertIsNotNone(response.data['next'])
+
+    def test_invalid_cursor(self):
+        response = self.client.get('/api/leads', {'cursor': 'garbage'})
+        self.assertEqual(response.status_code, 404)
+
+
+class ExportTests(ApiTestCase):
+
+    def test_lead_csv_export_uses_upload_columns_and_filters(self):
+        self.create_leads(3)
+        Lead.objects.filter(name='Lead 0').update(status='won')
+
+        response = self.client.get('/api/leads/export', {'fileType': 'csv', 'status': 'won'})
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(lines[0], 'name,phone,email,area,address,status,source,priority,notes,salesRep,followUpDate,products')
+        self.assertEqual(lines[1:], ['Lead 0,0,,Andheri,,won,,medium,,,,"AC,Fridge,Washer"'])
+
+    def test_csv_export_is_compressed_while_streaming(self):
+        self.create_leads(50)
+        response = self.client.get('/api/leads/export', {'fileType': 'csv'}, HTTP_ACCEPT_ENCODING='gzip')
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        lines = gzip.decompress(b''.join(response.streaming_content)).decode().splitlines()
+        self.assertEqual(len(lines), 51)
+
+    def test_xlsx_export_round_trips_through_upload(self):
+        self.create_leads(2)
+        Lead.objects.create(name='No products', phone='9', area='Bandra')
+        response = self.client.get('/api/leads/export')
+        file = BytesIO(b''.join(response.streaming_content))
+        file.name = 'leads.xlsx'
+        Lead.objects.all().delete()
+
+        response = self.client.post('/api/leads/upload', {'file': file}, format='multipart')
+        self.assertEqual((response.data['imported'], response.data['failed']), (3, 0))
+        self.assertFalse(Lead.objects.get(name='No products').interests.exists())
+        self.assertEqual(Lead.objects.get(name='Lead 0').interests.count(), 3)
+
+    def test_xlsx_export_is_not_recompressed(self):
+        response = self.client.get('/api/leads/export', HTTP_ACCEPT_ENCODING='gzip')
+        self.assertFalse(response.has_header('Content-Encoding'))
+
+
+class ImportTests(ApiTestCase):
+
+    def upload(self, rows):
+        return self.client.post('/api/leads/upload', {'file': self.lead_workbook(rows)}, format='multipart')
+
+    def test_valid_rows_written_in_chunks_and_bad_rows_reported(self):
+        rows = [[f'Lead {i}', str(i), 'Juhu', 'AC,Fridge'] for i in range(1200)]
+        rows.insert(600, ['No phone', None, 'Juhu', 'AC'])
+        rows.insert(1000, ['Unknown product', '1', 'Juhu', 'Heater'])
+
+        with patch.object(LeadImporter, 'flush', autospec=True, side_effect=LeadImporter.flush) as flush:
+            response = self.upload(rows)
+        self.assertEqual((response.data['imported'], response.data['failed']), (1200, 2))
+        # The header is row 1
+        self.assertEqual(response.data['errors'], [
+            {'row': 602, 'error': '`phone` is required'},
+            {'row': 1002, 'error': 'Product `Heater` not found'},
+        ])
+        # The bad rows don't break a chunk
+        self.assertEqual([len(call.args[1]) for call in flush.call_args_list], [500, 500, 200])
+        self.assertEqual(Lead.objects.count(), 1200)
+        self.assertEqual(ProductInterests.objects.count(), 2400)
+
+    def test_rejected_chunk_retried_row_by_row(self):
+        bulk_create = ProductInterests.objects.bulk_create
+
+        def reject_broken_lead(links, **kwargs):
+            links = list(links)
+            if any(link.lead.name == 'Broken' for link in links):
+                raise IntegrityError('FOREIGN KEY constraint failed')
+            return bulk_create(links, **kwargs)
+
+        rows = [['First', '1', 'Juhu', 'AC'], ['Broken', '2', 'Juhu', 'AC'], ['Last', '3', 'Juhu', 'Fridge']]
+        with patch.object(ProductInterests.objects, 'bulk_create', side_effect=reject_broken_lead):
+            response = self.upload(rows)
+        self.assertEqual((response.data['imported'], response.data['failed']), (2, 1))
+        self.assertEqual(response.data['errors'], [{'row': 3, 'error': 'FOREIGN KEY constraint failed'}])
+        # The leads inserted before the chunk failed were rolled back and written again
+        self.assertCountEqual(Lead.objects.values_list('name', flat=True), ['First', 'Last'])
+        self.assertCountEqual(
+            ProductInterests.objects.values_list('lead__name', 'product__name'), [('First', 'AC'), ('Last', 'Fridge')]
+        )
+
+
+class ImportJobTests(ApiTestCase):
+
+    def setUp(self):
+        super().setUp()
+        media = TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        self.media_root = media.name
+        media_settings = override_settings(MEDIA_ROOT=self.media_root)
+        media_settings.enable()
+        self.addCleanup(media_settings.disable)
+
+    def test_background_upload_processed_and_reported(self):
+        rows = [[f'Lead {i}', str(i), 'Juhu', 'AC'] for i in range(600)]
+        rows.insert(300, ['No phone', None, 'Juhu', 'AC'])
+        response = self.client.post(
+            '/api/leads/upload?mode=background', {'file': self.lead_workbook(rows)}, format='multipart'
+        )
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.data['status'], 'queued')
+        self.assertFalse(Lead.objects.exists())
+
+        stdout = StringIO()
+        call_command('process_imports', once=True, stdout=stdout, stderr=StringIO())
+        self.assertIn(f"Import #{response.data['id']} done: 600 imported, 1 failed", stdout.getvalue())
+
+        job = self.client.get(f"/api/imports/{response.data['id']}").json()
+        self.assertEqual(job['status'], 'done')
+        self.assertEqual((job['processedRows'], job['imported'], job['failed']), (601, 600, 1))
+        self.assertEqual(job['errors'], [{'row': 302, 'error': '`phone` is required'}])
+        self.assertIsNotNone(job['finishedAt'])
+        self.assertEqual(Lead.objects.count(), 600)
+        # The stored upload is removed once it's imported
+        self.assertEqual(os.listdir(os.path.join(self.media_root, 'imports')), [])
+
+    def test_running_jobs_without_a_heartbeat_for_the_timeout_fail(self):
+        now = timezone.now()
+        timeout = timedelta(seconds=settings.IMPORT_JOB_TIMEOUT)
+        stale = ImportJob.objects.create(
+            kind='leads', file='imports/a.xlsx', status='running', processed_rows=500,
+            started_at=now - 2 * timeout, heartbeat_at=now - timeout - timedelta(seconds=5),
+        )
+        alive = ImportJob.objects.create(
+            kind='leads', file='imports/b.xlsx', status='running',
+            started_at=now - 2 * timeout, heartbeat_at=now - timeout + timedelta(seconds=60),
+        )
+        queued = ImportJob.objects.create(kind='leads', file='imports/c.xlsx')
+
+        self.assertEqual(fail_stale_jobs(), [stale.pk])
+        stale.refresh_from_db()
+        self.assertEqual(stale.status, 'failed')
+        self.assertIsNotNone(stale.finished_at)
+        self.assertIn('after 500 rows', stale.error)
+        alive.refresh_from_db()
+        self.assertEqual(alive.status, 'running')
+        queued.refresh_from_db()
+        self.assertEqual(queued.status, 'queued')
+
+        # The worker reports the jobs it failed when it starts
+        ImportJob.objects.exclude(pk=alive.pk).delete()
+        ImportJob.objects.filter(pk=alive.pk).update(heartbeat_at=now - 2 * timeout)
+        stderr = StringIO()
+        call_command('process_imports', once=True, stdout=StringIO(), stderr=stderr)
+        self.assertEqual(stderr.getvalue().strip(), f"Import #{alive.pk} failed: its worker stopped while processing it")
+
+
+class SearchTests(ApiTestCase):
+
+    def test_lead_search_matches_prefixes_and_product_names(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.create_leads(3)
+            lead = Lead.objects.create(name='Priya Nair', phone='9812345678', area='Bandra', notes='Wants a quote')
+            ProductInterests.objects.create(lead=lead, product=Product.objects.create(name='Purifier', price=1))
+
+        names = lambda response: [row['name'] for row in response.data['results']]
+        self.assertEqual(names(self.client.get('/api/leads', {'search': 'pri'})), ['Priya Nair'])
+        self.assertEqual(names(self.client.get('/api/leads', {'search': '98123'})), ['Priya Nair'])
+        self.assertEqual(names(self.client.get('/api/leads', {'search': 'purif quote'})), ['Priya Nair'])
+        self.assertEqual(len(names(self.client.get('/api/leads', {'search': 'fridge'}))), 3)
+
+        lead.delete()
+        self.assertEqual(names(self.client.get('/api/leads', {'search': 'priya'})), [])
+
+    def test_link_changes_reindex_each_owner_once(self):
+        lead = Lead.objects.create(name='Priya Nair', phone='1', area='Bandra')
+        with patch.object(SEARCH_INDEXES[Lead], 'update', wraps=SEARCH_INDEXES[Lead].update) as update:
+            with self.captureOnCommitCallbacks(execute=True):
+                for product in self.products:
+                    ProductInterests.objects.create(lead=lead, product=product)
+            update.assert_called_once_with({lead.pk})
+
+            update.reset_mock()
+            with self.captureOnCommitCallbacks(execute=True):
+                lead.delete()
+            update.assert_not_called()
+
+    def test_lead_writes_index_each_document_once(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.create_leads(2)
+        first, second = Lead.objects.order_by('id')
+        product_ids = [self.products[0].pk]
+        with patch.object(SEARCH_INDEXES[Lead], 'update', wraps=SEARCH_INDEXES[Lead].update) as update:
+            with self.captureOnCommitCallbacks(execute=True):
+                response = self.client.patch(f'/api/leads/{first.pk}', {'notes': 'x', 'productIds': product_ids}, format='json')
+            self.assertEqual(response.status_code, 200)
+            update.assert_called_once_with({first.pk})
+
+            update.reset_mock()
+            with self.captureOnCommitCallbacks(execute=True):
+                response = self.client.post('/api/leads/batch', [
+                    {'op': 'update', 'id': lead.pk, 'data': {'productIds': product_ids}} for lead in (first, second)
+                ], format='json')
+            self.assertEqual(response.status_code, 200)
+            update.assert_called_once_with({first.pk, second.pk})
+        self.assertEqual(self.client.get('/api/leads', {'search': 'lead'}).json()['count'], 2)
+
+    def test_customer_search_follows_product_rename(self):
+        self.create_customers(2)
+        product = self.products[0]
+        product.name = 'Airconditioner'
+        product.save()
+        response = self.client.get('/api/customers', {'search': 'aircon'})
+        self.assertEqual(response.data['count'], 2)
+
+
+@skipUnless(connection.vendor == 'sqlite', "EXPLAIN QUERY PLAN is SQLite syntax")
+class QueryPlanTests(ApiTestCase):
+    """Every list filter/ordering path must be served by an index, not a full scan or a sort"""
+
+    LEAD_PARAMS = [
+        {},
+        {'status': 'won'},
+        {'salesRep': 'Rajesh Kumar'},
+        {'area': 'Andheri'},
+        {'priority': 'high'},
+        {'source': 'Referral'},
+        {'follow_up_date': '2025-05-01'},
+        {'fromDate': '2025-01-01', 'toDate': '2025-02-01'},
+        {'ordering': 'follow_up_date'},
+        {'ordering': '-follow_up_date'},
+        {'ordering': 'created_at'},
+        {'status': 'won', 'salesRep': 'Rajesh Kumar'},
+        {'pagination': 'cursor'},
+        {'pagination': 'cursor', 'status': 'new'},
+    ]
+    CUSTOMER_PARAMS = [
+        {},
+        {'status': 'active'},
+        {'salesRep': 'Rajesh Kumar'},
+        {'area': 'Andheri'},
+        {'ordering': 'expiry_date'},
+        {'ordering': '-installation_date'},
+        {'pagination': 'cursor'},
+        {'pagination': 'cursor', 'salesRep': 'Rajesh Kumar'},
+    ]
+
+    def assert_indexed(self, url, params, table):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200)
+
+        for query in context.captured_queries:
+            if not query['sql'].startswith('SELECT'):
+                continue
+            with connection.cursor() as cursor:
+                cursor.execute(f"EXPLAIN QUERY PLAN {query['sql']}")
+                plan = [row[-1] for row in cursor.fetchall()]
+            for step in plan:
+                with self.subTest(url=url, params=params, step=step):
+                    self.assertNotRegex(step, rf'^SCAN {table}$')
+                    self.assertNotIn('TEMP B-TREE FOR ORDER BY', step)
+
+    def test_lead_list_paths_use_indexes(self):
+        for params in self.LEAD_PARAMS:
+            self.assert_indexed('/api/leads', params, 'leads')
+
+    def test_customer_list_paths_use_indexes(self):
+        for params in self.CUSTOMER_PARAMS:
+            self.assert_indexed('/api/customers', params, 'customers')
+
+
+class LeadStatsTests(ApiTestCase):
+
+    def stats(self, **params):
+        response = self.client.get('/api/leads/stats', params)
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def test_stats_follow_create_update_delete_import_and_convert(self):
+        self.create_leads(3)
+        lead = Lead.objects.create(
+            name='Priya', phone='1', area='Bandra', address='Linking Rd', sales_rep='Vikram', source='Walk-in'
+        )
+        lead.status = 'contacted'
+        lead.save()
+        Lead.objects.get(name='Lead 0').delete()
+
+        response = self.client.post(f'/api/leads/{lead.pk}/convert', {'installationDate': '2025-01-01'})
+        self.assertEqual(response.status_code, 201)
+
+        stats = self.stats()
+        self.assertEqual(stats['total'], 3)
+        self.assertEqual({row['status']: row['count'] for row in stats['byStatus']}['new'], 2)
+        self.assertEqual({row['status']: row['count'] for row in stats['byStatus']}['won'], 1)
+        self.assertEqual(stats['byArea'], [{'area': 'Andheri', 'count': 2}, {'area': 'Bandra', 'count': 1}])
+        self.assertEqual(stats['bySource'], [{'source': None, 'count': 2}, {'source': 'Walk-in', 'count': 1}])
+        self.assertEqual(self.stats(salesRep='Vikram')['total'], 1)
+
+        cells = lambda: sorted(
+            LeadStat.objects.filter(count__gt=0).values_list('sales_rep', 'area', 'dimension', 'value', 'count')
+        )
+        incremental = cells()
+        rebuild_lead_stats()
+        self.assertEqual(incremental, cells())
+
+    def test_stats_count_imported_leads(self):
+        workbook = Workbook()
+        workbook.active.append(['name', 'phone', 'area', 'products', 'salesRep'])
+        for i in range(5):
+            workbook.active.append([f'Imported {i}', str(i), 'Juhu', 'AC', 'Anita'])
+        file = BytesIO()
+        workbook.save(file)
+        file.seek(0)
+        file.name = 'leads.xlsx'
+
+        response = self.client.post('/api/leads/upload', {'file': file}, format='multipart')
+        self.assertEqual(response.data['imported'], 5)
+        self.assertEqual(self.stats(area='Juhu')['bySalesRep'], [{'salesRep': 'Anita', 'count': 5}])
+
+    def test_import_upserts_the_stats_once_per_chunk(self):
+        seed_catalog()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post('/api/leads/upload', {'file': upload_workbook('leads', 1200)}, format='multipart')
+        self.assertEqual(response.data['imported'], 1200)
+        # 500-row chunks
+        self.assertEqual(len([query for query in queries if 'lead_stats' in query['sql']]), 3)
+
+        stats = self.stats()
+        self.assertEqual(stats['total'], 1200)
+        self.assertEqual(sum(row['count'] for row in stats['byWeek']), 1200)
+        self.assertEqual(sum(row['count'] for row in stats['bySource']), 1200)
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class CachedAuthenticationTests(ApiTestCase):
+
+    def setUp(self):
+        # Test transactions roll back without signals, so start from an empty cache
+        cache.clear()
+        self.client = APIClient()
+        token = AccessToken.for_user(self.admin)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+
+    def test_user_served_from_cache(self):
+        self.client.get('/api/categories')
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/categories')
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse([q for q in queries if '"users"' in q['sql']])
+        self.assertNotIn(self.admin.password, str(cache.get(f'auth-user:{self.admin.pk}')))
+        # The rest of the profile loads when it is needed
+        self.assertEqual(self.client.get('/api/auth/me').json()['email'], 'admin@honeydrop.com')
+
+    def test_saving_user_invalidates_cache(self):
+        self.client.get('/api/auth/me')
+        self.admin.is_active = False
+        self.admin.save()
+        self.assertEqual(self.client.get('/api/auth/me').status_code, 401)
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class CatalogTests(ApiTestCase):
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+
+    def test_tree_built_in_three_queries(self):
+        with self.assertNumQueries(3):
+            response = self.client.get('/api/catalog')
+        self.assertEqual(response.status_code, 200)
+        category = response.json()['categories'][0]
+        self.assertEqual(category['subCategories'][0]['productCount'], 3)
+        self.assertEqual([p['name'] for p in category['subCategories'][0]['products']], ['AC', 'Fridge', 'Washer'])
+
+    def test_etag_round_trip(self):
+        etag = self.client.get('/api/catalog')['ETag']
+        with self.assertNumQueries(0):
+            response = self.client.get('/api/catalog', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.products[0].name = 'Air Conditioner'
+            self.products[0].save()
+        response = self.client.get('/api/catalog', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertIn('Air Conditioner', response.content.decode())
+
+
+class LeadBatchTests(ApiTestCase):
+
+    def test_create_update_delete(self):
+        self.create_leads(2)
+        first, second = Lead.objects.order_by('id')
+        ac, fridge = self.products[0].pk, self.products[1].pk
+        operations = [
+            {'op': 'create', 'data': {'name': f'New {i}', 'phone': str(i), 'area': 'Bandra', 'productIds': [ac]}}
+            for i in range(20)
+        ] + [
+            {'op': 'update', 'id': first.pk, 'data': {'status': 'contacted', 'productIds': [fridge]}},
+            {'op': 'delete', 'id': second.pk},
+        ]
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post('/api/leads/batch', operations, format='json')
+        self.assertEqual(response.status_code, 200)
+
+        results = response.json()['results']
+        self.assertEqual([r['op'] for r in results], ['create'] * 20 + ['update', 'delete'])
+        self.assertEqual(Lead.objects.filter(area='Bandra', interests__product=ac).count(), 20)
+        first.refresh_from_db()
+        self.assertEqual(first.status, 'contacted')
+        self.assertEqual(list(first.interests.values_list('product_id', flat=True)), [fridge])
+        self.assertFalse(Lead.objects.filter(pk=second.pk).exists())
+
+        stats = {row.value: row.count for row in LeadStat.objects.filter(dimension='status', count__gt=0)}
+        self.assertEqual(stats, {'new': 20, 'contacted': 1})
+        self.assertEqual(self.client.get('/api/leads?search=new').json()['count'], 20)
+
+    def batch_queries(self, size):
+        """Queries of a batch creating, updating and deleting `size` leads each, search index included"""
+        with self.captureOnCommitCallbacks(execute=True):
+            self.create_leads(2 * size)
+        ids = list(Lead.objects.order_by('-id').values_list('id', flat=True)[:2 * size])
+        ac, fridge = self.products[0].pk, self.products[1].pk
+        operations = [
+            {'op': 'create', 'data': {'name': f'New {i}', 'phone': str(i), 'area': 'Bandra', 'productIds': [ac]}}
+            for i in range(size)
+        ] + [
+            {'op': 'update', 'id': lead_id, 'data': {'status': 'contacted', 'productIds': [fridge]}}
+            for lead_id in ids[:size]
+        ] + [
+            {'op': 'delete', 'id': lead_id} for lead_id in ids[size:]
+        ]
+        with CaptureQueriesContext(connection) as queries, self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post('/api/leads/batch', operations, format='json')
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def test_query_count_does_not_grow_with_the_batch(self):
+        self.assertEqual(self.batch_queries(20), self.batch_queries(1))
+
+    def test_invalid_batch_saves_nothing(self):
+        response = self.client.post('/api/leads/batch', [
+            {'op': 'create', 'data': {'name': 'Ok', 'phone': '1', 'area': 'Bandra', 'productIds': []}},
+            {'op': 'create', 'data': {'name': 'No phone', 'area': 'Bandra', 'productIds': [999]}},
+            {'op': 'delete', 'id': 999},
+            {'op': 'merge'},
+        ], format='json')
+        self.assertEqual(response.status_code, 400)
+        errors = response.json()['errors']
+        self.assertEqual(errors[0], {})
+        self.assertIn('phone', errors[1])
+        self.assertEqual(errors[1]['productIds'], ['Product with id 999 not found'])
+        self.assertIn('id', errors[2])
+        self.assertIn('op', errors[3])
+        self.assertFalse(Lead.objects.exists())
+
+
+class ProductLinkTests(ApiTestCase):
+
+    def test_update_writes_only_the_diff(self):
+        self.create_leads(1)
+        lead = Lead.objects.get()
+        ac, fridge, washer = (product.pk for product in self.products)
+        kept = lead.interests.get(product=ac).pk
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.patch(f'/api/leads/{lead.pk}', {'productIds': [ac, fridge, washer]}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse([q for q in queries if 'api_productinterests' in q['sql'] and not q['sql'].startswith('SELECT')])
+        # The response reads the products back in one query, not one per link
+        self.assertEqual(len([q for q in queries if 'FROM "products" INNER JOIN' in q['sql']]), 1)
+        self.assertEqual([p['name'] for p in response.json()['products']], ['AC', 'Fridge', 'Washer'])
+
+        response = self.client.patch(f'/api/leads/{lead.pk}', {'productIds': [ac]}, format='json')
+        self.assertEqual([p['name'] for p in response.json()['products']], ['AC'])
+        self.assertEqual(list(lead.interests.values_list('pk', flat=True)), [kept])
+        self.assertEqual(self.client.get('/api/leads?search=fridge').json()['count'], 0)
+
+    def test_unknown_product_rolls_back(self):
+        response = self.client.post('/api/customers', {
+            'name': 'C', 'phone': '1', 'area': 'Andheri', 'address': 'Main St',
+            'installationDate': '2025-01-01', 'amount': 0, 'productIds': [self.products[0].pk, 999],
+        }, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), {'error': 'Product with id 999 not found'})
+        self.assertFalse(Customer.objects.exists())
+
+
+class BulkConvertTests(ApiTestCase):
+
+    def test_convert_many(self):
+        self.create_leads(50)
+        Lead.objects.update(address='Main St')
+        rebuild_lead_stats()
+        items = [
+            {'leadId': lead_id, 'installationDate': '2025-01-01', 'warrantyYears': 3}
+            for lead_id in Lead.objects.order_by('id').values_list('id', flat=True)
+        ]
+        with self.captureOnCommitCallbacks(execute=True), CaptureQueriesContext(connection) as queries:
+            response = self.client.post('/api/leads/convert', items, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertLess(len(queries), 25)
+
+        customers = response.json()
+        self.assertEqual(len(customers), 50)
+        self.assertEqual(customers[0]['name'], 'Lead 0')
+        self.assertEqual(customers[0]['expiryDate'], '2028-01-01')
+        self.assertEqual(len(customers[0]['products']), 3)
+        self.assertEqual(Lead.objects.filter(status='won').count(), 50)
+        self.assertEqual(LeadStat.objects.get(dimension='status', value='won').count, 50)
+        self.assertFalse(LeadStat.objects.filter(dimension='status', value='new', count__gt=0).exists())
+        self.assertEqual(self.client.get('/api/customers?search=lead').json()['count'], 50)
+
+    def test_invalid_item_converts_nothing(self):
+        self.create_leads(1)
+        lead = Lead.objects.get()
+        response = self.client.post('/api/leads/convert', [
+            {'leadId': lead.pk, 'installationDate': '2025-01-01'},
+            {'leadId': 999, 'installationDate': '2025-01-01'},
+        ], format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['errors'][0], {'leadId': [f'Lead {lead.pk} has no address']})
+        self.assertIn('leadId', response.json()['errors'][1])
+        self.assertFalse(Customer.objects.exists())
+
+    def test_single_and_bulk_convert_validate_alike(self):
+        self.create_leads(2)
+        first, second = Lead.objects.order_by('id')
+        Lead.objects.update(address='')
+        item = {'installationDate': '2025-01-01'}
+
+        self.assertEqual(self.client.post(f'/api/leads/{first.pk}/convert', item, format='json').status_code, 201)
+        response = self.client.post(f'/api/leads/{first.pk}/convert', item, format='json')
+        self.assertEqual(response.json(), {'error': f'Lead {first.pk} is already converted'})
+
+        response = self.client.post('/api/leads/convert', [dict(item, leadId=first.pk)], format='json')
+        self.assertEqual(response.json()['errors'][0], {'leadId': [f'Lead {first.pk} is already converted']})
+        response = self.client.post('/api/leads/convert', [dict(item, leadId=second.pk)], format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(Customer.objects.count(), 2)
+
+    def test_conversion_is_recorded_not_read_from_the_status(self):
+        self.create_leads(2)
+        converted, marked = Lead.objects.order_by('id')
+        Lead.objects.update(address='Main St')
+        item = {'installationDate': '2025-01-01'}
+
+        with CaptureQueriesContext(connection) as queries, self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(f'/api/leads/{converted.pk}/convert', item, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertLessEqual(len(queries), 25)
+        converted.refresh_from_db()
+        self.assertEqual(converted.customer_id, response.json()['id'])
+        self.assertEqual(self.client.get('/api/customers', {'search': 'fridge'}).json()['count'], 1)
+
+        # Moving a converted lead back doesn't make it convertible again
+        self.client.patch(f'/api/leads/{converted.pk}', {'status': 'new'}, format='json')
+        response = self.client.post(f'/api/leads/{converted.pk}/convert', item, format='json')
+        self.assertEqual(response.status_code, 400)
+
+        # A lead marked won by hand still converts
+        self.client.patch(f'/api/leads/{marked.pk}', {'status': 'won'}, format='json')
+        response = self.client.post('/api/leads/convert', [dict(item, leadId=marked.pk)], format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(Customer.objects.count(), 2)
+
+
+class SqliteSettingsTests(TestCase):
+
+    def pragmas(self, database):
+        """The pragmas and transaction mode of a connection opened with `database`, on a new file"""
+        directory = TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        handler = ConnectionHandler({'default': dict(database, NAME=os.path.join(directory.name, 'db.sqlite3'))})
+        try:
+            with handler['default'].cursor() as cursor:
+                pragmas = {}
+                for name in ('journal_mode', 'synchronous', 'busy_timeout'):
+                    cursor.execute(f'PRAGMA {name}')
+                    pragmas[name] = cursor.fetchone()[0]
+            return pragmas, handler['default'].transaction_mode
+        finally:
+            handler.close_all()
+
+    def test_sqlite_connections_use_the_pragmas(self):
+        self.assertEqual(
+            self.pragmas(settings.SQLITE_DATABASE),
+            ({'journal_mode': 'wal', 'synchronous': 1, 'busy_timeout': 5000}, 'IMMEDIATE')
+        )
+
+    def test_sqlite_database_url_uses_the_pragmas(self):
+        with patch.dict(os.environ, {'DATABASE_URL': 'sqlite:////srv/honeydrop.sqlite3'}):
+            databases = runpy.run_module('honeydrop.settings')['DATABASES']
+        self.assertEqual(databases['default']['NAME'], '/srv/honeydrop.sqlite3')
+        self.assertEqual(databases['default']['CONN_MAX_AGE'], settings.SQLITE_DATABASE['CONN_MAX_AGE'])
+        self.assertEqual(
+            self.pragmas(databases['default']),
+            ({'journal_mode': 'wal', 'synchronous': 1, 'busy_timeout': 5000}, 'IMMEDIATE')
+        )
+
+
+@skipUnless(connection.vendor == 'postgresql', "Copies into the default database, which must be PostgreSQL")
+class CopySqliteToPostgresTests(TestCase):
+    # The 'sqlite' alias only exists when DATABASE_URL is set
+    databases = {'default', 'sqlite'} & set(settings.DATABASES)
+
+    def setUp(self):
+        # Plain bulk writes: the signal handlers would update the default database's index and stats
+        with manual_sync():
+            sub_category = SubCategory.objects.using('sqlite').create(
+                name='Cooling', category=Category.objects.using('sqlite').create(name='Appliances')
+            )
+            self.products = Product.objects.using('sqlite').bulk_create(
+                Product(name=name, sub_category=sub_category, price=100) for name in ['AC', 'Fridge']
+            )
+            self.add_leads(3)
+
+    def add_leads(self, count):
+        with manual_sync():
+            start = Lead.objects.using('sqlite').count()
+            leads = Lead.objects.using('sqlite').bulk_create(
+                Lead(name=f'Lead {i}', phone=str(i), area='Andheri') for i in range(start, start + count)
+            )
+            ProductInterests.objects.using('sqlite').bulk_create(
+                ProductInterests(lead=lead, product=product) for lead in leads for product in self.products
+            )
+        return leads
+
+    def copy(self, *args):
+        call_command('copy_sqlite_to_postgres', *args, chunk=2, stdout=StringIO())
+
+    def assertCopied(self, *models):
+        for model in models:
+            source = list(model._base_manager.using('sqlite').order_by('pk').values_list())
+            self.assertEqual(list(model._base_manager.using('default').order_by('pk').values_list()), source)
+
+    def test_first_copy_then_catch_up_then_final_run(self):
+        self.copy('--truncate')
+        self.assertCopied(Category, SubCategory, Product, Lead, ProductInterests)
+        # Sequences continue after the copied keys
+        last_lead = Lead.objects.using('sqlite').order_by('-pk').first()
+        self.assertEqual(Lead.objects.create(name='New', phone='9', area='Juhu').pk, last_lead.pk + 1)
+        Lead.objects.filter(name='New').delete()
+
+        # --since-last only copies the rows added since
+        with manual_sync():
+            Lead.objects.using('sqlite').filter(pk=last_lead.pk).update(name='Renamed')
+        added = self.add_leads(2)
+        self.copy('--since-last')
+        self.assertEqual(Lead.objects.count(), 5)
+        self.assertEqual(Lead.objects.get(pk=added[0].pk).name, added[0].name)
+        self.assertEqual(Lead.objects.get(pk=last_lead.pk).name, last_lead.name)
+
+        # The final run carries over updates and deletes
+        with manual_sync():
+            ProductInterests.objects.using('sqlite').filter(lead=added[1]).delete()
+            Lead.objects.using('sqlite').filter(pk=added[1].pk).delete()
+        self.copy('--prune')
+        self.assertCopied(Category, SubCategory, Product, Lead, ProductInterests)
+        self.assertEqual(Lead.objects.get(pk=last_lead.pk).name, 'Renamed')
+        self.assertEqual(ProductInterests.objects.count(), 8)
+        last_lead = Lead.objects.using('sqlite').order_by('-pk').first()
+        self.assertEqual(Lead.objects.create(name='New', phone='9', area='Juhu').pk, last_lead.pk + 1)
+
+    def test_prune_refuses_a_partial_run(self):
+        with self.assertRaisesMessage(CommandError, 'without --since-last'):
+            self.copy('--prune', '--since-last')
+
+
+class RendererTests(TestCase):
+
+    def test_orjson_output_matches_stock_renderer(self):
+        data = {
+            'amount': Decimal('45999.50'), 'installationDate': date(2025, 1, 1),
+            'createdAt': datetime(2025, 1, 1, 10, 15, 30, 123456, tzinfo=dt_timezone.utc),
+            'naive': datetime(2025, 1, 1), 'notes': 'caf\u00e9 \u2028', 'items': [None, True, 1.5],
+        }
+        self.assertEqual(ORJSONRenderer().render(data), JSONRenderer().render(data))
+
+    def test_parser_rejects_invalid_json(self):
+        with self.assertRaises(ParseError):
+            ORJSONParser().parse(BytesIO(b'{"a": NaN}'))
+
+
+class SparseFieldsTests(ApiTestCase):
+
+    def test_fields_prune_serializer_and_sql(self):
+        self.create_leads(5)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/leads?fields=name,phone,status,followUpDate')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            response.json()['results'][0], {'name': 'Lead 4', 'phone': '4', 'status': 'new', 'followUpDate': None}
+        )
+        # count + page, no product prefetch, and no unused columns
+        self.assertEqual(len(queries), 2)
+        self.assertNotIn('"notes"', queries[-1]['sql'])
+
+    def test_omit(self):
+        self.create_customers(2)
+        with self.assertNumQueries(2):
+            response = self.client.get('/api/customers?omit=products')
+        self.assertNotIn('products', response.json()['results'][0])
+        self.assertIn('amount', response.json()['results'][0])
+
+    def test_unknown_field(self):
+        response = self.client.get('/api/leads?fields=name,secret')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), {'error': 'Unknown field `secret`'})
+
+
+class CompressionTests(ApiTestCase):
+
+    def test_negotiation(self):
+        self.assertEqual(negotiate_encoding('gzip, deflate, br, zstd', ('zstd', 'br', 'gzip')), 'zstd')
+        self.assertEqual(negotiate_encoding('gzip;q=0.5, br;q=0', ('br', 'gzip')), 'gzip')
+        self.assertEqual(negotiate_encoding('*', ('gzip',)), 'gzip')
+        self.assertIsNone(negotiate_encoding('identity', ('gzip',)))
+
+    def test_large_list_compressed_small_body_not(self):
+        self.create_leads(30)
+        response = self.client.get('/api/leads', HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(json.loads(gzip.decompress(response.content))['count'], 30)
+        self.assertIn('Accept-Encoding', response['Vary'])
+
+        response = self.client.get('/api/leads?limit=1&fields=name', HTTP_ACCEPT_ENCODING='gzip')
+        self.assertFalse(response.has_header('Content-Encoding'))
+
+
+class AsyncReadTests(ApiTestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.enterContext(asgi_routes())
+        self.client = AsyncClient()
+        self.auth = {'Authorization': f'Bearer {AccessToken.for_user(self.admin)}'}
+
+    async def test_list_and_retrieve(self):
+        await sync_to_async(self.create_leads)(3)
+        response = await self.client.get('/api/leads', {'fields': 'id,name,products'}, headers=self.auth)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['count'], 3)
+        lead = response.json()['results'][0]
+        self.assertEqual(len(lead['products']), 3)
+
+        response = await self.client.get(f"/api/leads/{lead['id']}", headers=self.auth)
+        self.assertEqual(response.json()['name'], lead['name'])
+        self.assertEqual((await self.client.get('/api/leads/999', headers=self.auth)).status_code, 404)
+
+        response = await self.client.get('/api/leads', {'pagination': 'cursor', 'limit': 2}, headers=self.auth)
+        self.assertEqual(len(response.json()['results']), 2)
+        self.assertIsNotNone(response.json()['next'])
+
+    async def test_auth_and_writes(self):
+        self.assertEqual((await self.client.get('/api/auth/me')).status_code, 401)
+        self.assertEqual((await self.client.get('/api/auth/me', headers=self.auth)).json()['email'], 'admin@honeydrop.com')
+        self.assertEqual((await self.client.get('/api/health')).json(), 'OK')
+        self.assertEqual((await self.client.post('/api/health')).status_code, 405)
+
+        response = await self.client.post('/api/leads', {
+            'name': 'Async', 'phone': '1', 'area': 'Andheri', 'productIds': [self.products[0].pk]
+        }, content_type='application/json', headers=self.auth)
+        self.assertEqual(response.status_code, 201)
+
+    def test_mounted_only_under_asgi(self):
+        self.assertIsNone(resolve('/api/leads/1').url_name)
+        with override_settings(SERVER_MODE='wsgi'):
+            reload_urls()
+            self.assertEqual(resolve('/api/leads/1').url_name, 'lead-detail')
+            # The DRF health view, GET only
+            self.assertEqual(set(resolve('/api/health').func.cls.http_method_names), {'get', 'options'})
+        reload_urls()
+
+
+class InstrumentationTests(ApiTestCase):
+
+    def test_server_timing(self):
+        self.create_leads(3)
+        timing = self.client.get('/api/leads')['Server-Timing']
+        self.assertRegex(timing, r'^total;dur=[\d.]+, db;dur=[\d.]+;desc="[1-9]\d* queries"')
+        self.assertIn('serialize;dur=', timing)
+        self.assertIn('render;dur=', timing)
+
+    @override_settings(SLOW_REQUEST_MS=0)
+    def test_slow_request_log(self):
+        self.create_leads(3)
+        with self.assertLogs('api.requests', 'WARNING') as logs:
+            self.client.get('/api/leads', {'status': 'new'})
+        entry = json.loads(logs.records[0].getMessage())
+        self.assertEqual((entry['view'], entry['status'], entry['path']), ('LeadViewSet.list', 200, '/api/leads'))
+        self.assertGreater(entry['queries'], 0)
+        self.assertLessEqual(len(entry['slowestQueries']), 5)
+        self.assertIn('SELECT', entry['slowestQueries'][0]['sql'])
+
+    async def test_async_views_counted(self):
+        await sync_to_async(self.create_leads)(2)
+        auth = {'Authorization': f'Bearer {AccessToken.for_user(self.admin)}'}
+        with self.assertLogs('api.requests', 'WARNING') as logs, self.settings(SLOW_REQUEST_MS=0), asgi_routes():
+            response = await AsyncClient().get('/api/leads', headers=auth)
+        self.assertNotIn('db;dur=0.0;desc="0 queries"', response['Server-Timing'])
+        self.assertEqual(json.loads(logs.records[0].getMessage())['view'], 'LeadViewSet.list')
+
+
+class MetricsTests(ApiTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.directory = self.enterContext(TemporaryDirectory())
+        self.enterContext(override_settings(METRICS_DIR=self.directory))
+
+    def scrape(self, client=None, **extra):
+        response = (client or self.client).get('/api/metrics', **extra)
+        self.assertEqual(response.status_code, 200)
+        return dict(line.rsplit(' ', 1) for line in response.content.decode().splitlines() if not line.startswith('#'))
+
+    def test_requests_and_uploads_counted(self):
+        self.create_leads(2)
+        self.client.get('/api/leads')
+        self.client.get(f'/api/leads/{Lead.objects.first().pk}')
+        self.client.get(f'/api/leads/{Lead.objects.last().pk}')
+        self.client.post('/api/leads/upload', {'file': upload_workbook('leads', 5)}, format='multipart')
+
+        samples = self.scrape()
+        labels = 'route="/api/leads/<pk>",method="GET"'
+        self.assertEqual(samples[f'http_requests_total{{{labels},status="200"}}'], '2')
+        self.assertEqual(samples[f'http_request_duration_seconds_bucket{{{labels},le="+Inf"}}'], '2')
+        self.assertEqual(samples[f'http_request_duration_seconds_count{{{labels}}}'], '2')
+        self.assertGreater(int(samples[f'http_request_db_queries_total{{{labels}}}']), 0)
+        self.assertIn('http_requests_total{route="/api/leads/upload",method="POST",status="200"}', samples)
+        self.assertEqual(samples['upload_rows_total{kind="leads"}'], '5')
+        # The scrape itself is in flight
+        self.assertEqual(samples['http_requests_in_flight'], '1')
+
+    def test_import_jobs_counted_from_the_database(self):
+        started = timezone.now()
+        ImportJob.objects.bulk_create([
+            ImportJob(kind='leads', file='imports/a.xlsx', status='done', processed_rows=100,
+                      started_at=started, finished_at=started + timedelta(seconds=4)),
+            ImportJob(kind='leads', file='imports/b.xlsx', status='failed', processed_rows=20,
+                      started_at=started, finished_at=started + timedelta(seconds=1)),
+            ImportJob(kind='leads', file='imports/c.xlsx', status='running', processed_rows=50, started_at=started),
+        ])
+
+        samples = self.scrape()
+        self.assertEqual(samples['import_jobs{kind="leads",status="done"}'], '1')
+        self.assertEqual(samples['import_jobs{kind="leads",status="running"}'], '1')
+        self.assertEqual(samples['import_job_rows_total{kind="leads"}'], '120')
+        self.assertEqual(samples['import_job_seconds_total{kind="leads"}'], '5')
+
+    def test_exited_workers_keep_counters_not_gauges(self):
+        exited = MetricsFile(os.path.join(self.directory, '999999999.db'))
+        exited.add([('http_requests_total{route="/api/catalog",method="GET",status="200"}', 3), ('http_requests_in_flight', 2)])
+        observe_request('/api/catalog', 'GET', 200, 0.02, 1, 0.001)
+
+        samples = self.scrape()
+        self.assertEqual(samples['http_requests_total{route="/api/catalog",method="GET",status="200"}'], '4')
+        self.assertEqual(samples['http_requests_in_flight'], '1')
+
+    def test_access(self):
+        anonymous = APIClient()
+        self.scrape(anonymous)
+        self.assertEqual(anonymous.get('/api/metrics', HTTP_X_FORWARDED_FOR='203.0.113.5').status_code, 401)
+        self.assertEqual(anonymous.get('/api/metrics', REMOTE_ADDR='203.0.113.5').status_code, 401)
+        self.scrape(REMOTE_ADDR='203.0.113.5')
+
+        sales = User.objects.create_user(username='sales', email='sales@honeydrop.com', password='x', role='sales')
+        self.client.force_authenticate(sales)
+        self.assertEqual(self.client.get('/api/metrics', HTTP_X_REAL_IP='203.0.113.5').status_code, 403)
+
+
+class ProfilerTests(ApiTestCase):
+
+    def setUp(self):
+        self.client = APIClient()
+        self.directory = self.enterContext(TemporaryDirectory())
+        self.enterContext(override_settings(PROFILES_DIR=self.directory, PROFILES_KEPT=2))
+        self.auth = {'HTTP_AUTHORIZATION': f'Bearer {AccessToken.for_user(self.admin)}'}
+
+    def test_admin_profile_stored_and_served(self):
+        self.create_leads(2)
+        response = self.client.get('/api/leads', HTTP_X_PROFILE='1', **self.auth)
+        self.assertEqual(response.status_code, 200)
+        profile_id = response['X-Profile-Id']
+
+        report = self.client.get(f'/api/profiles/{profile_id}', **self.auth)
+        self.assertIn('GET /api/leads -> 200', report.content.decode())
+        self.assertIn('cumulative', report.content.decode())
+        raw = self.client.get(f'/api/profiles/{profile_id}.prof', **self.auth)
+        self.assertIn('attachment', raw['Content-Disposition'])
+        self.assertEqual(self.client.get('/api/profiles/../settings', **self.auth).status_code, 404)
+
+        for _ in range(2):
+            self.client.get('/api/leads?profile=1', **self.auth)
+        self.assertEqual(len(os.listdir(self.directory)), 4)
+        self.assertEqual(self.client.get(f'/api/profiles/{profile_id}', **self.auth).status_code, 404)
+
+    async def test_async_views_profiled(self):
+        auth = {'Authorization': f'Bearer {AccessToken.for_user(self.admin)}'}
+        with asgi_routes():
+            response = await AsyncClient().get('/api/leads', {'profile': '1'}, headers=auth)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(os.path.exists(os.path.join(self.directory, f"{response['X-Profile-Id']}.txt")))
+
+    def test_only_admins_and_capped(self):
+        sales = User.objects.create_user(username='sales', email='sales@honeydrop.com', password='x', role='sales')
+        sales_auth = {'HTTP_AUTHORIZATION': f'Bearer {AccessToken.for_user(sales)}'}
+        response = self.client.get('/api/leads?profile=1', **sales_auth)
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.has_header('X-Profile-Id'))
+        self.assertEqual(self.client.get('/api/leads?profile=1', HTTP_AUTHORIZATION='Bearer bad').status_code, 401)
+
+        with override_settings(PROFILER_MAX_CONCURRENT=0):
+            response = self.client.get('/api/leads', HTTP_X_PROFILE='1', **self.auth)
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(os.listdir(self.directory), [])
+
+
+class BenchmarkTests(ApiTestCase):
+
+    def test_seeded_upload_files_import_cleanly(self):
+        for kind in ('leads', 'customers'):
+            response = self.client.post(f'/api/{kind}/upload', {'file': upload_workbook(kind, 20)}, format='multipart')
+            self.assertEqual((response.data['imported'], response.data['failed']), (20, 0))
+
+    def test_seed_dataset_is_deterministic_and_searchable(self):
+        rows = lambda: list(RowFactory(7, self.products, ['Anita'], end=date(2026, 1, 1)).leads(0, 50))
+        self.assertEqual(rows(), rows())
+
+        seed_dataset(leads=30, customers=10, end=date(2026, 1, 1))
+        self.assertEqual((Lead.objects.count(), Customer.objects.count()), (30, 10))
+        self.assertEqual(Lead.objects.filter(created_at__date__gt=date(2026, 1, 1)).count(), 0)
+        self.assertTrue(Lead._meta.get_field('created_at').auto_now_add)
+        lead = Lead.objects.last()
+        response = self.client.get('/api/leads', {'search': lead.phone})
+        self.assertEqual([row['id'] for row in response.data['results']], [lead.pk])
+        self.assertEqual(self.client.get('/api/leads/stats').data['total'], 30)
+
+    def test_seed_data_writes_upload_files(self):
+        with TemporaryDirectory() as directory:
+            call_command('seed_data', leads=15, customers=5, xlsx=directory, stdout=StringIO())
+            seed_catalog()
+            for kind, rows in (('leads', 15), ('customers', 5)):
+                with open(os.path.join(directory, f'{kind}.xlsx'), 'rb') as file:
+                    response = self.client.post(f'/api/{kind}/upload', {'file': file}, format='multipart')
+                self.assertEqual((response.data['imported'], response.data['failed']), (rows, 0))
+
+    def test_compare_flags_regressions(self):
+        result = {'p50Ms': 100.0, 'queries': 4, 'peakKib': 1000}
+        baseline = {'fast': result, 'slower': result, 'noisy': dict(result, p50Ms=2.0), 'gone': result}
+        results = {
+            'fast': dict(result, p50Ms=110.0),
+            'slower': dict(result, p50Ms=200.0, queries=5),
+            'noisy': dict(result, p50Ms=4.0),
+            'new': result,
+        }
+        lines, regressions = compare(results, baseline, threshold=0.25, min_delta_ms=5)
+        self.assertEqual(regressions, ['slower'])
+        self.assertTrue(any('missing' in line and 'gone' in line for line in lines))
@@ -1,9 +1,12 @@
+from django.conf import settings
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from .views import (
     UserViewSet, CategoryViewSet, SubCategoryViewSet,
-    ProductViewSet, LeadViewSet, CustomerViewSet, AuthViewSet, health
+    ProductViewSet, LeadViewSet, CustomerViewSet, ImportJobViewSet, AuthViewSet, health, catalog, metrics, profile
 )
+from . import async_views
+from .async_views import async_read_view
 from rest_framework.routers import DefaultRouter
 
 class NoSlashRouter(DefaultRouter):
@@ -18,9 +21,25 @@ router.register(r'subcategories', SubCategoryViewSet, basename='subcategory')
 router.register(r'products', ProductViewSet, basename='product')
 router.register(r'leads', LeadViewSet, basename='lead')
 router.register(r'customers', CustomerViewSet, basename='customer')
+router.register(r'imports', ImportJobViewSet, basename='import')
 
 
-urlpatterns = [
+# Hot read paths served with the async ORM, only under uvicorn workers (an
+# opt-in experiment); other methods fall through to the sync viewsets, and
+# WSGI workers use the router's viewsets for everything
+async_urlpatterns = [
+    path('leads', async_read_view(LeadViewSet, 'lead')),
+    path('leads/<int:pk>', async_read_view(LeadViewSet, 'lead', detail=True)),
+    path('customers', async_read_view(CustomerViewSet, 'customer')),
+    path('customers/<int:pk>', async_read_view(CustomerViewSet, 'customer', detail=True)),
+    path('auth/me', async_views.me),
+    path('health', async_views.health, name='health'),
+]
+
+urlpatterns = (async_urlpatterns if settings.SERVER_MODE == 'asgi' else []) + [
     path('', include(router.urls)),
     path('health', health, name='health'),
+    path('catalog', catalog, name='catalog'),
+    path('metrics', metrics, name='metrics'),
+    path('profiles/<str:profile_id>', profile, name='profile'),
 ]
@@ -1,7 +1,13 @@
-from datetime import datetime
+import os
+from time import perf_counter
+
 from dateutil.relativedelta import relativedelta
 
-from openpyxl import load_workbook
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count
+from django.http import FileResponse, HttpResponse
+from django.shortcuts import get_object_or_404
 from django.contrib.auth import authenticate
 from django_filters.rest_framework import DjangoFilterBackend
 
@@ -14,11 +20,22 @@ from rest_framework.filters import SearchFilter, OrderingFilter
 from rest_framework.decorators import api_view, permission_classes
 
 
-from .permissions import ManageProducts, ManageLeads, ManageUsers, ManageCategories, ManageCustomers
-from .models import User, Category, SubCategory, Product, Lead, Customer, ProductInterests, CustomerProducts
+from .batch import LeadBatch, LeadConversion, BATCH_MAX_OPERATIONS, conversion_error
+from .catalog import catalog_version, catalog_snapshot
+from .metrics import collect, exposition, import_job_totals, observe_upload
+from .profiling import PROFILE_ID_RE, profile_path
+from .pagination import OptionalCursorPagination
+from .search import FullTextSearchFilter
+from .sparse import SparseFieldsMixin
+from .instrumentation import TimedSerializationMixin
+from .stats import lead_stats
+from .importers import LeadImporter, CustomerImporter
+from .exporters import export_spreadsheet, LEAD_COLUMNS, CUSTOMER_COLUMNS
+from .permissions import ViewMetrics, ViewProfiles, IsAuthenticatedView, ManageProducts, ManageLeads, ManageUsers, ManageCategories, ManageCustomers, ManageImports
+from .models import User, Category, SubCategory, Product, Lead, Customer, CustomerProducts, ImportJob
 from .serializers import (
     UserSerializer, CategorySerializer, SubCategorySerializer, LoginSerializer,
-    ProductSerializer, LeadSerializer, CustomerSerializer, ConvertLeadSerializer
+    ProductSerializer, LeadSerializer, CustomerSerializer, ConvertLeadSerializer, ImportJobSerializer
 )
 
 
@@ -28,6 +45,75 @@ def health(request):
     return Response("OK", status=status.HTTP_200_OK)
 
 
+@api_view(['GET'])
+@permission_classes([IsAuthenticatedView])
+def catalog(request):
+    """
+    The whole category → subcategory → product tree, tagged with the catalog
+    version as its ETag. Clients sending it back in If-None-Match get a 304.
+    """
+    etag = f'"{catalog_version()}"'
+    if etag in request.headers.get('If-None-Match', ''):
+        response = HttpResponse(status=status.HTTP_304_NOT_MODIFIED)
+    else:
+        response = HttpResponse(catalog_snapshot(etag.strip('"')), content_type='application/json')
+    response['ETag'] = etag
+    response['Cache-Control'] = 'private, no-cache'
+    return response
+
+
+@api_view(['GET'])
+@permission_classes([ViewMetrics])
+def metrics(request):
+    """Request, SQL and upload metrics of every worker process, in the Prometheus text format"""
+    totals = collect(settings.METRICS_DIR)
+    # Background imports run in the import worker, whose process files this one can't see
+    totals.update(import_job_totals())
+    return HttpResponse(exposition(totals), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+@api_view(['GET'])
+@permission_classes([ViewProfiles])
+def profile(request, profile_id):
+    """
+    A request profile taken by `ProfilerMiddleware`: the text report, or with
+    a `.prof` suffix the pstats file, for snakeviz or a flamegraph converter.
+    """
+    profile_id, raw = profile_id.removesuffix('.prof'), profile_id.endswith('.prof')
+    path = profile_path(profile_id, 'prof' if raw else 'txt')
+    if not PROFILE_ID_RE.match(profile_id) or not os.path.exists(path):
+        return Response({'error': 'Profile not found'}, status=status.HTTP_404_NOT_FOUND)
+    if raw:
+        return FileResponse(open(path, 'rb'), as_attachment=True, filename=f'{profile_id}.prof')
+    with open(path) as file:
+        return HttpResponse(file.read(), content_type='text/plain; charset=utf-8')
+
+
+def enqueue_import(request, kind):
+    """Store the uploaded file and queue it for `manage.py process_imports`"""
+    job = ImportJob.objects.create(kind=kind, file=request.FILES['file'], created_by=request.user)
+    return Response(ImportJobSerializer(job).data, status=status.HTTP_202_ACCEPTED)
+
+
+def import_now(importer, file):
+    """Import the upload within the request, counted in the upload metrics"""
+    started = perf_counter()
+    try:
+        return importer.run(file)
+    finally:
+        observe_upload(importer.kind, importer.processed, perf_counter() - started)
+
+
+def export_response(view, request, columns, name):
+    """The filtered list as `?fileType=xlsx` (default) or a streamed `csv`"""
+    file_type = request.query_params.get('fileType', 'xlsx')
+    if file_type not in ('xlsx', 'csv'):
+        return Response({'error': 'fileType must be xlsx or csv'}, status=status.HTTP_400_BAD_REQUEST)
+
+    queryset = view.filter_queryset(view.get_queryset())
+    return export_spreadsheet(queryset, columns, name, file_type)
+
+
 class AuthViewSet(viewsets.ViewSet):
     """
     Auth ViewSet providing:
@@ -72,12 +158,13 @@ class AuthViewSet(viewsets.ViewSet):
 
     @action(detail=False, methods=['get'])
     def me(self, request):
-        user = request.user
+        # The authenticated user only has the cached auth fields loaded
+        user = User.objects.get(pk=request.user.pk)
         serializer = UserSerializer(user)
         return Response(serializer.data)
 
 
-class UserViewSet(viewsets.ModelViewSet):
+class UserViewSet(TimedSerializationMixin, SparseFieldsMixin, viewsets.ModelViewSet):
     queryset = User.objects.all()
     serializer_class = UserSerializer
     filter_backends = [DjangoFilterBackend, SearchFilter, OrderingFilter]
@@ -97,8 +184,8 @@ class UserViewSet(viewsets.ModelViewSet):
         return super().destroy(request, *args, **kwargs)
 
 
-class CategoryViewSet(viewsets.ModelViewSet):
-    queryset = Category.objects.all()
+class CategoryViewSet(TimedSerializationMixin, SparseFieldsMixin, viewsets.ModelViewSet):
+    queryset = Category.objects.annotate(num_subcategories=Count('subcategories'))
     serializer_class = CategorySerializer
     filter_backends = [DjangoFilterBackend, SearchFilter, OrderingFilter]
     filterset_fields = ['status']
@@ -107,8 +194,8 @@ class CategoryViewSet(viewsets.ModelViewSet):
     permission_classes = [ManageCategories]
 
 
-class SubCategoryViewSet(viewsets.ModelViewSet):
-    queryset = SubCategory.objects.all()
+class SubCategoryViewSet(TimedSerializationMixin, SparseFieldsMixin, viewsets.ModelViewSet):
+    queryset = SubCategory.objects.annotate(num_products=Count('products'))
     serializer_class = SubCategorySerializer
     filter_backends = [DjangoFilterBackend, SearchFilter, OrderingFilter]
     filterset_fields = ['category', 'status']
@@ -124,7 +211,7 @@ class SubCategoryViewSet(viewsets.ModelViewSet):
         return queryset
 
 
-class ProductViewSet(viewsets.ModelViewSet):
+class ProductViewSet(TimedSerializationMixin, SparseFieldsMixin, viewsets.ModelViewSet):
     queryset = Product.objects.all()
     serializer_class = ProductSerializer
     filter_backends = [DjangoFilterBackend, SearchFilter, OrderingFilter]
@@ -146,14 +233,16 @@ class ProductViewSet(viewsets.ModelViewSet):
         return queryset
 
 
-class LeadViewSet(viewsets.ModelViewSet):
+class LeadViewSet(TimedSerializationMixin, SparseFieldsMixin, viewsets.ModelViewSet):
     queryset = Lead.objects.all().prefetch_related('interests__product')
     serializer_class = LeadSerializer
-    filter_backends = [DjangoFilterBackend, SearchFilter, OrderingFilter]
+    field_prefetches = {'products': 'interests__product'}
+    filter_backends = [DjangoFilterBackend, FullTextSearchFilter, OrderingFilter]
     filterset_fields = ['status', 'area', 'priority', 'source', 'follow_up_date']
-    search_fields = ['name', 'phone', 'email', 'product', 'notes']
+    search_fields = ['name', 'phone', 'email', 'notes', 'interests__product__name']
     ordering_fields = ['created_at', 'follow_up_date']
     permission_classes = [ManageLeads]
+    pagination_class = OptionalCursorPagination
     
     def get_queryset(self):
         queryset = super().get_queryset()
@@ -172,7 +261,6 @@ class LeadViewSet(viewsets.ModelViewSet):
     
     @action(detail=True, methods=['post'])
     def convert(self, request, pk=None):
-        lead = self.get_object()
         serializer = ConvertLeadSerializer(data=request.data)
         
         if serializer.is_valid():
@@ -180,29 +268,38 @@ class LeadViewSet(viewsets.ModelViewSet):
             warranty_years = serializer.validated_data['warrantyYears']
             expiry_date = installation_date + relativedelta(years=warranty_years)
             
-            customer = Customer.objects.create(
-                name=lead.name,
-                phone=lead.phone,
-                email=lead.email,
-                area=lead.area,
-                address=lead.address,
-                installation_date=installation_date,
-                expiry_date=expiry_date,
-                amount=0,
-                status='active',
-                sales_rep=lead.sales_rep,
-                notes=lead.notes
-            )
+            with transaction.atomic():
+                # Locked, so a retried request waits for this one and then sees the conversion
+                lead = get_object_or_404(Lead.objects.select_for_update().prefetch_related('interests'), pk=pk)
+                self.check_object_permissions(request, lead)
+                error = conversion_error(lead)
+                if error:
+                    return Response({'error': error}, status=status.HTTP_400_BAD_REQUEST)
+
+                customer = Customer.objects.create(
+                    name=lead.name,
+                    phone=lead.phone,
+                    email=lead.email,
+                    area=lead.area,
+                    address=lead.address,
+                    installation_date=installation_date,
+                    expiry_date=expiry_date,
+                    amount=0,
+                    status='active',
+                    sales_rep=lead.sales_rep,
+                    notes=lead.notes
+                )
 
-            for product_interest in ProductInterests.objects.filter(lead=lead).all():
-                CustomerProducts.objects.create(
-                    customer=customer,
-                    product=product_interest.product,
+                # A new customer has no links to diff against; its document is indexed on commit
+                CustomerProducts.objects.bulk_create(
+                    CustomerProducts(customer=customer, product_id=interest.product_id)
+                    for interest in lead.interests.all()
                 )
-            
-            lead.status = 'won'
-            lead.save()
-            
+
+                lead.status = 'won'
+                lead.customer = customer
+                lead.save()
+
             return Response(
                 CustomerSerializer(customer).data,
                 status=status.HTTP_201_CREATED
@@ -210,6 +307,58 @@ class LeadViewSet(viewsets.ModelViewSet):
         
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
     
+    @action(detail=False, methods=['post'], url_path='convert', url_name='convert-many')
+    def convert_many(self, request):
+        items = request.data
+        if not isinstance(items, list):
+            return Response({'error': 'Expected a list of leads to convert'}, status=status.HTTP_400_BAD_REQUEST)
+        if len(items) > BATCH_MAX_OPERATIONS:
+            return Response(
+                {'error': f'At most {BATCH_MAX_OPERATIONS} leads can be converted at once'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        conversion = LeadConversion(items)
+        # The leads stay locked from validation to save, like in the single convert
+        with transaction.atomic():
+            if not conversion.is_valid():
+                return Response(
+                    {'error': 'Invalid leads, nothing was converted', 'errors': conversion.errors},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            customers = conversion.save()
+        return Response(CustomerSerializer(customers, many=True).data, status=status.HTTP_201_CREATED)
+
+    @action(detail=False, methods=['post'])
+    def batch(self, request):
+        operations = request.data
+        if not isinstance(operations, list):
+            return Response({'error': 'Expected a list of operations'}, status=status.HTTP_400_BAD_REQUEST)
+        if len(operations) > BATCH_MAX_OPERATIONS:
+            return Response(
+                {'error': f'A batch holds at most {BATCH_MAX_OPERATIONS} operations'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        batch = LeadBatch(operations)
+        if not batch.is_valid():
+            return Response(
+                {'error': 'Invalid operations, nothing was saved', 'errors': batch.errors},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        return Response({'results': batch.save()})
+
+    @action(detail=False, methods=['get'])
+    def export(self, request):
+        return export_response(self, request, LEAD_COLUMNS, 'leads')
+
+    @action(detail=False, methods=['get'])
+    def stats(self, request):
+        return Response(lead_stats(
+            sales_rep=request.query_params.get('salesRep'),
+            area=request.query_params.get('area'),
+        ))
+
     @action(detail=False, methods=['post'])
     def upload(self, request):
         if 'file' not in request.FILES:
@@ -218,63 +367,13 @@ class LeadViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        file = request.FILES['file']
-        imported = 0
-        failed = 0
-        errors = []
-        
+        if request.query_params.get('mode') == 'background':
+            return enqueue_import(request, 'leads')
+
         try:
-            wb = load_workbook(file)
-            ws = wb.active
-            
-            headers = [cell.value for cell in ws[1]]
-            
-            for idx, row in enumerate(ws.iter_rows(min_row=2, values_only=True), start=2):
-                try:
-                    data = dict(zip(headers, row))
-                    
-                    lead_data = {
-                        'name': data.get('name'),
-                        'phone': data.get('phone'),
-                        'email': data.get('email'),
-                        'area': data.get('area'),
-                        'address': data.get('address'),
-                        'status': data.get('status', 'new'),
-                        'source': data.get('source'),
-                        'priority': data.get('priority', 'medium'),
-                        'notes': data.get('notes'),
-                        'sales_rep': data.get('salesRep'),
-                    }
-                    
-                    if data.get('followUpDate'):
-                        lead_data['follow_up_date'] = data['followUpDate']
-
-                    product_interests = []
-                    for product_name in data.get('products').split(','):
-                        product = Product.objects.filter(name=product_name).first()
-                        if product is None:
-                            raise Exception(f"Product `{product_name}` not found")
-                        product_interests.append(product)
-
-                    lead = Lead.objects.create(**lead_data)
-                    for product_interest in product_interests:
-                        ProductInterests.objects.create(
-                            lead=lead,
-                            product=product_interest,
-                        )
-                    imported += 1
-                    
-                except Exception as e:
-                    failed += 1
-                    errors.append({'row': idx, 'error': str(e)})
-            
-            return Response({
-                'success': True,
-                'imported': imported,
-                'failed': failed,
-                'errors': errors
-            })
-            
+            report = import_now(LeadImporter(), request.FILES['file'])
+            return Response(report)
+
         except Exception as e:
             return Response(
                 {'error': f'Failed to process file: {str(e)}'},
@@ -282,14 +381,16 @@ class LeadViewSet(viewsets.ModelViewSet):
             )
 
 
-class CustomerViewSet(viewsets.ModelViewSet):
-    queryset = Customer.objects.all()
+class CustomerViewSet(TimedSerializationMixin, SparseFieldsMixin, viewsets.ModelViewSet):
+    queryset = Customer.objects.all().prefetch_related('products__product')
     serializer_class = CustomerSerializer
-    filter_backends = [DjangoFilterBackend, SearchFilter, OrderingFilter]
+    field_prefetches = {'products': 'products__product'}
+    filter_backends = [DjangoFilterBackend, FullTextSearchFilter, OrderingFilter]
     filterset_fields = ['status', 'area']
-    search_fields = ['name', 'phone', 'email', 'product', 'notes']
+    search_fields = ['name', 'phone', 'email', 'notes', 'products__product__name']
     ordering_fields = ['created_at', 'installation_date', 'expiry_date']
     permission_classes = [ManageCustomers]
+    pagination_class = OptionalCursorPagination
     
     def get_queryset(self):
         queryset = super().get_queryset()
@@ -300,6 +401,10 @@ class CustomerViewSet(viewsets.ModelViewSet):
         
         return queryset
     
+    @action(detail=False, methods=['get'])
+    def export(self, request):
+        return export_response(self, request, CUSTOMER_COLUMNS, 'customers')
+
     @action(detail=False, methods=['post'])
     def upload(self, request):
         if 'file' not in request.FILES:
@@ -308,72 +413,30 @@ class CustomerViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        file = request.FILES['file']
-        imported = 0
-        failed = 0
-        errors = []
-        
+        if request.query_params.get('mode') == 'background':
+            return enqueue_import(request, 'customers')
+
         try:
-            wb = load_workbook(file)
-            ws = wb.active
-            
-            headers = [cell.value for cell in ws[1]]
-            
-            for idx, row in enumerate(ws.iter_rows(min_row=2, values_only=True), start=2):
-                try:
-                    data = dict(zip(headers, row))
-                    
-                    installation_date = data.get('installationDate')
-                    warranty_years = data.get('warrantyYears', 2)
-                    
-                    if isinstance(installation_date, str):
-                        installation_date = datetime.strptime(installation_date, '%Y-%m-%d').date()
-                    
-                    expiry_date = installation_date + relativedelta(years=warranty_years)
-                    
-                    customer_data = {
-                        'name': data.get('name'),
-                        'phone': data.get('phone'),
-                        'email': data.get('email'),
-                        'area': data.get('area'),
-                        'address': data.get('address'),
-                        'installation_date': installation_date,
-                        'expiry_date': expiry_date,
-                        'amount': data.get('amount', 0),
-                        'status': data.get('status', 'active'),
-                        'sales_rep': data.get('salesRep'),
-                        'notes': data.get('notes'),
-                    }
-
-                    product_interests = []
-                    for product_name in data.get('products', '').split(","):
-                        product = Product.objects.filter(name=product_name).first()
-                        if product is None:
-                            raise Exception(f"Product `{product_name}` not found")
-                        product_interests.append(product)
-
-                    customer = Customer.objects.create(**customer_data)
-                    for product_interest in product_interests:
-                        CustomerProducts.objects.create(
-                            customer=customer,
-                            product=product_interest,
-                        )
-
-                    imported += 1
-                    
-                except Exception as e:
-                    failed += 1
-                    errors.append({'row': idx, 'error': str(e)})
-            
-            return Response({
-                'success': True,
-                'imported': imported,
-                'failed': failed,
-                'errors': errors
-            })
-            
+            report = import_now(CustomerImporter(), request.FILES['file'])
+            return Response(report)
+
         except Exception as e:
             return Response(
                 {'error': f'Failed to process file: {str(e)}'},
                 status=status.HTTP_400_BAD_REQUEST
             )
+
+
+class ImportJobViewSet(TimedSerializationMixin, SparseFieldsMixin, viewsets.ReadOnlyModelViewSet):
+    queryset = ImportJob.objects.all()
+    serializer_class = ImportJobSerializer
+    filter_backends = [DjangoFilterBackend, OrderingFilter]
+    filterset_fields = ['kind', 'status']
+    ordering_fields = ['created_at']
+    permission_classes = [ManageImports]
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.request.user.role != 'admin':
+            queryset = queryset.filter(created_by=self.request.user)
+        return queryset
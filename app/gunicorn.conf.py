@@ -0,0 +1,26 @@
+import os
+import shutil
+
+# SERVER_MODE=asgi is an experiment: it serves honeydrop.asgi with uvicorn
+# workers and mounts the async read views (api.async_views). It has not been
+# shown to lower latency; check it with `manage.py load_test` first.
+# Anything else keeps the classic sync WSGI workers.
+SERVER_MODE = os.environ.get('SERVER_MODE', 'wsgi')
+
+bind = '0.0.0.0:8000'
+workers = int(os.environ.get('WEB_CONCURRENCY', 4))
+timeout = 120
+
+if SERVER_MODE == 'asgi':
+    wsgi_app = 'honeydrop.asgi:application'
+    worker_class = 'uvicorn_worker.UvicornWorker'
+else:
+    wsgi_app = 'honeydrop.wsgi:application'
+
+# Every worker keeps its metrics in its own file there (api.metrics); the
+# samples of a previous run are dropped when the server starts
+os.environ.setdefault('METRICS_DIR', '/tmp/honeydrop-metrics')
+
+
+def on_starting(server):
+    shutil.rmtree(os.environ['METRICS_DIR'], ignore_errors=True)
@@ -0,0 +1,27 @@
+import os
+from tempfile import TemporaryDirectory
+
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+
+class TestRunner(DiscoverRunner):
+    """
+    The test runner, with a private locmem cache instead of the server's
+    cache files, and metrics and profiles in a directory removed afterwards
+    """
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self.directory = TemporaryDirectory(prefix='honeydrop-tests-')
+        self.test_settings = override_settings(
+            CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}},
+            METRICS_DIR=os.path.join(self.directory.name, 'metrics'),
+            PROFILES_DIR=os.path.join(self.directory.name, 'profiles'),
+        )
+        self.test_settings.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        self.test_settings.disable()
+        self.directory.cleanup()
+        super().teardown_test_environment(**kwargs)